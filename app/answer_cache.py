@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+from pgvector.sqlalchemy import Vector
+
+from app.models import uuidpk
+
+# Closest prior question for the same policy version, chat model and retrieval settings
+# (retrieval_key: top_k, candidate_k, ... as the request resolved them), younger than :ttl
+# seconds if a TTL is set. Entries are removed by the policy_chunk triggers (migration
+# a4d92e6b7c13) whenever that policy version's chunks are re-ingested.
+LOOKUP = text("""
+    SELECT answer, sources, total_tokens,
+           1 - (question_embedding <=> :qvec) AS similarity
+    FROM answer_cache
+    WHERE policy_version_id = :pvid AND model = :model AND retrieval_key = :retrieval_key
+      AND (CAST(:ttl AS float8) IS NULL OR created_at > now() - make_interval(secs => :ttl))
+    ORDER BY question_embedding <=> :qvec
+    LIMIT 1
+""").bindparams(bindparam("qvec", type_=Vector(1536)))
+
+# Upsert: an entry for a near-identical question (similarity >= :threshold, e.g. one past
+# its TTL, or stored by a concurrent request) is replaced instead of adding another row.
+STORE = text("""
+    WITH nearest AS (
+      SELECT id FROM answer_cache
+      WHERE policy_version_id = :pvid AND model = :model AND retrieval_key = :retrieval_key
+        AND 1 - (question_embedding <=> :qvec) >= :threshold
+      ORDER BY question_embedding <=> :qvec
+      LIMIT 1
+    ),
+    replaced AS (
+      UPDATE answer_cache a
+      SET question = :question, question_embedding = :qvec, answer = :answer,
+          sources = CAST(:sources AS jsonb), total_tokens = :total_tokens, created_at = now()
+      FROM nearest WHERE a.id = nearest.id
+    )
+    INSERT INTO answer_cache (id, policy_version_id, model, retrieval_key, question, question_embedding,
+                              answer, sources, total_tokens)
+    SELECT :id, :pvid, :model, :retrieval_key, :question, :qvec, :answer, CAST(:sources AS jsonb), :total_tokens
+    WHERE NOT EXISTS (SELECT 1 FROM nearest)
+""").bindparams(bindparam("qvec", type_=Vector(1536)))
+
+# Pruning, at most every `prune_every` seconds on store: entries past the TTL, then the
+# oldest beyond max_rows (ix_answer_cache_created_at).
+PRUNE_EXPIRED = text("""
+    DELETE FROM answer_cache WHERE created_at < now() - make_interval(secs => :ttl)
+""")
+PRUNE_OVERFLOW = text("""
+    DELETE FROM answer_cache
+    WHERE id IN (SELECT id FROM answer_cache ORDER BY created_at DESC OFFSET :max_rows)
+""")
+
+
+class AnswerCache:
+    """
+    Semantic cache of full answers keyed by (policy_version_id, question embedding).
+
+    A hit is the nearest cached question, answered with the same retrieval settings,
+    whose cosine similarity is at least `threshold`; the stored answer and sources are
+    returned without an LLM call. Entries older than `ttl` seconds are not served and
+    are pruned, as are the oldest beyond `max_rows` (either can be None: no limit).
+
+      ANSWER_CACHE_TTL          seconds (default unset: until the policy is re-ingested)
+      ANSWER_CACHE_MAX_ROWS     entries kept across all policies (default unset)
+      ANSWER_CACHE_PRUNE_EVERY  seconds between prunes, run on store (default 300)
+    """
+
+    def __init__(self, threshold: float = 0.95, enabled: bool = True, ttl: Optional[float] = None,
+                 max_rows: Optional[int] = None, prune_every: float = 300.0):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._pruned_at: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.pruned = 0
+
+    @classmethod
+    def from_env(cls) -> "AnswerCache":
+        ttl = os.getenv("ANSWER_CACHE_TTL")
+        max_rows = os.getenv("ANSWER_CACHE_MAX_ROWS")
+        return cls(
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+            enabled=os.getenv("ANSWER_CACHE_ENABLED", "1").lower() not in ("0", "false", "no"),
+            ttl=float(ttl) if ttl else None,
+            max_rows=int(max_rows) if max_rows else None,
+            prune_every=float(os.getenv("ANSWER_CACHE_PRUNE_EVERY", "300")),
+        )
+
+    # ---- SQL params (shared by the sync and async routes) ----
+    def lookup_params(self, pvid: str, qvec: Sequence[float], model: str, retrieval_key: str) -> Dict[str, Any]:
+        return {"pvid": pvid, "qvec": qvec, "model": model, "retrieval_key": retrieval_key, "ttl": self.ttl}
+
+    def store_params(self, pvid: str, question: str, qvec: Sequence[float], model: str, retrieval_key: str,
+                     answer: str, sources: List[Dict[str, Any]], total_tokens: int) -> Dict[str, Any]:
+        return {
+            "id": uuidpk(), "pvid": pvid, "model": model, "retrieval_key": retrieval_key, "question": question,
+            "qvec": qvec, "answer": answer, "sources": json.dumps(sources, default=str),
+            "total_tokens": total_tokens, "threshold": self.threshold,
+        }
+
+    def prune_statements(self) -> List[Tuple[Any, Dict[str, Any]]]:
+        """(statement, params) to run after a store, or [] if nothing is limited or a prune ran recently."""
+        if self.ttl is None and self.max_rows is None:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            if self._pruned_at is not None and now - self._pruned_at < self.prune_every:
+                return []
+            self._pruned_at = now
+        statements = []
+        if self.ttl is not None:
+            statements.append((PRUNE_EXPIRED, {"ttl": self.ttl}))
+        if self.max_rows is not None:
+            statements.append((PRUNE_OVERFLOW, {"max_rows": self.max_rows}))
+        return statements
+
+    def record_pruned(self, n: int) -> None:
+        with self._lock:
+            self.pruned += n
+
+    def record(self, row) -> Optional[Dict[str, Any]]:
+        """Turn a LOOKUP row into a hit (answer + sources) or None, updating the counters."""
+        hit = row is not None and float(row.similarity) >= self.threshold
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.tokens_saved += int(row.total_tokens or 0)
+            else:
+                self.misses += 1
+        if not hit:
+            return None
+        sources = row.sources
+        if isinstance(sources, str):  # asyncpg hands jsonb back undecoded
+            sources = json.loads(sources)
+        return {"answer": row.answer, "sources": sources}
+
+    # ---- sync helpers ----
+    def lookup(self, db: Session, pvid: str, qvec: Sequence[float], model: str,
+               retrieval_key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        return self.record(db.execute(LOOKUP, self.lookup_params(pvid, qvec, model, retrieval_key)).first())
+
+    def store(self, db: Session, pvid: str, question: str, qvec: Sequence[float], model: str, retrieval_key: str,
+              answer: str, sources: List[Dict[str, Any]], total_tokens: int) -> None:
+        if not self.enabled:
+            return
+        db.execute(STORE, self.store_params(pvid, question, qvec, model, retrieval_key, answer, sources,
+                                            total_tokens))
+        for stmt, params in self.prune_statements():
+            self.record_pruned(db.execute(stmt, params).rowcount)
+        db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "tokens_saved": self.tokens_saved,
+                "pruned": self.pruned,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> AnswerCache:
+    return AnswerCache.from_env()
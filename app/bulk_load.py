@@ -0,0 +1,165 @@
+import io
+import json
+import struct
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.models import PolicyChunk, uuidpk
+from app.retrieval import EMBED_DIM
+
+# policy_chunk columns in COPY order
+COPY_COLUMNS = [
+    "id", "policy_version_id", "document_id", "section_id",
+    "page_from", "page_to", "content", "content_hash", "metadata", "embedding",
+]
+VECTOR_INDEX = "idx_policy_chunk_embedding"
+
+ChunkRow = Dict[str, Any]  # keys as in chunk_row()
+
+
+def chunk_row(
+    policy_version_id: str,
+    document_id: str,
+    content: str,
+    embedding: Sequence[float],
+    section_id: Optional[str] = None,
+    page_from: Optional[int] = None,
+    page_to: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    content_hash: Optional[str] = None,
+) -> ChunkRow:
+    return {
+        "id": uuidpk(),
+        "policy_version_id": policy_version_id,
+        "document_id": document_id,
+        "section_id": section_id,
+        "page_from": page_from,
+        "page_to": page_to,
+        "content": content,
+        "content_hash": content_hash,
+        "metadata": metadata or {},
+        "embedding": embedding,
+    }
+
+
+# ---- COPY ... FROM STDIN (FORMAT binary) ----
+# https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4
+_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_TRAILER = struct.pack(">h", -1)
+_NULL = struct.pack(">i", -1)
+
+
+def _field(buf: bytes) -> bytes:
+    return struct.pack(">i", len(buf)) + buf
+
+
+def _uuid(value: str) -> bytes:
+    return _field(uuid.UUID(str(value)).bytes)
+
+
+def _text(value: Optional[str]) -> bytes:
+    return _NULL if value is None else _field(value.encode("utf-8"))
+
+
+def _int4(value: Optional[int]) -> bytes:
+    return _NULL if value is None else _field(struct.pack(">i", value))
+
+
+def _jsonb(value: Dict[str, Any]) -> bytes:
+    return _field(b"\x01" + json.dumps(value).encode("utf-8"))  # jsonb binary format version 1
+
+
+def encode_copy_binary(rows: Sequence[ChunkRow], dim: int = EMBED_DIM) -> bytes:
+    """
+    Encode policy_chunk rows as a COPY binary stream.
+
+    Vectors use pgvector's binary input format (vector_recv: uint16 dim,
+    uint16 unused, big-endian float32s), converted for all rows in one numpy call
+    instead of formatting 1536 floats per row as text.
+    """
+    vecs = np.asarray([r["embedding"] for r in rows], dtype=">f4").reshape(len(rows), dim)
+    vec_prefix = struct.pack(">iHH", 4 + 4 * dim, dim, 0)  # field length, then vector header
+    parts: List[bytes] = [_HEADER]
+    count = struct.pack(">h", len(COPY_COLUMNS))
+    for r, vec in zip(rows, vecs):
+        parts += [
+            count,
+            _uuid(r["id"]),
+            _uuid(r["policy_version_id"]),
+            _uuid(r["document_id"]),
+            _text(r["section_id"]),
+            _int4(r["page_from"]),
+            _int4(r["page_to"]),
+            _text(r["content"]),
+            _text(r["content_hash"]),
+            _jsonb(r["metadata"]),
+            vec_prefix + vec.tobytes(),
+        ]
+    parts.append(_TRAILER)
+    return b"".join(parts)
+
+
+def copy_chunks(db: Session, rows: Sequence[ChunkRow]) -> int:
+    """Stream rows into policy_chunk with COPY, inside the session's transaction (psycopg2 only)."""
+    if not rows:
+        return 0
+    cur = db.connection().connection.cursor()
+    try:
+        cur.copy_expert(
+            f"COPY policy_chunk ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT binary)",
+            io.BytesIO(encode_copy_binary(rows)),
+        )
+    finally:
+        cur.close()
+    return len(rows)
+
+
+# ---- fallback: batched multi-row INSERT ----
+def insert_chunks(db: Session, rows: Sequence[ChunkRow], batch_size: int = 500) -> int:
+    for i in range(0, len(rows), batch_size):
+        db.execute(insert(PolicyChunk), [
+            {**{k: v for k, v in r.items() if k != "metadata"}, "policy_chunk_metadata": r["metadata"]}
+            for r in rows[i:i + batch_size]
+        ])
+    return len(rows)
+
+
+def write_chunks(db: Session, rows: Sequence[ChunkRow], method: str = "copy") -> int:
+    """Bulk-write rows with COPY when the driver supports it, else batched INSERT. Caller commits."""
+    if method == "copy" and db.get_bind().dialect.driver == "psycopg2":
+        return copy_chunks(db, rows)
+    return insert_chunks(db, rows)
+
+
+# ---- index maintenance ----
+@contextmanager
+def deferred_vector_index(db: Session, maintenance_work_mem: str = "1GB") -> Iterator[None]:
+    """
+    Drop the ANN index for the duration of a bulk load and rebuild it once afterwards.
+
+    Building HNSW/IVFFlat over the loaded table is much cheaper than updating it per
+    row, and IVFFlat lists are trained on the real data. The existing definition is
+    read from pg_indexes, so whichever index kind the migration created is restored.
+    Vector queries fall back to exact scans until the rebuild finishes, so use this
+    for backfills, not while serving traffic.
+    """
+    indexdef = db.execute(
+        text("SELECT indexdef FROM pg_indexes WHERE tablename = 'policy_chunk' AND indexname = :name"),
+        {"name": VECTOR_INDEX},
+    ).scalar()
+    if indexdef:
+        db.execute(text(f"DROP INDEX IF EXISTS {VECTOR_INDEX}"))
+        db.commit()
+    try:
+        yield
+    finally:
+        if indexdef:
+            db.rollback()  # the load may have failed mid-transaction
+            db.execute(text("SELECT set_config('maintenance_work_mem', :mem, true)"), {"mem": maintenance_work_mem})
+            db.execute(text(indexdef))
+            db.commit()
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.orm import Session
+
+from app.responses import dumps
+
+# Catalog responses only change when ingestion or a seed script writes the catalog
+# tables; those writes bump catalog_version (migration f3b8d61c2a47). Serialized
+# responses are memoized per (version, endpoint, filters) and carry an ETag derived
+# from the same key, so a client holding the current ETag gets a 304 with no body.
+#
+#   CATALOG_CACHE_ENABLED       default on
+#   CATALOG_CACHE_MAX_ENTRIES   memoized responses kept (LRU, default 256)
+#   CATALOG_VERSION_TTL_MS      reuse the last version read for this long (default 1000; 0 = every request)
+#   CATALOG_MAX_AGE             Cache-Control max-age in seconds for browsers/proxies (default 30)
+
+log = logging.getLogger(__name__)
+
+VERSION = text("SELECT version FROM catalog_version WHERE id = 1")
+
+Key = Tuple[Any, ...]
+Entry = Tuple[bytes, Dict[str, str]]  # serialized body, response headers stored with it (e.g. next-page cursor)
+
+
+def _env_on(name: str, default: str = "1") -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no")
+
+
+class CatalogCache:
+    """
+    Serialized catalog responses keyed by (endpoint, filters), valid for one catalog version.
+
+    The version is re-read at most every `version_ttl` seconds; when it moves, every
+    entry is dropped. Without the catalog_version table (migration not applied) nothing
+    is cached and no ETag is sent.
+    """
+
+    def __init__(self, max_entries: int = 256, version_ttl: float = 1.0, max_age: int = 30,
+                 enabled: bool = True):
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.max_age = max_age
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Key, Entry]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._version_read_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "CatalogCache":
+        return cls(
+            max_entries=int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "256")),
+            version_ttl=int(os.getenv("CATALOG_VERSION_TTL_MS", "1000")) / 1000.0,
+            max_age=int(os.getenv("CATALOG_MAX_AGE", "30")),
+            enabled=_env_on("CATALOG_CACHE_ENABLED"),
+        )
+
+    # ---- version ----
+    def version(self, db: Session) -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_read_at < self.version_ttl:
+                return self._version
+        try:
+            v = db.execute(VERSION).scalar()
+        except ProgrammingError:
+            db.rollback()
+            log.warning("catalog_version table missing; catalog responses are not cached")
+            return None
+        with self._lock:
+            if v != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = v
+            self._version_read_at = now
+        return v
+
+    # ---- responses ----
+    @staticmethod
+    def etag(version: int, key: Key) -> str:
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        return f'W/"{version}-{digest}"'
+
+    def headers(self, etag: Optional[str]) -> Dict[str, str]:
+        if etag is None:
+            return {"Cache-Control": "no-cache"}
+        return {"ETag": etag, "Cache-Control": f"public, max-age={self.max_age}, must-revalidate"}
+
+    def get(self, db: Session, key: Key, compute: Callable[[], Tuple[Any, Dict[str, str]]],
+            if_none_match: Optional[str] = None) -> Tuple[Optional[bytes], Dict[str, str]]:
+        """
+        (body, headers) for `key`. body is None when `if_none_match` already names the
+        current ETag; otherwise it is the memoized JSON or `compute()`'s value serialized.
+        `compute` returns (value, extra response headers).
+        """
+        v = self.version(db) if self.enabled else None
+        if v is None:
+            value, extra = compute()
+            return dumps(value), {**extra, **self.headers(None)}
+        tag = self.etag(v, key)
+        if if_none_match and tag in (t.strip() for t in if_none_match.split(",")):
+            with self._lock:
+                self.not_modified += 1
+                entry = self._entries.get(key)
+            # a 304 carries the page's X-Next-Cursor/Link too (when still memoized here;
+            # otherwise the client keeps the ones it stored with the body)
+            return None, {**(entry[1] if entry is not None else {}), **self.headers(tag)}
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], {**entry[1], **self.headers(tag)}
+            self.misses += 1
+        value, extra = compute()
+        body = dumps(value)
+        with self._lock:
+            if self._version == v:  # don't file a result under a newer version
+                self._entries[key] = (body, extra)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return body, {**extra, **self.headers(tag)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.not_modified
+            return {
+                "enabled": self.enabled,
+                "version": self._version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "hit_ratio": (self.hits + self.not_modified) / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_catalog_cache() -> CatalogCache:
+    return CatalogCache.from_env()
@@ -1,13 +1,120 @@
 import os
+import threading
+from typing import Any, Dict, Iterator, Optional
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# ---- pool configuration (shared with app/db_async.py) ----
+def engine_options() -> Dict[str, Any]:
+    """
+    QueuePool sizing from the environment. Each engine (sync and async) gets its own pool,
+    so a worker can hold up to 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+
+    DB_POOL_SIZE      - connections kept open (default 5)
+    DB_MAX_OVERFLOW   - extra connections opened under burst, closed when returned (default 10)
+    DB_POOL_TIMEOUT   - seconds a request waits for a free connection before failing (default 30)
+    DB_POOL_RECYCLE   - seconds after which a connection is replaced (default 1800; -1 = never)
+    DB_POOL_PRE_PING  - test each connection on checkout, one extra round trip (default 1)
+    DB_QUERY_CACHE_SIZE - compiled statements cached per engine (default 500)
+    """
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1").lower() not in ("0", "false", "no"),
+        "query_cache_size": int(os.getenv("DB_QUERY_CACHE_SIZE", "500")),
+    }
+
+def statement_timeout_ms() -> Optional[int]:
+    # DB_STATEMENT_TIMEOUT_MS caps every statement server-side (unset = server default)
+    value = os.getenv("DB_STATEMENT_TIMEOUT_MS")
+    return int(value) if value else None
+
+def _connect_args() -> Dict[str, Any]:
+    timeout = statement_timeout_ms()
+    return {"options": f"-c statement_timeout={timeout}"} if timeout else {}
+
+engine = create_engine(DATABASE_URL, connect_args=_connect_args(), **engine_options())
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# register pgvector types on every new DBAPI connection so raw `vector`
+# columns come back as pgvector objects instead of '[...]' strings
+@event.listens_for(engine, "connect")
+def _register_vector(dbapi_conn, _record):
+    if engine.dialect.driver != "psycopg2":
+        return
+    import psycopg2
+    from pgvector.psycopg2 import register_vector
+    try:
+        register_vector(dbapi_conn)
+    except psycopg2.ProgrammingError:
+        pass  # extension not created yet (fresh DB before `alembic upgrade`)
+    finally:
+        dbapi_conn.rollback()  # don't leave the type lookup's transaction open
+
+# ---- dependencies ----
+def get_db() -> Iterator[Session]:
+    """One session per request, shared by every dependency and helper of that request."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ---- pool visibility ----
+class PoolMonitor:
+    """Checkout counters and the high-water mark of one engine's pool, fed by pool events."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.peak_checked_out = 0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, *_):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, *_):
+        checked_out = self.engine.pool.checkedout()
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def _on_invalidate(self, *_):
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        size = pool.size() if hasattr(pool, "size") else None
+        with self._lock:
+            return {
+                "pool": type(pool).__name__,
+                "size": size,
+                "max_overflow": getattr(pool, "_max_overflow", None),
+                "timeout_s": pool.timeout() if hasattr(pool, "timeout") else None,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+                "peak_checked_out": self.peak_checked_out,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+            }
+
+pool_monitor = PoolMonitor(engine)
+
 class Base(DeclarativeBase):
-    pass
\ No newline at end of file
+    pass
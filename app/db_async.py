@@ -0,0 +1,35 @@
+import os
+from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db import PoolMonitor, engine_options, statement_timeout_ms
+
+load_dotenv()
+
+def async_database_url() -> str:
+    """ASYNC_DATABASE_URL, or DATABASE_URL with its driver swapped for asyncpg."""
+    url = os.getenv("ASYNC_DATABASE_URL")
+    if url:
+        return url
+    return make_url(os.getenv("DATABASE_URL")).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+def _async_url() -> str:
+    # asyncpg prepares every statement server-side and keeps the prepared statements per
+    # connection, so the hot retrieval/answer-cache SQL is parsed and planned once per connection
+    url = make_url(async_database_url())
+    cache_size = os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE")
+    if cache_size:
+        url = url.update_query_dict({"prepared_statement_cache_size": cache_size})
+    return url.render_as_string(hide_password=False)
+
+def _connect_args():
+    timeout = statement_timeout_ms()
+    return {"server_settings": {"statement_timeout": str(timeout)}} if timeout else {}
+
+# Kept separate from app/db.py so the sync app and scripts never need asyncpg.
+# No pgvector codec is registered: queries bind vectors as text and read
+# them back as vector_send bytea (see app/retrieval.py).
+async_engine = create_async_engine(_async_url(), connect_args=_connect_args(), **engine_options())
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+async_pool_monitor = PoolMonitor(async_engine.sync_engine)
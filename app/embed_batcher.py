@@ -0,0 +1,181 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.llm import LLMClient, get_llm
+
+Embedding = List[float]
+
+# batch-size buckets for the fill histogram
+_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+
+class BatcherMetrics:
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.deduplicated = 0
+        self.failed_batches = 0
+        self.flushes: Counter = Counter()  # "window" or "full"
+        self.sizes: Counter = Counter()  # bucket upper bound -> batches
+        self._added: Deque[float] = deque(maxlen=window)  # seconds each item waited for its batch to go out
+        self._call: Deque[float] = deque(maxlen=window)
+
+    def batch(self, reason: str, size: int, unique: int, waits: List[float]) -> None:
+        with self._lock:
+            self.batches += 1
+            self.items += size
+            self.deduplicated += size - unique
+            self.flushes[reason] += 1
+            self.sizes[next((b for b in _BUCKETS if size <= b), _BUCKETS[-1])] += 1
+            self._added.extend(waits)
+
+    def call(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._call.append(seconds)
+            if not ok:
+                self.failed_batches += 1
+
+    @staticmethod
+    def _pct(samples) -> Dict[str, float]:
+        if not samples:
+            return {"p50_ms": 0.0, "p95_ms": 0.0}
+        s = sorted(samples)
+        return {"p50_ms": s[len(s) // 2] * 1000, "p95_ms": s[min(len(s) - 1, int(0.95 * len(s)))] * 1000}
+
+    def stats(self, max_batch: int) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "deduplicated": self.deduplicated,
+                "failed_batches": self.failed_batches,
+                "mean_batch": self.items / self.batches if self.batches else 0.0,
+                "mean_fill": self.items / (self.batches * max_batch) if self.batches else 0.0,
+                "flushes": dict(self.flushes),
+                "batch_sizes": {f"<={b}": n for b, n in sorted(self.sizes.items())},
+                "added_latency": self._pct(self._added),
+                "call_latency": self._pct(self._call),
+            }
+
+
+class EmbedBatcher:
+    """
+    Collects single-text embedding requests arriving within `window_ms` (or until
+    `max_batch` are waiting) and sends them as one embeddings call per model; each
+    caller gets its own vector back. Runs on the app's event loop: async code awaits
+    `embed`, threadpool code calls `embed_sync`, which hops onto that loop.
+    """
+
+    def __init__(self, llm: LLMClient, window_ms: float = 5.0, max_batch: int = 64):
+        self.llm = llm
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # model -> [(text, future, enqueued_at)]; only touched on self.loop
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future, float]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set = set()
+        self.metrics = BatcherMetrics()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+
+    async def embed(self, text: str, model: str) -> Embedding:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        pending = self._pending.setdefault(model, [])
+        pending.append((text, fut, time.perf_counter()))
+        if len(pending) >= self.max_batch:
+            self._flush(model, "full")
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(self.window, self._flush, model, "window")
+        return await fut
+
+    def embed_sync(self, text: str, model: str) -> Embedding:
+        if self.loop is None or not self.loop.is_running():
+            return self.llm.embed([text], model)[0]  # no app loop (scripts): plain call
+        return asyncio.run_coroutine_threadsafe(self.embed(text, model), self.loop).result()
+
+    def _flush(self, model: str, reason: str) -> None:
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(model, [])
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(model, batch, reason))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, model: str, batch: List[Tuple[str, asyncio.Future, float]], reason: str) -> None:
+        now = time.perf_counter()
+        unique = list(dict.fromkeys(text for text, _, _ in batch))  # same question twice -> one input
+        self.metrics.batch(reason, len(batch), len(unique), [now - t for _, _, t in batch])
+        try:
+            vecs = await self.llm.aembed(unique, model)
+        except Exception as e:
+            self.metrics.call(time.perf_counter() - now, ok=False)
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        self.metrics.call(time.perf_counter() - now, ok=True)
+        by_text = dict(zip(unique, vecs))
+        for text, fut, _ in batch:
+            if not fut.done():  # the caller may have been cancelled (client went away)
+                fut.set_result(by_text[text])
+
+    async def drain(self) -> None:
+        """Send whatever is still waiting and wait for in-flight batches (shutdown)."""
+        for model in list(self._pending):
+            self._flush(model, "window")
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.loop is not None,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            **self.metrics.stats(self.max_batch),
+        }
+
+
+# ---- process-wide instance (started in the app's lifespan, see app/main.py) ----
+_batcher: Optional[EmbedBatcher] = None
+
+
+def embed_batching_enabled() -> bool:
+    # EMBED_BATCH_WINDOW_MS=0 sends every question embedding on its own
+    return float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")) > 0
+
+
+def get_embed_batcher() -> Optional[EmbedBatcher]:
+    return _batcher
+
+
+async def start_embed_batcher() -> None:
+    global _batcher
+    if not embed_batching_enabled():
+        return
+    try:
+        llm = get_llm()
+    except RuntimeError:
+        return  # no API key; warm-up reports it (/health/ready)
+    _batcher = EmbedBatcher(
+        llm,
+        window_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")),
+        max_batch=int(os.getenv("EMBED_BATCH_MAX", "64")),  # the API takes up to 2048 inputs per call
+    )
+    _batcher.start(asyncio.get_running_loop())
+
+
+async def stop_embed_batcher() -> None:
+    global _batcher
+    if _batcher is not None:
+        await _batcher.drain()
+    _batcher = None
@@ -0,0 +1,269 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+Embedding = List[float]
+
+
+def normalize_text(text: str, casefold: bool = True) -> str:
+    # "What is the  Waiting period?" and "what is the waiting period?" share an entry
+    text = " ".join(text.split())
+    return text.lower() if casefold else text
+
+
+def cache_key(text: str, model: str, casefold: bool = True) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text, casefold)}".encode("utf-8")).hexdigest()
+
+
+def _to_bytes(vec: Sequence[float]) -> bytes:
+    return np.asarray(vec, dtype="<f4").tobytes()
+
+
+def _from_bytes(buf: bytes) -> Embedding:
+    return np.frombuffer(buf, dtype="<f4").tolist()
+
+
+# ---- persistent tiers ----
+class SqliteStore:
+    """On-disk second tier; one file, safe to share between worker processes."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache "
+            "(key TEXT PRIMARY KEY, model TEXT NOT NULL, embedding BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[str], max_age: Optional[float]) -> Dict[str, Embedding]:
+        if not keys:
+            return {}
+        cutoff = time.time() - max_age if max_age else 0.0
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, embedding FROM embedding_cache WHERE key IN ({marks}) AND created_at >= ?",
+                (*keys, cutoff),
+            ).fetchall()
+        return {k: _from_bytes(v) for k, v in rows}
+
+    def put_many(self, items: Dict[str, Embedding], model: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, model, embedding, created_at) VALUES (?, ?, ?, ?)",
+                [(k, model, _to_bytes(v), now) for k, v in items.items()],
+            )
+
+    def prune(self, max_age: float) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM embedding_cache WHERE created_at < ?", (time.time() - max_age,)
+            ).rowcount
+
+
+class PostgresStore:
+    """Second tier in the app database (table created by migration 8c3e7a1d2f60)."""
+
+    def __init__(self):
+        from app.db import engine
+        self._engine = engine
+
+    def get_many(self, keys: Sequence[str], max_age: Optional[float]) -> Dict[str, Embedding]:
+        from sqlalchemy import select, func
+        from app.models import EmbeddingCacheEntry as E
+        if not keys:
+            return {}
+        stmt = select(E.key, E.embedding).where(E.key.in_(list(keys)))
+        if max_age:
+            stmt = stmt.where(E.created_at >= func.now() - func.make_interval(0, 0, 0, 0, 0, 0, max_age))
+        with self._engine.connect() as conn:
+            return {k: _from_bytes(v) for k, v in conn.execute(stmt).all()}
+
+    def put_many(self, items: Dict[str, Embedding], model: str) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+        from app.models import EmbeddingCacheEntry as E
+        if not items:
+            return
+        from sqlalchemy import func
+        stmt = insert(E).values([{"key": k, "model": model, "embedding": _to_bytes(v)} for k, v in items.items()])
+        # like SQLite's INSERT OR REPLACE: a re-embedded key (e.g. expired) is fresh again
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[E.key],
+            set_={"embedding": stmt.excluded.embedding, "model": stmt.excluded.model, "created_at": func.now()},
+        )
+        with self._engine.begin() as conn:
+            conn.execute(stmt)
+
+    def prune(self, max_age: float) -> int:
+        from sqlalchemy import delete, func
+        from app.models import EmbeddingCacheEntry as E
+        stmt = delete(E).where(E.created_at < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, max_age))
+        with self._engine.begin() as conn:
+            return conn.execute(stmt).rowcount
+
+
+# ---- cache ----
+class EmbeddingCache:
+    """
+    Two-tier cache of text embeddings keyed by (model, normalised text).
+
+    L1 is an in-process LRU bounded by `maxsize` entries and `ttl` seconds.
+    L2 (optional) is a SqliteStore/PostgresStore that survives restarts; L2 hits
+    are promoted into L1. With `store_ttl`, expired L2 rows are ignored on read and
+    deleted on write, at most once every `prune_every` seconds.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: Optional[float] = 86400.0, store=None, store_ttl: Optional[float] = None,
+                 prune_every: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store = store
+        self.store_ttl = store_ttl
+        self.prune_every = prune_every
+        self._pruned_at: Optional[float] = None
+        self.pruned = 0
+        self._lru: "OrderedDict[str, tuple[float, Embedding]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingCache":
+        backend = os.getenv("EMBED_CACHE_BACKEND", "").lower()
+        if backend == "sqlite":
+            store = SqliteStore(os.getenv("EMBED_CACHE_PATH", ".cache/embeddings.sqlite"))
+        elif backend == "postgres":
+            store = PostgresStore()
+        elif backend in ("", "none", "memory"):
+            store = None
+        else:
+            raise RuntimeError(f"Unknown EMBED_CACHE_BACKEND: {backend}")
+        store_ttl = os.getenv("EMBED_CACHE_STORE_TTL")
+        return cls(
+            maxsize=int(os.getenv("EMBED_CACHE_SIZE", "2048")),
+            ttl=float(os.getenv("EMBED_CACHE_TTL", "86400")) or None,
+            store=store,
+            store_ttl=float(store_ttl) if store_ttl else None,
+            prune_every=float(os.getenv("EMBED_CACHE_PRUNE_EVERY", "300")),
+        )
+
+    # -- L1 --
+    def _local_get(self, key: str) -> Optional[Embedding]:
+        with self._lock:
+            item = self._lru.get(key)
+            if item is None:
+                return None
+            stored_at, vec = item
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return vec
+
+    def _local_put(self, key: str, vec: Embedding) -> None:
+        with self._lock:
+            self._lru[key] = (time.monotonic(), vec)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    # -- public --
+    def get_many(self, texts: Sequence[str], model: str, casefold: bool = True, local_only: bool = False) -> Dict[int, Embedding]:
+        """Cached embeddings by position in `texts`; missing positions are absent."""
+        keys = [cache_key(t, model, casefold) for t in texts]
+        found: Dict[int, Embedding] = {}
+        for i, k in enumerate(keys):
+            vec = self._local_get(k)
+            if vec is not None:
+                found[i] = vec
+        l1 = len(found)
+        l2 = 0
+        if self.store is not None and not local_only and len(found) < len(keys):
+            stored = self.store.get_many([k for i, k in enumerate(keys) if i not in found], self.store_ttl)
+            for i, k in enumerate(keys):
+                if i not in found and k in stored:
+                    found[i] = stored[k]
+                    self._local_put(k, stored[k])
+                    l2 += 1
+        with self._lock:
+            self.hits += l1
+            self.store_hits += l2
+            # a local-only probe is only a final miss when there is no second tier
+            if not local_only or self.store is None:
+                self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, texts: Sequence[str], vecs: Sequence[Embedding], model: str, casefold: bool = True) -> None:
+        items = {cache_key(t, model, casefold): list(v) for t, v in zip(texts, vecs)}
+        for k, v in items.items():
+            self._local_put(k, v)
+        if self.store is not None:
+            self.store.put_many(items, model)
+            self._maybe_prune()
+
+    def _maybe_prune(self) -> None:
+        if not self.store_ttl:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._pruned_at is not None and now - self._pruned_at < self.prune_every:
+                return
+            self._pruned_at = now
+        removed = self.store.prune(self.store_ttl)
+        with self._lock:
+            self.pruned += removed
+
+    def embed_many(
+        self,
+        texts: Sequence[str],
+        model: str,
+        embed_fn: Callable[[List[str]], List[Embedding]],
+        casefold: bool = True,
+    ) -> List[Embedding]:
+        """Embeddings for all `texts`, calling `embed_fn` once with only the (deduplicated) misses."""
+        found = self.get_many(texts, model, casefold)
+        missing: Dict[str, List[int]] = {}
+        for i in range(len(texts)):
+            if i not in found:
+                missing.setdefault(cache_key(texts[i], model, casefold), []).append(i)
+        if missing:
+            first = [positions[0] for positions in missing.values()]
+            fresh = embed_fn([texts[i] for i in first])
+            self.put_many([texts[i] for i in first], fresh, model, casefold)
+            for positions, vec in zip(missing.values(), fresh):
+                for i in positions:
+                    found[i] = vec
+        return [found[i] for i in range(len(texts))]
+
+    def embed_one(self, text: str, model: str, embed_fn: Callable[[str], Embedding]) -> Embedding:
+        return self.embed_many([text], model, lambda ts: [embed_fn(ts[0])])[0]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.store_hits + self.misses
+            return {
+                "size": len(self._lru),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "store_pruned": self.pruned,
+                "hit_ratio": (self.hits + self.store_hits) / lookups if lookups else 0.0,
+                "backend": type(self.store).__name__ if self.store else "memory",
+            }
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache.from_env()
@@ -0,0 +1,444 @@
+import hashlib
+import os
+import random
+import re
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import fitz  # PyMuPDF
+from openai import OpenAI, APIConnectionError, InternalServerError, RateLimitError
+from sqlalchemy import select, update, delete
+from sqlalchemy.orm import Session
+
+from app.bulk_load import chunk_row, deferred_vector_index, write_chunks
+from app.db import SessionLocal
+from app.embedding_cache import get_embedding_cache
+from app.models import PolicyDocument, PolicyChunk, PolicyVersion
+
+EMBED_MODEL = "text-embedding-3-small"  # 1536 dims
+
+MIN_CHARS = 180         # drop very tiny chunks
+TARGET_TOKENS = 120     # ~ chunk size (tweak)
+OVERLAP_TOKENS = 40     # ~ overlap (tweak)
+
+SECTION_HINTS = [
+    "Eligibility", "Exclusions", "Inclusions", "Coverage", "Waiting Period",
+    "Pre-existing", "Claim", "Cashless", "Documents Required", "Deductible",
+    "Co-pay", "Sum Insured", "Non-payable", "Consumables", "Network", "Definitions"
+]
+
+# policy_document.ingest_status
+IN_PROGRESS = "in_progress"
+COMPLETE = "complete"
+
+
+class Chunk(NamedTuple):
+    index: int              # position in the document
+    content: str
+    content_hash: str       # identity across runs and revisions: what is stored is not re-embedded
+    section_id: Optional[str]
+    page_from: int
+    page_to: int
+
+
+@dataclass
+class IngestJob:
+    pdf_path: str
+    uin: str
+    title: Optional[str] = None
+    doc_type: str = "policy_wording"
+    replaces: Optional[str] = None  # source_uri of the stored document this file is a renamed revision of
+
+
+@dataclass
+class IngestResult:
+    job: IngestJob
+    document_id: Optional[str] = None
+    chunks: int = 0
+    embedded: int = 0       # chunks embedded and stored by this run
+    kept: int = 0           # chunks already stored (earlier revision or interrupted run)
+    deleted: int = 0        # stale chunks of an earlier revision
+    skipped: bool = False   # same file already ingested
+    error: Optional[str] = None
+
+
+# ---- extraction + chunking (runs in worker processes) ----
+def to_paragraphs(text: str) -> List[str]:
+    """
+    Turn a page's text into paragraphs:
+    - split on blank lines
+    - re-wrap hard line breaks inside a block
+    """
+    blocks = re.split(r"\n\s*\n+", text)  # blank-line split
+    paras = []
+    for b in blocks:
+        # collapse single newlines inside a block
+        one = " ".join(ln.strip() for ln in b.splitlines() if ln.strip())
+        if one:
+            paras.append(one)
+    # if a page had no blank lines, fallback: treat each line as a para
+    if not paras:
+        paras = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    return paras
+
+
+def rough_token_count(text: str) -> int:
+    # crude but sufficient for chunking
+    return max(1, len(text.split()))
+
+
+def read_pdf(path: str):
+    doc = fitz.open(path)
+    pages = []
+    for i in range(doc.page_count):
+        txt = doc.load_page(i).get_text("text")
+        # normalize spaces; KEEP newlines for line/paragraph splitting
+        txt = re.sub(r"[ \t]+", " ", txt).strip()
+        pages.append((i + 1, txt))
+    doc.close()
+    return pages
+
+
+def guess_section(text: str):
+    for h in SECTION_HINTS:
+        if re.search(rf"\b{re.escape(h)}\b", text, re.I):
+            return h
+    return None
+
+
+def chunk_paragraphs(paras: List[str],
+                     target: int = TARGET_TOKENS,
+                     overlap: int = OVERLAP_TOKENS) -> List[str]:
+    """
+    Build chunks from paragraphs with token budget + overlap.
+    Returns list of chunk strings.
+    """
+    out, cur, size = [], [], 0
+    for para in paras:
+        t = rough_token_count(para)
+        if size + t > target and cur:
+            out.append("\n".join(cur))
+            # make overlap by keeping tail
+            keep, kept = [], 0
+            for p in reversed(cur):
+                if kept >= overlap:
+                    break
+                kept += rough_token_count(p)
+                keep.append(p)
+            cur = list(reversed(keep))
+            size = sum(rough_token_count(p) for p in cur)
+        cur.append(para)
+        size += t
+    if cur:
+        out.append("\n".join(cur))
+    # filter out tiny chunks
+    out = [c for c in out if len(c) >= MIN_CHARS]
+    return out
+
+
+def content_hash(text: str) -> str:
+    # same as encode(sha256(convert_to(content, 'UTF8')), 'hex'), used by the backfill in c9a41d7e5b28
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def extract_chunks(pdf_path: str, target: int = TARGET_TOKENS, overlap: int = OVERLAP_TOKENS) -> List[Chunk]:
+    """
+    PDF -> page-scoped chunks. CPU-bound, so the pipeline runs it in a process pool.
+    Repeated chunks (boilerplate printed on several pages) are kept once.
+    `target`/`overlap` are only overridden by app/scripts/eval_retrieval.py.
+    """
+    chunks: List[Chunk] = []
+    seen = set()
+    for pg, text in read_pdf(pdf_path):
+        paras = to_paragraphs(text)
+        if not paras:
+            continue
+        for body in chunk_paragraphs(paras, target, overlap):   # multiple chunks per page
+            h = content_hash(body)
+            if h in seen:
+                continue
+            seen.add(h)
+            chunks.append(Chunk(len(chunks), body, h, guess_section(body[:400]), pg, pg))
+    return chunks
+
+
+# ---- embedding (threads, bounded by embed_concurrency) ----
+RETRYABLE = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+@lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    # retries are handled by embed_with_retry so backoff is shared with our own limits
+    return OpenAI(api_key=api_key, max_retries=0)
+
+
+def embed_with_retry(texts: List[str], max_retries: int = 5, base_delay: float = 1.0) -> List[List[float]]:
+    """Embed one batch, retrying rate limits / transient errors with exponential backoff + jitter."""
+    def _embed(batch: List[str]) -> List[List[float]]:
+        for attempt in range(max_retries + 1):
+            try:
+                resp = get_client().embeddings.create(model=EMBED_MODEL, input=batch)
+                return [d.embedding for d in resp.data]
+            except RETRYABLE:
+                if attempt == max_retries:
+                    raise
+                time.sleep(base_delay * 2 ** attempt * (0.5 + random.random()))
+        raise AssertionError("unreachable")
+    # chunks seen before come from the embedding cache (case is kept for document text)
+    return get_embedding_cache().embed_many(texts, EMBED_MODEL, _embed, casefold=False)
+
+
+# ---- persistence ----
+def find_document(db: Session, policy_version_id: str, job: IngestJob) -> Optional[PolicyDocument]:
+    """
+    The stored document `job` updates: the one loaded from the same path or, for a
+    renamed revision (job.replaces), the one loaded from the old path, so only the
+    diff is embedded. Files are never matched by name or type alone: a policy version
+    can have several documents of one type.
+    """
+    uris = [job.pdf_path] + ([job.replaces] if job.replaces else [])
+    return db.execute(
+        select(PolicyDocument)
+        .where(PolicyDocument.policy_version_id == policy_version_id, PolicyDocument.source_uri.in_(uris))
+        .order_by(
+            PolicyDocument.source_uri != job.pdf_path,    # same path first (e.g. a resumed rename),
+            PolicyDocument.ingest_status == COMPLETE,     # then an unfinished run to resume
+        )
+    ).scalars().first()
+
+
+def replaced_documents(db: Session, policy_version_id: str, job: IngestJob, keep_id: str) -> List[str]:
+    """Documents still stored under job.replaces, other than the one `job` was written to."""
+    if not job.replaces or job.replaces == job.pdf_path:
+        return []
+    return list(db.execute(
+        select(PolicyDocument.id).where(
+            PolicyDocument.policy_version_id == policy_version_id,
+            PolicyDocument.source_uri == job.replaces,
+            PolicyDocument.id != keep_id,
+        )
+    ).scalars())
+
+
+def check_replacements(jobs: List[IngestJob]) -> Dict[str, str]:
+    """pdf_path -> error for jobs whose `replaces` clashes with another job of the same run."""
+    paths = {(j.uin, j.pdf_path) for j in jobs}
+    claimed: Dict[Tuple[str, str], str] = {}
+    errors: Dict[str, str] = {}
+    for j in jobs:
+        if not j.replaces:
+            continue
+        if (j.uin, j.replaces) in paths:
+            errors[j.pdf_path] = f"replaces {j.replaces}, which is also ingested in this run"
+        elif (j.uin, j.replaces) in claimed:
+            errors[j.pdf_path] = f"replaces {j.replaces}, already replaced by {claimed[(j.uin, j.replaces)]}"
+        else:
+            claimed[(j.uin, j.replaces)] = j.pdf_path
+    return errors
+
+
+def find_ingested_file(db: Session, policy_version_id: str, fhash: str) -> Optional[PolicyDocument]:
+    """A completed document of this policy version with identical file bytes, wherever it was loaded from."""
+    return db.execute(
+        select(PolicyDocument).where(
+            PolicyDocument.policy_version_id == policy_version_id,
+            PolicyDocument.file_hash == fhash,
+            PolicyDocument.ingest_status == COMPLETE,
+        )
+    ).scalars().first()
+
+
+def stored_chunks(db: Session, document_id: str) -> Dict[str, Tuple[str, Optional[int], Optional[int], Optional[str]]]:
+    """content_hash -> (id, page_from, page_to, chunk_index) of the chunks stored for a document."""
+    rows = db.execute(
+        select(
+            PolicyChunk.content_hash, PolicyChunk.id, PolicyChunk.page_from, PolicyChunk.page_to,
+            PolicyChunk.policy_chunk_metadata["chunk_index"].astext,
+        ).where(PolicyChunk.document_id == document_id)
+    ).all()
+    return {h: (cid, pf, pt, idx) for h, cid, pf, pt, idx in rows}
+
+
+def store_batch(db: Session, doc: PolicyDocument, chunks: List[Chunk], vecs: List[List[float]],
+                method: str = "copy") -> None:
+    write_chunks(db, [
+        chunk_row(
+            doc.policy_version_id, doc.id, c.content, vec,
+            section_id=c.section_id, page_from=c.page_from, page_to=c.page_to,
+            metadata={"chunk_index": c.index}, content_hash=c.content_hash,
+        )
+        for c, vec in zip(chunks, vecs)
+    ], method)
+
+
+def ingest_document(
+    db: Session,
+    job: IngestJob,
+    policy_version_id: str,
+    fhash: str,
+    chunks: List[Chunk],
+    embedders: ThreadPoolExecutor,
+    batch_size: int = 32,
+    max_retries: int = 5,
+    insert_method: str = "copy",
+) -> IngestResult:
+    """
+    Bring the stored chunks of one document in line with `chunks`, committing after every batch.
+
+    Chunks are matched by content hash, so only new or changed text is embedded:
+    a revised PDF costs the size of its diff (also when it was renamed and the job
+    says which file it replaces, see find_document), and an interrupted run resumes
+    where it stopped. Stale chunks of the previous revision are deleted, and positions
+    of kept chunks updated, in the same transaction that marks the document complete.
+    """
+    result = IngestResult(job=job, chunks=len(chunks))
+    doc = find_document(db, policy_version_id, job)
+    if doc is None:
+        doc = PolicyDocument(
+            policy_version_id=policy_version_id,
+            doc_type=job.doc_type,
+            source_uri=job.pdf_path,
+            title=job.title or os.path.basename(job.pdf_path),
+        )
+        db.add(doc)
+    elif doc.source_uri != job.pdf_path:
+        print(f"[ingest] {job.pdf_path}: revises {doc.source_uri}")
+        doc.source_uri = job.pdf_path
+        doc.title = job.title or os.path.basename(job.pdf_path)
+    doc.file_hash = fhash
+    doc.ingest_status = IN_PROGRESS
+    doc.chunk_count = len(chunks)
+    db.commit()
+    result.document_id = doc.id
+
+    stored = stored_chunks(db, doc.id)
+    todo = [c for c in chunks if c.content_hash not in stored]
+    result.kept = len(chunks) - len(todo)
+
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    futures = {
+        embedders.submit(embed_with_retry, [c.content for c in batch], max_retries): batch
+        for batch in batches
+    }
+    try:
+        for fut in as_completed(futures):
+            batch = futures[fut]
+            store_batch(db, doc, batch, fut.result(), insert_method)
+            db.commit()  # progress is durable per batch; a re-run picks up from here
+            result.embedded += len(batch)
+            print(f"[ingest] {doc.title}: {result.kept + result.embedded}/{len(chunks)} chunks")
+    except BaseException:
+        for fut in futures:
+            fut.cancel()
+        raise
+
+    wanted = {c.content_hash: c for c in chunks}
+    stale = [cid for h, (cid, *_rest) in stored.items() if h not in wanted]
+    moved = [
+        {"id": cid, "page_from": c.page_from, "page_to": c.page_to, "policy_chunk_metadata": {"chunk_index": c.index}}
+        for h, (cid, pf, pt, idx) in stored.items()
+        if (c := wanted.get(h)) and (pf, pt, idx) != (c.page_from, c.page_to, str(c.index))
+    ]
+    if stale:
+        db.execute(delete(PolicyChunk).where(PolicyChunk.id.in_(stale)))
+    if moved:
+        db.execute(update(PolicyChunk), moved)
+    result.deleted = len(stale)
+    replaced = replaced_documents(db, policy_version_id, job, doc.id)
+    if replaced:  # the old file was also stored under the new path by an earlier run
+        result.deleted += db.execute(delete(PolicyChunk).where(PolicyChunk.document_id.in_(replaced))).rowcount
+        db.execute(delete(PolicyDocument).where(PolicyDocument.id.in_(replaced)))
+    doc.ingest_status = COMPLETE
+    db.commit()
+    return result
+
+
+# ---- pipeline ----
+def ingest_many(
+    jobs: List[IngestJob],
+    workers: int = 4,
+    embed_concurrency: int = 4,
+    batch_size: int = 32,
+    max_retries: int = 5,
+    insert_method: str = "copy",
+    defer_index: bool = False,
+) -> List[IngestResult]:
+    """
+    Ingest many PDFs:
+      1) PyMuPDF extraction + chunking in a process pool (`workers` processes)
+      2) embedding batches on a shared thread pool (`embed_concurrency` requests in flight)
+      3) bulk insert into policy_chunk (COPY, or batched INSERT), one commit per batch
+
+    With `defer_index` the ANN index is dropped for the load and rebuilt once at the end.
+    Files whose bytes were already ingested for the policy version are skipped before
+    extraction. A changed file at a known path (or at a new path, with `replaces` set to
+    the old one), or one left in progress by an interrupted run, only embeds the chunks
+    that are not stored yet (see ingest_document).
+    A failing document is reported in its result and does not stop the others.
+    """
+    results: List[IngestResult] = []
+    pvids: Dict[str, str] = {}
+    pending: List[IngestJob] = []
+    fhashes: Dict[str, str] = {}
+
+    clashes = check_replacements(jobs)
+    db = SessionLocal()
+    try:
+        for job in jobs:
+            if job.pdf_path in clashes:
+                results.append(IngestResult(job=job, error=clashes[job.pdf_path]))
+                continue
+            try:
+                if job.uin not in pvids:
+                    pvids[job.uin] = PolicyVersion.id_from_uin(db, job.uin)
+                fhashes[job.pdf_path] = file_hash(job.pdf_path)
+            except (ValueError, OSError) as e:
+                results.append(IngestResult(job=job, error=f"{type(e).__name__}: {e}"))
+                continue
+            doc = find_ingested_file(db, pvids[job.uin], fhashes[job.pdf_path])
+            # a rename with unchanged bytes still goes through ingest_document, which moves it (embedding nothing)
+            if doc is not None and not (job.replaces and doc.source_uri == job.replaces):
+                print(f"[skip] {job.pdf_path}: unchanged, already ingested as {doc.source_uri} ({doc.chunk_count} chunks)")
+                results.append(IngestResult(job=job, document_id=doc.id, chunks=doc.chunk_count or 0, skipped=True))
+                continue
+            pending.append(job)
+
+        if not pending:
+            return results
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as procs, \
+                ThreadPoolExecutor(max_workers=embed_concurrency) as embedders, \
+                (deferred_vector_index(db) if defer_index else nullcontext()):
+            extracted = {procs.submit(extract_chunks, job.pdf_path): job for job in pending}
+            # store documents as their extraction finishes, while the rest are still parsing
+            for fut in as_completed(extracted):
+                job = extracted[fut]
+                try:
+                    chunks = fut.result()
+                    if not chunks:
+                        raise ValueError("no text extracted from PDF (scanned image?)")
+                    res = ingest_document(db, job, pvids[job.uin], fhashes[job.pdf_path], chunks, embedders,
+                                          batch_size, max_retries, insert_method)
+                except Exception as e:
+                    db.rollback()
+                    res = IngestResult(job=job, error=f"{type(e).__name__}: {e}")
+                    print(f"[error] {job.pdf_path}: {res.error}")
+                results.append(res)
+    finally:
+        db.close()
+    return results
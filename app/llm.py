@@ -0,0 +1,365 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Sequence
+
+# The OpenAI SDK is imported when the client is built (it is most of the app's import
+# time); the error helpers below only run once a client exists, so theirs is a dict lookup.
+
+# 408/409 are OpenAI's "retry me" statuses besides 429 and 5xx
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def rough_tokens(text: str) -> int:
+    # ~4 chars per token for English; only used to pace TPM before the real usage is known
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Budget of `per_minute` units refilled continuously (0 = unlimited). `reserve` takes the
+    units right away, going into debt if needed, and returns how long the caller must wait
+    before using them; later callers queue behind that debt, so waits come out FIFO.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(self.per_minute, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= min(amount, self.per_minute)  # an oversized request waits a full minute, not forever
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def settle(self, reserved: float, actual: float) -> None:
+        """Correct a reservation once the real usage is known."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self.level = min(self.per_minute, self.level + reserved - actual)
+
+
+class LLMMetrics:
+    """Queue depth, in-flight calls, retries/errors by status and recent latency percentiles."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls: Counter = Counter()
+        self.retries = 0
+        self.errors: Counter = Counter()  # by HTTP status, "connection" for transport errors
+        self.tokens = 0
+        self._latency: Dict[str, Deque[float]] = {}
+        self._wait: Deque[float] = deque(maxlen=window)
+        self._window = window
+
+    def queued(self, delta: int) -> None:
+        with self._lock:
+            self.waiting += delta
+
+    def waited(self, seconds: float) -> None:
+        with self._lock:
+            self._wait.append(seconds)
+
+    def started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, kind: str, seconds: float, tokens: int = 0, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.calls[kind] += 1
+            self.tokens += tokens
+            if error:
+                self.errors[error] += 1
+            else:
+                self._latency.setdefault(kind, deque(maxlen=self._window)).append(seconds)
+
+    def retried(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    @staticmethod
+    def _pct(samples: Sequence[float]) -> Dict[str, float]:
+        if not samples:
+            return {"p50_ms": 0.0, "p95_ms": 0.0}
+        s = sorted(samples)
+        return {"p50_ms": s[len(s) // 2] * 1000, "p95_ms": s[min(len(s) - 1, int(0.95 * len(s)))] * 1000}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "waiting": self.waiting,
+                "in_flight": self.in_flight,
+                "calls": dict(self.calls),
+                "retries": self.retries,
+                "errors": {str(k): v for k, v in self.errors.items()},
+                "tokens": self.tokens,
+                "queue_wait": self._pct(self._wait),
+                "latency": {k: self._pct(v) for k, v in self._latency.items()},
+            }
+
+
+def _error_key(e: Exception) -> str:
+    from openai import APIStatusError
+    return str(e.status_code) if isinstance(e, APIStatusError) else "connection"
+
+
+def _retryable(e: Exception) -> bool:
+    from openai import APIConnectionError, APIStatusError
+    # APITimeoutError is an APIConnectionError
+    return isinstance(e, APIConnectionError) or (isinstance(e, APIStatusError) and e.status_code in RETRY_STATUS)
+
+
+class LLMClient:
+    """
+    The process's OpenAI clients (sync for the threadpool routes, async for the rest),
+    sharing keep-alive HTTP pools, an outbound concurrency cap, RPM/TPM token buckets,
+    retries with jittered exponential backoff (honouring Retry-After) and metrics.
+
+    The SDK's own retries are off so every attempt is paced and counted here.
+    The concurrency cap applies to the sync and the async client separately;
+    the RPM/TPM budgets are shared.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 16,
+        rpm: float = 0,
+        tpm: float = 0,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        timeout: float = 60.0,
+        max_connections: int = 64,
+        max_keepalive: int = 32,
+        completion_tokens: int = 512,
+    ):
+        from openai import DEFAULT_CONNECTION_LIMITS, AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+        # the Limits class of whichever httpx build the SDK was installed with
+        limits = type(DEFAULT_CONNECTION_LIMITS)(
+            max_connections=max_connections, max_keepalive_connections=max_keepalive, keepalive_expiry=30.0,
+        )
+        self.sync = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                           http_client=DefaultHttpxClient(limits=limits))
+        self.aio = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                               http_client=DefaultAsyncHttpxClient(limits=limits))
+        self.max_concurrency = max_concurrency
+        self._sem = threading.BoundedSemaphore(max_concurrency)
+        self._asem = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.completion_tokens = completion_tokens  # TPM reservation for the answer, settled from usage
+        self.metrics = LLMMetrics()
+
+    @classmethod
+    def from_env(cls) -> "LLMClient":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("OPENAI_API_KEY is not set")
+        return cls(
+            api_key=api_key,
+            base_url=os.getenv("OPENAI_BASE_URL") or None,  # e.g. app/scripts/fake_openai.py for offline runs
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+            rpm=float(os.getenv("LLM_RPM", "0")),
+            tpm=float(os.getenv("LLM_TPM", "0")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+            timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "64")),
+            max_keepalive=int(os.getenv("LLM_MAX_KEEPALIVE", "32")),
+        )
+
+    # ---- pacing ----
+    def _reserve(self, est_tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(est_tokens))
+
+    def _backoff(self, attempt: int, e: Exception) -> float:
+        from openai import APIStatusError
+        retry_after = e.response.headers.get("retry-after") if isinstance(e, APIStatusError) else None
+        try:
+            if retry_after:
+                return min(float(retry_after), 60.0)
+        except ValueError:
+            pass  # HTTP-date form; fall back to our own backoff
+        return min(self.base_delay * (2 ** attempt), 30.0) * (0.5 + random.random())
+
+    def _used(self, est_tokens: int, resp: Any) -> int:
+        usage = getattr(resp, "usage", None)
+        actual = int(getattr(usage, "total_tokens", 0) or 0)
+        if actual:
+            self.tokens.settle(est_tokens, actual)
+        return actual
+
+    # ---- sync ----
+    def _paced(self, wait: float) -> None:
+        if wait:
+            self.metrics.queued(1)
+            try:
+                time.sleep(wait)
+            finally:
+                self.metrics.queued(-1)
+
+    @contextmanager
+    def _slot(self) -> Iterator[None]:
+        t0 = time.perf_counter()
+        self.metrics.queued(1)
+        try:
+            self._sem.acquire()
+        finally:
+            self.metrics.queued(-1)
+        self.metrics.waited(time.perf_counter() - t0)
+        try:
+            yield
+        finally:
+            self._sem.release()
+
+    def _call(self, kind: str, est_tokens: int, fn: Callable[[], Any]) -> Any:
+        for attempt in range(self.max_retries + 1):
+            self._paced(self._reserve(est_tokens))
+            with self._slot():
+                self.metrics.started()
+                t0 = time.perf_counter()
+                try:
+                    resp = fn()
+                except Exception as e:
+                    self.metrics.finished(kind, time.perf_counter() - t0, error=_error_key(e))
+                    if not _retryable(e) or attempt == self.max_retries:
+                        raise
+                    delay = self._backoff(attempt, e)
+                else:
+                    self.metrics.finished(kind, time.perf_counter() - t0, self._used(est_tokens, resp))
+                    return resp
+            self.metrics.retried()
+            time.sleep(delay)
+
+    def embed(self, texts: List[str], model: str) -> List[List[float]]:
+        resp = self._call("embed", sum(rough_tokens(t) for t in texts),
+                          lambda: self.sync.embeddings.create(model=model, input=texts))
+        return [d.embedding for d in resp.data]
+
+    def chat(self, messages: List[Dict[str, str]], model: str, **kwargs: Any):
+        est = sum(rough_tokens(m["content"]) for m in messages) + self.completion_tokens
+        return self._call("chat", est, lambda: self.sync.chat.completions.create(model=model, messages=messages, **kwargs))
+
+    # ---- async ----
+    async def _apaced(self, wait: float) -> None:
+        if wait:
+            self.metrics.queued(1)
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.metrics.queued(-1)
+
+    @asynccontextmanager
+    async def _aslot(self) -> AsyncIterator[None]:
+        t0 = time.perf_counter()
+        self.metrics.queued(1)
+        try:
+            await self._asem.acquire()
+        finally:
+            self.metrics.queued(-1)
+        self.metrics.waited(time.perf_counter() - t0)
+        try:
+            yield
+        finally:
+            self._asem.release()
+
+    async def _acall(self, kind: str, est_tokens: int, fn: Callable[[], Any], slot: bool = True) -> Any:
+        # slot=False: the caller already holds one (streams)
+        for attempt in range(self.max_retries + 1):
+            await self._apaced(self._reserve(est_tokens))
+            async with (self._aslot() if slot else nullcontext()):
+                self.metrics.started()
+                t0 = time.perf_counter()
+                try:
+                    resp = await fn()
+                except Exception as e:
+                    self.metrics.finished(kind, time.perf_counter() - t0, error=_error_key(e))
+                    if not _retryable(e) or attempt == self.max_retries:
+                        raise
+                    delay = self._backoff(attempt, e)
+                else:
+                    self.metrics.finished(kind, time.perf_counter() - t0, self._used(est_tokens, resp))
+                    return resp
+            self.metrics.retried()
+            await asyncio.sleep(delay)
+
+    async def aembed(self, texts: List[str], model: str) -> List[List[float]]:
+        resp = await self._acall("embed", sum(rough_tokens(t) for t in texts),
+                                 lambda: self.aio.embeddings.create(model=model, input=texts))
+        return [d.embedding for d in resp.data]
+
+    async def achat(self, messages: List[Dict[str, str]], model: str, **kwargs: Any):
+        est = sum(rough_tokens(m["content"]) for m in messages) + self.completion_tokens
+        return await self._acall("chat", est, lambda: self.aio.chat.completions.create(
+            model=model, messages=messages, **kwargs))
+
+    @asynccontextmanager
+    async def achat_stream(self, messages: List[Dict[str, str]], model: str, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Open a streamed completion. Opening is retried like any call; once tokens flow
+        the stream is the caller's. The concurrency slot is held until the stream closes.
+        """
+        est = sum(rough_tokens(m["content"]) for m in messages) + self.completion_tokens
+        async with self._aslot():
+            stream = await self._acall("chat_stream", est, lambda: self.aio.chat.completions.create(
+                model=model, messages=messages, stream=True, **kwargs), slot=False)
+            async with stream:
+                yield stream
+
+    # ---- lifecycle ----
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "rpm": self.requests.per_minute,
+            "tpm": self.tokens.per_minute,
+            **self.metrics.stats(),
+        }
+
+    async def aclose(self) -> None:
+        await self.aio.close()
+        self.sync.close()
+
+
+# ---- process-wide instance (created during warm-up, see app/warmup.py) ----
+_llm: Optional[LLMClient] = None
+_llm_lock = threading.Lock()
+
+
+def get_llm() -> LLMClient:
+    """The shared client; created on first use outside the app (scripts, tests)."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = LLMClient.from_env()
+    return _llm
+
+
+def current_llm() -> Optional[LLMClient]:
+    """The shared client if one exists; never creates it."""
+    return _llm
+
+
+async def close_llm() -> None:
+    global _llm
+    if _llm is not None:
+        await _llm.aclose()
+        _llm = None
@@ -1,17 +1,52 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager, suppress
+
 import uvicorn
-from fastapi import FastAPI
-from app.db import engine
-from app import models
+from fastapi import FastAPI, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from app import metrics
+from app.embed_batcher import stop_embed_batcher
+from app.llm import close_llm
+from app.responses import FastJSONResponse
+from app.traces import close_trace_sink
+from app.vector_index import stop_vector_index_listener
+from app.warmup import get_warmup, warmup_blocking
 from app.routes.policy_versions import router as policy_versions_router
 from app.routes.catalog import router as catalog_router
 from app.routes.chat import router as chat_router
+from app.routes.chat_async import router as chat_async_router
+from app.routes.health import PoolTimeoutError, pool_timeout_handler, router as health_router
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-# Create all tables if not already created (optional if using Alembic)
-models.Base.metadata.create_all(bind=engine)
+# Schema is Alembic's job: nothing touches the DB at import. SCHEMA_CHECK=alembic|create_all
+# runs a check (or the old create_all) as a warm-up step instead, see app/warmup.py.
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # pools, LLM client, tokenizer and caches warm up in the background; /health/ready reports it
+    # (failed steps keep retrying in the same task until they pass)
+    warmup = asyncio.create_task(get_warmup().run())
+    if warmup_blocking():
+        await get_warmup().first_pass.wait()
+    yield
+    warmup.cancel()
+    with suppress(asyncio.CancelledError):
+        await warmup
+    await stop_embed_batcher()
+    await close_llm()
+    close_trace_sink()
+    stop_vector_index_listener()
 
-app = FastAPI(title="Insurance Policy Bot API")
+# plain dict/list results are encoded by FastJSONResponse (orjson) unless a route says otherwise
+app = FastAPI(title="Insurance Policy Bot API", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# gzip for clients that accept it; small bodies and SSE streams (text/event-stream) are left alone.
+# Catalog pages compress ~20x. GZIP_MIN_BYTES=0 disables.
+if int(os.getenv("GZIP_MIN_BYTES", "1024")) > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_BYTES", "1024")),
+                       compresslevel=int(os.getenv("GZIP_LEVEL", "5")))
 
 BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "static"
@@ -27,6 +62,15 @@ def index():
 app.include_router(policy_versions_router)
 app.include_router(catalog_router)
 app.include_router(chat_router)
+app.include_router(chat_async_router)
+app.include_router(health_router)
+app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+
+# Prometheus scrape endpoint: stage/request latency histograms, token counters, cache/pool/LLM gauges
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/")
 def read_root():
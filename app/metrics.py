@@ -0,0 +1,186 @@
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Prometheus metrics for /metrics, plus OpenTelemetry spans for the same stages when
+# opentelemetry-api is installed (no-op until an SDK/exporter is configured, e.g. by
+# running under `opentelemetry-instrument`).
+try:
+    from opentelemetry import trace as _otel_trace
+    _tracer = _otel_trace.get_tracer("app")
+except ImportError:  # optional dependency
+    _tracer = None
+
+# set by request() so stage() can label its samples with the route without threading it through
+_route: ContextVar[str] = ContextVar("metrics_route", default="other")
+
+_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "bot_stage_seconds", "Time spent per request stage",
+    ["route", "stage"], buckets=_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "bot_request_seconds", "End-to-end chat request time (stream: until the stream is handed over)",
+    ["route", "outcome"], buckets=_BUCKETS,
+)
+PROMPT_TOKENS = Histogram(
+    "bot_prompt_tokens", "Tokens in the packed chat prompt (see app/prompt.py)",
+    ["route"], buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+LLM_TOKENS = Counter(
+    "bot_llm_tokens", "LLM tokens used by chat answers",
+    ["model", "uin", "kind"],
+)
+# one series per UIN is fine for a catalog of hundreds; METRICS_PER_UIN=0 folds them into "all"
+_PER_UIN = os.getenv("METRICS_PER_UIN", "1").lower() not in ("0", "false", "no")
+
+
+@contextmanager
+def stage(name: str, route: Optional[str] = None) -> Iterator[None]:
+    """
+    Time one stage of the current request (uin_resolve, embed, hybrid_query, mmr, llm, ...).
+    `route` is only needed outside request(), e.g. in an SSE generator that runs after the handler returned.
+    """
+    span = _tracer.start_as_current_span(f"chat.{name}") if _tracer else nullcontext()
+    t0 = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.labels(route or _route.get(), name).observe(time.perf_counter() - t0)
+
+
+def observe(name: str, seconds: float, route: Optional[str] = None) -> None:
+    """Record a stage measured by hand (e.g. time to the first streamed token)."""
+    STAGE_SECONDS.labels(route or _route.get(), name).observe(seconds)
+
+
+def current_route() -> str:
+    return _route.get()
+
+
+class RequestTimer:
+    outcome = "answered"  # handlers set "cached" for answer-cache hits; exceptions record "error"
+
+
+@contextmanager
+def request(route: str) -> Iterator[RequestTimer]:
+    token = _route.set(route)
+    timer = RequestTimer()
+    span = _tracer.start_as_current_span(f"chat {route}") if _tracer else nullcontext()
+    t0 = time.perf_counter()
+    try:
+        with span:
+            yield timer
+    except Exception:
+        timer.outcome = "error"
+        raise
+    finally:
+        REQUEST_SECONDS.labels(route, timer.outcome).observe(time.perf_counter() - t0)
+        _route.reset(token)
+
+
+def record_tokens(model: str, uin: str, usage: Any) -> None:
+    """Count prompt/completion tokens from an OpenAI usage object or dict."""
+    if not usage:
+        return
+    get = usage.get if isinstance(usage, dict) else lambda k: getattr(usage, k, 0)
+    uin = uin if _PER_UIN else "all"
+    LLM_TOKENS.labels(model, uin, "prompt").inc(get("prompt_tokens") or 0)
+    LLM_TOKENS.labels(model, uin, "completion").inc(get("completion_tokens") or 0)
+
+
+# ---- scrape-time gauges from the components' own stats() ----
+class _StatsCollector:
+    """Cache hit ratios, DB pool, LLM client and vector index figures, read at scrape time."""
+
+    def describe(self):
+        return []  # don't collect (and import the DB layer) at registration
+
+    def collect(self):
+        from app.answer_cache import get_answer_cache
+        from app.catalog_cache import get_catalog_cache
+        from app.db import pool_monitor
+        from app.db_async import async_pool_monitor
+        from app.embed_batcher import get_embed_batcher
+        from app.embedding_cache import get_embedding_cache
+        from app.llm import current_llm
+        from app.routes import health
+        from app.vector_index import get_vector_index, vector_index_enabled
+
+        emb = get_embedding_cache().stats()
+        ans = get_answer_cache().stats()
+        cat = get_catalog_cache().stats()
+        lookups = CounterMetricFamily("bot_cache_lookups", "Cache lookups by result", labels=["cache", "result"])
+        lookups.add_metric(["embedding", "hit"], emb["hits"])
+        lookups.add_metric(["embedding", "store_hit"], emb["store_hits"])
+        lookups.add_metric(["embedding", "miss"], emb["misses"])
+        lookups.add_metric(["answer", "hit"], ans["hits"])
+        lookups.add_metric(["answer", "miss"], ans["misses"])
+        lookups.add_metric(["catalog", "hit"], cat["hits"])
+        lookups.add_metric(["catalog", "not_modified"], cat["not_modified"])
+        lookups.add_metric(["catalog", "miss"], cat["misses"])
+        yield lookups
+        ratio = GaugeMetricFamily("bot_cache_hit_ratio", "Hit ratio since start", labels=["cache"])
+        ratio.add_metric(["embedding"], emb["hit_ratio"])
+        ratio.add_metric(["answer"], ans["hit_ratio"])
+        ratio.add_metric(["catalog"], cat["hit_ratio"])
+        yield ratio
+        yield CounterMetricFamily("bot_answer_cache_tokens_saved", "LLM tokens saved by answer-cache hits",
+                                  value=ans["tokens_saved"])
+
+        conns = GaugeMetricFamily("bot_db_pool_connections", "Pooled DB connections", labels=["engine", "state"])
+        peak = GaugeMetricFamily("bot_db_pool_peak_checked_out", "Most connections checked out at once",
+                                 labels=["engine"])
+        size = GaugeMetricFamily("bot_db_pool_size", "Configured pool size (without overflow)", labels=["engine"])
+        for name, monitor in (("sync", pool_monitor), ("async", async_pool_monitor)):
+            s = monitor.stats()
+            for state in ("checked_out", "checked_in", "overflow"):
+                if s[state] is not None:
+                    # QueuePool.overflow() goes negative while the pool is not yet full
+                    conns.add_metric([name, state], max(s[state], 0))
+            peak.add_metric([name], s["peak_checked_out"])
+            if s["size"] is not None:
+                size.add_metric([name], s["size"])
+        yield conns
+        yield peak
+        yield size
+        yield CounterMetricFamily("bot_db_pool_timeouts", "Requests shed because no connection was free",
+                                  value=health.pool_timeouts)
+
+        client = current_llm()
+        if client is not None:
+            llm = client.stats()
+            yield GaugeMetricFamily("bot_llm_queue_depth", "LLM calls waiting for a slot or rate budget",
+                                    value=llm["waiting"])
+            yield GaugeMetricFamily("bot_llm_in_flight", "LLM calls in flight", value=llm["in_flight"])
+            yield CounterMetricFamily("bot_llm_retries", "LLM call retries", value=llm["retries"])
+            errors = CounterMetricFamily("bot_llm_errors", "Failed LLM attempts by status", labels=["status"])
+            for status, n in llm["errors"].items():
+                errors.add_metric([status], n)
+            yield errors
+
+        batcher = get_embed_batcher()
+        if batcher is not None:
+            b = batcher.stats()
+            yield CounterMetricFamily("bot_embed_batches", "Embedding micro-batches sent", value=b["batches"])
+            yield CounterMetricFamily("bot_embed_batch_items", "Questions sent in micro-batches", value=b["items"])
+
+        if vector_index_enabled():
+            v = get_vector_index().stats()
+            yield GaugeMetricFamily("bot_vector_index_bytes", "In-process vector index size", value=v["bytes"])
+            yield GaugeMetricFamily("bot_vector_index_policies", "Policies in the vector index",
+                                    value=v["policies"])
+
+
+REGISTRY.register(_StatsCollector())
+
+
+def render() -> tuple:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,5 +1,5 @@
-from sqlalchemy import String, Date, Integer, Text, ForeignKey, CheckConstraint, Index, select
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import String, Date, DateTime, Integer, Text, LargeBinary, ForeignKey, CheckConstraint, Computed, Index, select, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship, Session
 from pgvector.sqlalchemy import Vector
 from app.db import Base
@@ -15,6 +15,9 @@ class Insurer(Base):
     name: Mapped[str] = mapped_column(String, nullable=False)
     products = relationship("Product", back_populates="insurer", cascade="all, delete-orphan")
 
+    # plus ix_insurer_name_trgm (gin_trgm_ops, migration 0b6e5f9a3c18) for /catalog typeahead
+    __table_args__ = (Index("ix_insurer_name", "name"),)
+
 # --- Product ---
 class Product(Base):
     __tablename__ = "product"
@@ -26,7 +29,10 @@ class Product(Base):
     insurer = relationship("Insurer", back_populates="products")
     policy_versions = relationship("PolicyVersion", back_populates="product", cascade="all, delete-orphan")
     
-    __table_args__ = (CheckConstraint("line_of_business in ('health','motor')", name="ck_lob"),)
+    __table_args__ = (
+        CheckConstraint("line_of_business in ('health','motor')", name="ck_lob"),
+        Index("ix_product_insurer", "insurer_id"),
+    )
 
 # --- PolicyVersion (the glue between product and docs/chunks) ---
 class PolicyVersion(Base):
@@ -49,6 +55,8 @@ class PolicyVersion(Base):
     __table_args__ = (
         Index("ix_policy_version_product", "product_id"),
         Index("ix_policy_version_approval_date", "approval_date"),
+        Index("ix_policy_version_type_of_product", "type_of_product"),
+        # plus ix_policy_version_uin_trgm (gin_trgm_ops, migration 0b6e5f9a3c18) for /catalog typeahead
         CheckConstraint(
             "product_type IN ('individual','family_floater','group','revision','top_up','other') OR product_type IS NULL",
             name="ck_policy_version_product_type"
@@ -71,10 +79,19 @@ class PolicyDocument(Base):
     doc_type: Mapped[str]          = mapped_column(String)  # policy_wording | rider | faq | brochure
     source_uri: Mapped[str]        = mapped_column(String)
     title: Mapped[str | None]      = mapped_column(String, nullable=True)
+    # ingestion progress (app/ingest.py): in_progress | complete, and the expected number of chunks
+    ingest_status: Mapped[str | None] = mapped_column(String, nullable=True)
+    chunk_count: Mapped[int | None]   = mapped_column(Integer, nullable=True)
+    file_hash: Mapped[str | None]     = mapped_column(String, nullable=True)  # sha256 of the source file
 
     policy_version = relationship("PolicyVersion", back_populates="documents")
     chunks         = relationship("PolicyChunk", back_populates="document", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_policy_document_file_hash", "policy_version_id", "file_hash"),
+        Index("ix_policy_document_version_type", "policy_version_id", "doc_type", "id"),  # latest wording per version
+    )
+
     # Helper: create by UIN (no need to look up UUID outside)
     @classmethod
     def new_for_uin(cls, db: Session, uin: str, **kwargs) -> "PolicyDocument":
@@ -94,6 +111,9 @@ class PolicyChunk(Base):
     page_from: Mapped[int | None]  = mapped_column(Integer, nullable=True)
     page_to: Mapped[int | None]    = mapped_column(Integer, nullable=True)
     content: Mapped[str]           = mapped_column(Text, nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(String, nullable=True)  # sha256 of content
+    # full-text side of hybrid retrieval (app/retrieval.py), maintained by Postgres
+    content_tsv: Mapped[str | None]  = mapped_column(TSVECTOR, Computed("to_tsvector('english', content)", persisted=True))
 
     # IMPORTANT: avoid reserved name "metadata" on the Python side.
     # Keep DB column name as "metadata" but expose it as policy_chunk_metadata in Python.
@@ -104,10 +124,52 @@ class PolicyChunk(Base):
     policy_version = relationship("PolicyVersion", back_populates="chunks")
     document       = relationship("PolicyDocument", back_populates="chunks")
 
+    __table_args__ = (
+        Index("ix_policy_chunk_policy_version", "policy_version_id"),
+        Index("ix_policy_chunk_document_hash", "document_id", "content_hash"),
+        Index("ix_policy_chunk_content_tsv", "content_tsv", postgresql_using="gin"),
+        # ANN index for ORDER BY embedding <=> :qvec (see migration 5b1f0c2a9d41)
+        Index(
+            "idx_policy_chunk_embedding", "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
+
     # Helper: create by UIN + doc id
     @classmethod
     def new_for_uin_and_doc(cls, db: Session, uin: str, document_id: str, **kwargs) -> "PolicyChunk":
         pv_id = PolicyVersion.id_from_uin(db, uin)
         obj = cls(policy_version_id=pv_id, document_id=document_id, **kwargs)
         #db.add(obj)
-        return obj
\ No newline at end of file
+        return obj
+
+# --- EmbeddingCacheEntry (persistent tier of app/embedding_cache.py) ---
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+    # sha256 of model + normalised text
+    key: Mapped[str]          = mapped_column(String, primary_key=True)
+    model: Mapped[str]        = mapped_column(String, nullable=False)
+    embedding: Mapped[bytes]  = mapped_column(LargeBinary, nullable=False)  # little-endian float32
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# --- AnswerCacheEntry (semantic answer cache, see app/answer_cache.py) ---
+class AnswerCacheEntry(Base):
+    __tablename__ = "answer_cache"
+    id: Mapped[str]                = mapped_column(UUID(as_uuid=False), primary_key=True, default=uuidpk)
+    policy_version_id: Mapped[str] = mapped_column(UUID(as_uuid=False), ForeignKey("policy_version.id", ondelete="CASCADE"), nullable=False)
+    model: Mapped[str]             = mapped_column(String, nullable=False)
+    retrieval_key: Mapped[str]     = mapped_column(String, nullable=False, server_default="")  # top_k, candidate_k, ...
+    question: Mapped[str]          = mapped_column(Text, nullable=False)
+    question_embedding: Mapped[list] = mapped_column(Vector(1536), nullable=False)
+    answer: Mapped[str]            = mapped_column(Text, nullable=False)
+    sources: Mapped[list]          = mapped_column(JSONB, nullable=False)
+    total_tokens: Mapped[int]      = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[DateTime]   = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_answer_cache_policy_version", "policy_version_id"),
+        Index("ix_answer_cache_created_at", "created_at"),
+    )
@@ -0,0 +1,50 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlencode
+
+from fastapi import HTTPException, Request
+
+# Keyset (cursor) pagination for the catalog listings. A cursor is the sort key of the
+# last row on the page, base64url-encoded JSON; the next page is the rows whose key
+# sorts after it. Bodies stay plain lists: the cursor for the next page goes in
+# X-Next-Cursor and a Link: <...>; rel="next" header, and both are absent on the last page.
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    raw = json.dumps(list(key), default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """Sort key from a cursor, or None for the first page. 400 on anything malformed."""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        key = None
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def next_page_headers(request: Request, rows: Sequence[Any], limit: int, key_of) -> Dict[str, str]:
+    """X-Next-Cursor / Link headers when `rows` (fetched with limit + 1) has another page."""
+    if len(rows) <= limit:
+        return {}
+    cursor = encode_cursor(key_of(rows[limit - 1]))
+    params = dict(request.query_params)
+    params["cursor"] = cursor
+    return {
+        "X-Next-Cursor": cursor,
+        "Link": f'<{request.url.path}?{urlencode(params)}>; rel="next"',
+    }
+
+
+def escape_like(value: str) -> str:
+    """`value` with LIKE wildcards escaped (use with escape="\\"), to build prefix/substring patterns."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -0,0 +1,122 @@
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from app.llm import rough_tokens
+
+# Token-budgeted prompt packing: snippets go into the prompt in re-ranker (MMR) order until
+# the budget is used up; a snippet that doesn't fit whole is cut back to its last complete
+# sentence. Tokens are counted with tiktoken. Encodings are loaded once per process from
+# tiktoken's cache (TIKTOKEN_CACHE_DIR, filled at build time by app/scripts/fetch_tiktoken.py);
+# with no tokenizer available the ~4 chars/token estimate is used, stats report exact=False
+# and the "tokenizer" warm-up step reports degraded (app/warmup.py).
+#
+#   PROMPT_TOKEN_BUDGET         tokens for all snippets together (default 3000)
+#   PROMPT_SNIPPET_MAX_TOKENS   tokens for any one snippet (default 400)
+#   PROMPT_MIN_SNIPPET_TOKENS   don't add a trimmed snippet shorter than this (default 64)
+
+log = logging.getLogger(__name__)
+
+# sentence ends (., !, ?, ; followed by whitespace) and blank lines between clauses/list items
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+|\n\s*\n")
+
+
+class Tokenizer:
+    def __init__(self, model: str):
+        self.model = model
+        self._enc = None
+        try:
+            import tiktoken
+            try:
+                self._enc = tiktoken.encoding_for_model(model)
+            except KeyError:  # model tiktoken doesn't know yet
+                self._enc = tiktoken.get_encoding("o200k_base")
+        except Exception as e:  # not installed, or the encoding isn't cached and can't be fetched
+            log.warning("tiktoken unavailable for %s (%s); estimating prompt tokens", model, e)
+        self.exact = self._enc is not None
+        self.encoding = self._enc.name if self._enc is not None else "estimate"
+
+    def count(self, text: str) -> int:
+        if self._enc is None:
+            return rough_tokens(text)
+        return len(self._enc.encode(text, disallowed_special=()))
+
+    def head(self, text: str, max_tokens: int) -> str:
+        """At most `max_tokens` tokens of `text`, cut at the last sentence end that fits."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        kept, used, start = [], 0, 0
+        for m in _SENTENCE_END.finditer(text):
+            sentence = text[start:m.end()]
+            n = self.count(sentence)
+            if used + n > max_tokens:
+                break
+            kept.append(sentence)
+            used += n
+            start = m.end()
+        # counts aren't additive (tokens merge across the joins), so re-check the whole
+        while kept and self.count("".join(kept).rstrip()) > max_tokens:
+            kept.pop()
+        if kept:
+            return "".join(kept).rstrip()
+        # first sentence alone is too long: cut on a token boundary
+        if self._enc is None:
+            return text[:max_tokens * 4].rstrip()
+        return self._enc.decode(self._enc.encode(text, disallowed_special=())[:max_tokens]).rstrip()
+
+
+@lru_cache(maxsize=8)
+def get_tokenizer(model: str) -> Tokenizer:
+    return Tokenizer(model)
+
+
+def budgets() -> Dict[str, int]:
+    return {
+        "budget": int(os.getenv("PROMPT_TOKEN_BUDGET", "3000")),
+        "per_snippet": int(os.getenv("PROMPT_SNIPPET_MAX_TOKENS", "400")),
+        "min_snippet": int(os.getenv("PROMPT_MIN_SNIPPET_TOKENS", "64")),
+    }
+
+
+def snippet_header(i: int, s: Dict[str, Any]) -> str:
+    loc = f"(pages {s.get('page_from')}–{s.get('page_to')})" if s.get("page_from") else ""
+    policy = f"[{s['uin']}, {s['insurer']}] " if s.get("uin") else ""  # multi-policy prompts
+    return f"[S{i}] {policy}{loc}\n"
+
+
+def pack_snippets(snippets: List[Dict[str, Any]], model: str, budget: int, per_snippet: int,
+                  min_snippet: int = 64) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Snippets (best first) that fit `budget` tokens, each cut to `per_snippet` tokens at a
+    sentence boundary. Stops at the first snippet that no longer fits, so a lower-ranked
+    short chunk never displaces a better one. Returns the packed snippets and packing stats.
+    """
+    tok = get_tokenizer(model)
+    packed: List[Dict[str, Any]] = []
+    used = trimmed = 0
+    for s in snippets:
+        header = tok.count(snippet_header(len(packed) + 1, s))
+        room = min(per_snippet, budget - used - header)
+        if room < min_snippet:
+            break
+        content = tok.head(s["content"], room)
+        n = tok.count(content)
+        if n == 0 or (content != s["content"] and n < min_snippet):
+            break
+        if content != s["content"]:
+            trimmed += 1
+        packed.append({**s, "content": content})
+        used += header + n
+    return packed, {
+        "snippet_tokens": used,
+        "snippets": len(packed),
+        "trimmed": trimmed,
+        "dropped": len(snippets) - len(packed),
+        "budget": budget,
+        "encoding": tok.encoding,
+        "exact": tok.exact,
+    }
@@ -0,0 +1,88 @@
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# A re-ranker takes the query vector, the candidate embedding matrix (n x d),
+# how many items to keep and the MMR lambda, and returns candidate row indices
+# in selection order. Re-rankers also accept an optional `rel` keyword: per-candidate
+# relevance used instead of cosine similarity to the query. MMR weighs it against
+# cosine redundancy, so `rel` must be on the cosine scale for lambda to keep its meaning.
+Reranker = Callable[..., List[int]]
+
+
+# ---- helpers ----
+def as_unit_matrix(vectors: Sequence[Sequence[float]] | np.ndarray) -> np.ndarray:
+    """Stack vectors into one contiguous float32 matrix with L2-normalised rows."""
+    mat = np.asarray(vectors, dtype=np.float32)
+    if mat.ndim == 1:
+        mat = mat.reshape(1, -1)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(mat / norms)
+
+
+def as_unit_vector(vector: Sequence[float] | np.ndarray) -> np.ndarray:
+    vec = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vec)) or 1.0
+    return vec / norm
+
+
+# ---- re-rankers ----
+def mmr(qvec: np.ndarray, cand: np.ndarray, top_k: int, lam: float, rel: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Maximal Marginal Relevance over a candidate matrix.
+
+    `cand` rows and `qvec` are normalised once, so every similarity is a plain
+    dot product. A running "max similarity to anything selected" vector is
+    updated with one matrix-vector product per pick, which keeps selection at
+    O(k * n) vector ops instead of the O(k^2 * n) pairwise loop.
+    """
+    n = cand.shape[0]
+    if n == 0 or top_k <= 0:
+        return []
+    cand = as_unit_matrix(cand)
+    sim_q = cand @ as_unit_vector(qvec) if rel is None else np.asarray(rel, dtype=np.float32)
+
+    # start by picking the most relevant candidate
+    first = int(np.argmax(sim_q))
+    selected = [first]
+    max_sim = cand @ cand[first]
+    taken = np.zeros(n, dtype=bool)
+    taken[first] = True
+
+    # iteratively pick items that balance relevance and novelty
+    while len(selected) < min(top_k, n):
+        scores = lam * sim_q - (1.0 - lam) * max_sim
+        scores[taken] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        taken[pick] = True
+        np.maximum(max_sim, cand @ cand[pick], out=max_sim)
+    return selected
+
+
+def relevance(qvec: np.ndarray, cand: np.ndarray, top_k: int, lam: float = 1.0,
+              rel: Optional[np.ndarray] = None) -> List[int]:
+    """Plain top-k by cosine similarity to the query, or by `rel` (no diversity term)."""
+    if cand.shape[0] == 0 or top_k <= 0:
+        return []
+    sim_q = as_unit_matrix(cand) @ as_unit_vector(qvec) if rel is None else np.asarray(rel, dtype=np.float32)
+    order = np.argsort(-sim_q, kind="stable")
+    return [int(i) for i in order[:top_k]]
+
+
+RERANKERS: Dict[str, Reranker] = {
+    "mmr": mmr,
+    "relevance": relevance,
+}
+
+
+def get_reranker(name: str = "mmr") -> Reranker:
+    try:
+        return RERANKERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown reranker: {name}") from None
+
+
+def register_reranker(name: str, fn: Reranker) -> None:
+    RERANKERS[name] = fn
@@ -0,0 +1,25 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+# The app's default response class (app/main.py), so routes just return dicts and lists.
+# Routes with a response_model are validated and dumped by pydantic's JSON serializer;
+# the rest go through dumps(), as do the catalog cache's stored bodies. orjson is used when
+# installed (dates/UUIDs natively, ~10x the stdlib encoder on large listings); otherwise
+# the stdlib encoder produces the same compact bytes.
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=str, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,369 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import Session
+from pgvector.sqlalchemy import Vector
+
+EMBED_DIM = 1536
+
+# pgvector's binary wire format (vector_send): uint16 dim, uint16 unused,
+# then dim big-endian float32s. One record per row, so a whole result set
+# can be decoded with a single np.frombuffer call.
+def _vector_send_dtype(dim: int) -> np.dtype:
+    return np.dtype([("dim", ">u2"), ("unused", ">u2"), ("v", ">f4", (dim,))])
+
+
+def decode_vectors(bufs: Sequence[Any], dim: int = EMBED_DIM) -> np.ndarray:
+    """
+    Decode `vector_send` bytea values into one contiguous (n x dim) float32 matrix.
+
+    No per-element Python floats are created: the buffers are joined once and
+    reinterpreted in place, then byte-swapped into native float32.
+    """
+    if not bufs:
+        return np.empty((0, dim), dtype=np.float32)
+    rec = np.frombuffer(b"".join(bufs), dtype=_vector_send_dtype(dim))
+    if len(rec) != len(bufs) or (rec["dim"] != dim).any():
+        raise ValueError(f"expected {len(bufs)} vectors of dim {dim}")
+    return rec["v"].astype(np.float32)
+
+
+def embedding_matrix(rows: Sequence[Any], dim: int = EMBED_DIM) -> np.ndarray:
+    """Stack the `embedding` bytea column of candidate rows into a float32 matrix."""
+    return decode_vectors([r.embedding for r in rows], dim)
+
+
+def _embedding_column(with_embeddings: bool) -> str:
+    # in "scores only" mode the DB computes similarity and no vectors are shipped
+    return "vector_send(c.embedding) AS embedding," if with_embeddings else "NULL::bytea AS embedding,"
+
+
+# ---- ANN tuning ----
+# every knob in one round trip; constant SQL, so it is compiled (and prepared by asyncpg) once.
+# *.iterative_scan only exists from pgvector 0.8 (older versions ignore or reject the name),
+# so it is dropped below that; the exact fallback in _vector_top_k covers those servers.
+SET_CONFIGS = text("""
+    SELECT set_config(p.name, p.value, true)
+    FROM unnest(CAST(:names AS text[]), CAST(:values AS text[])) AS p(name, value)
+    WHERE p.name NOT LIKE '%.iterative_scan'
+       OR (SELECT string_to_array(extversion, '.')::int[] >= '{0,8}'
+           FROM pg_extension WHERE extname = 'vector')
+""")
+
+
+def search_param_items(
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    iterative_scan: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    """One {name, value} dict per knob that was actually given."""
+    params = {
+        "hnsw.ef_search": ef_search,
+        "ivfflat.probes": probes,
+        "hnsw.iterative_scan": iterative_scan,
+        "ivfflat.iterative_scan": iterative_scan,
+    }
+    return [{"name": name, "value": str(value)} for name, value in params.items() if value is not None]
+
+
+def search_params(**knobs: Any) -> Optional[Dict[str, List[str]]]:
+    """Bind params for SET_CONFIGS, or None if no knob was given."""
+    items = search_param_items(**knobs)
+    if not items:
+        return None
+    return {"names": [i["name"] for i in items], "values": [i["value"] for i in items]}
+
+
+def set_search_params(
+    db: Session,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    iterative_scan: Optional[str] = None,
+) -> None:
+    """
+    Per-request ANN knobs, scoped to the current transaction (set_config(..., true)
+    is SET LOCAL), so they never leak to the next request using the pooled connection.
+
+    ef_search      - HNSW candidate list size; must be >= k or the index returns fewer rows
+    probes         - IVFFlat lists to scan
+    iterative_scan - pgvector >= 0.8 'relaxed_order' / 'strict_order': keep scanning the
+                     index until enough rows survive the policy_version_id filter
+                     (skipped on older pgvector)
+    """
+    params = search_params(ef_search=ef_search, probes=probes, iterative_scan=iterative_scan)
+    if params:
+        db.execute(SET_CONFIGS, params)
+
+
+# ---- queries ----
+# Statements are built separately from execution so the async route
+# (app/routes/chat_async.py) runs exactly the same SQL, and built once per variant so
+# every request reuses the same TextClause (and its compiled form in the engine's cache).
+def _vector_top_k(pvid: str) -> str:
+    """
+    Subquery: (id, distance) of the :k chunks of policy version `pvid` nearest to :qvec.
+
+    The ANN branch has its ORDER BY/LIMIT on policy_chunk alone so it walks
+    idx_policy_chunk_embedding. That index is global and the policy filter is applied
+    to what it returns, so without iterative scans (pgvector < 0.8) a policy holding a
+    small share of the table gets far fewer than :k rows (see migration 5b1f0c2a9d41).
+    Then the same top-k is computed exactly over the policy's chunks instead, through
+    ix_policy_chunk_policy_version; `+ 0` keeps the planner off the vector index. The
+    count checks are one-time filters, so only one branch runs.
+    """
+    return f"""
+            WITH ann AS MATERIALIZED (
+              SELECT c.id, c.embedding <=> :qvec AS distance
+              FROM policy_chunk c
+              WHERE c.policy_version_id = {pvid}
+              ORDER BY c.embedding <=> :qvec  -- cosine distance
+              LIMIT :k
+            )
+            SELECT id, distance FROM ann WHERE (SELECT count(*) FROM ann) >= :k
+            UNION ALL
+            (SELECT c.id, c.embedding <=> :qvec AS distance
+             FROM policy_chunk c
+             WHERE c.policy_version_id = {pvid} AND (SELECT count(*) FROM ann) < :k
+             ORDER BY (c.embedding <=> :qvec) + 0  -- exact
+             LIMIT :k)"""
+
+
+@lru_cache(maxsize=None)
+def vector_candidates_stmt(with_embeddings: bool = True):
+    """
+    Top-:k chunks of one policy version by cosine distance (see _vector_top_k);
+    documents are joined on the k survivors.
+    """
+    return text(f"""
+        SELECT
+          c.id,
+          c.section_id,
+          c.page_from,
+          c.page_to,
+          c.content,
+          d.source_uri AS document_pdf,
+          {_embedding_column(with_embeddings)}
+          (1 - v.distance) * 100 AS similarity_pct
+        FROM ({_vector_top_k(":pvid")}
+        ) v
+        JOIN policy_chunk c ON c.id = v.id
+        JOIN policy_document d ON d.id = c.document_id
+        ORDER BY v.distance ;
+    """).bindparams(
+        bindparam("qvec", type_=Vector(EMBED_DIM)),
+    )
+
+
+# ---- hybrid: vector + full-text, fused by reciprocal rank ----
+RRF_K = 60  # the usual RRF constant; larger values flatten the gap between top ranks
+
+
+def lexical_query(question: str) -> str:
+    """
+    websearch_to_tsquery input that ORs the question's words.
+
+    Plain/websearch queries AND every term, which a chunk rarely satisfies for a
+    whole question; OR-ing them and ranking with ts_rank_cd rewards chunks that
+    match more (and rarer, closer together) terms. Stop words are dropped by the
+    'english' config.
+    """
+    return " or ".join(w for w in re.findall(r"\w+", question.lower()) if w != "or")
+
+
+@lru_cache(maxsize=None)
+def hybrid_candidates_stmt(with_embeddings: bool = True):
+    """
+    Vector top-:k and full-text top-:lexical_k of one policy version, fused with
+    reciprocal-rank fusion (sum of 1 / (:rrf_k + rank) over the lists a chunk is in),
+    in a single round trip. Ordered by rrf_score.
+
+    The vector branch is _vector_top_k (HNSW, exact when the index comes back short);
+    the lexical branch is served by the GIN index on content_tsv (migration
+    d2b7f4a91c35). Documents are joined on the survivors only.
+    """
+    return text(f"""
+        WITH vec AS MATERIALIZED (
+          SELECT c.id, row_number() OVER (ORDER BY c.distance) AS rnk
+          FROM ({_vector_top_k(":pvid")}
+          ) c
+        ),
+        lex AS MATERIALIZED (
+          SELECT c.id, row_number() OVER (ORDER BY c.score DESC) AS rnk
+          FROM (
+            SELECT c.id, ts_rank_cd(c.content_tsv, q) AS score
+            FROM policy_chunk c, websearch_to_tsquery('english', :qtext) q
+            WHERE c.policy_version_id = :pvid AND c.content_tsv @@ q
+            ORDER BY score DESC
+            LIMIT :lexical_k
+          ) c
+        ),
+        fused AS (
+          SELECT id,
+                 sum(1.0 / (:rrf_k + rnk)) AS rrf_score,
+                 min(rnk) FILTER (WHERE src = 'v') AS vector_rank,
+                 min(rnk) FILTER (WHERE src = 'l') AS lexical_rank
+          FROM (
+            SELECT id, rnk, 'v' AS src FROM vec
+            UNION ALL
+            SELECT id, rnk, 'l' AS src FROM lex
+          ) r
+          GROUP BY id
+        )
+        SELECT
+          c.id,
+          c.section_id,
+          c.page_from,
+          c.page_to,
+          c.content,
+          d.source_uri AS document_pdf,
+          {_embedding_column(with_embeddings)}
+          (1 - (c.embedding <=> :qvec)) * 100 AS similarity_pct,
+          f.rrf_score,
+          f.vector_rank,
+          f.lexical_rank
+        FROM fused f
+        JOIN policy_chunk c ON c.id = f.id
+        JOIN policy_document d ON d.id = c.document_id
+        ORDER BY f.rrf_score DESC, f.vector_rank NULLS LAST
+    """).bindparams(
+        bindparam("qvec", type_=Vector(EMBED_DIM)),
+    )
+
+
+def hybrid_params(
+    policy_version_id: str,
+    qvec: Sequence[float],
+    question: str,
+    k: int,
+    lexical_k: int,
+    rrf_k: int = RRF_K,
+) -> Dict[str, Any]:
+    return {
+        "pvid": policy_version_id, "qvec": qvec, "k": k,
+        "qtext": lexical_query(question), "lexical_k": lexical_k, "rrf_k": rrf_k,
+    }
+
+
+# ---- several policy versions at once (comparison questions) ----
+@lru_cache(maxsize=None)
+def multi_policy_candidates_stmt(with_embeddings: bool = True):
+    """
+    hybrid_candidates_stmt for every policy version in :pvids in one round trip: a
+    LATERAL vector top-:k and full-text top-:lexical_k per policy version, each fused with
+    RRF within its own policy. Ordered by policy version, then rrf_score, so every
+    policy keeps its own candidates however its scores compare with the others'.
+
+    Each LATERAL branch is the single-policy query, so it still walks the HNSW / GIN
+    indexes with the policy_version_id filter (and falls back to an exact scan per
+    policy, see _vector_top_k).
+    """
+    return text(f"""
+        WITH pv AS (
+          SELECT pv.id, pv.uin FROM policy_version pv WHERE pv.id = ANY(CAST(:pvids AS uuid[]))
+        ),
+        vec AS MATERIALIZED (
+          SELECT v.id, pv.id AS pvid, row_number() OVER (PARTITION BY pv.id ORDER BY v.distance) AS rnk
+          FROM pv
+          CROSS JOIN LATERAL ({_vector_top_k("pv.id")}
+          ) v
+        ),
+        lex AS MATERIALIZED (
+          SELECT l.id, pv.id AS pvid, row_number() OVER (PARTITION BY pv.id ORDER BY l.score DESC) AS rnk
+          FROM pv
+          CROSS JOIN LATERAL (
+            SELECT c.id, ts_rank_cd(c.content_tsv, q) AS score
+            FROM policy_chunk c, websearch_to_tsquery('english', :qtext) q
+            WHERE c.policy_version_id = pv.id AND c.content_tsv @@ q
+            ORDER BY score DESC
+            LIMIT :lexical_k
+          ) l
+        ),
+        fused AS (
+          SELECT id,
+                 sum(1.0 / (:rrf_k + rnk)) AS rrf_score,
+                 min(rnk) FILTER (WHERE src = 'v') AS vector_rank,
+                 min(rnk) FILTER (WHERE src = 'l') AS lexical_rank
+          FROM (
+            SELECT id, rnk, 'v' AS src FROM vec
+            UNION ALL
+            SELECT id, rnk, 'l' AS src FROM lex
+          ) r
+          GROUP BY id
+        )
+        SELECT
+          c.id,
+          c.policy_version_id,
+          pv.uin,
+          c.section_id,
+          c.page_from,
+          c.page_to,
+          c.content,
+          d.source_uri AS document_pdf,
+          {_embedding_column(with_embeddings)}
+          (1 - (c.embedding <=> :qvec)) * 100 AS similarity_pct,
+          f.rrf_score,
+          f.vector_rank,
+          f.lexical_rank
+        FROM fused f
+        JOIN policy_chunk c ON c.id = f.id
+        JOIN pv ON pv.id = c.policy_version_id
+        JOIN policy_document d ON d.id = c.document_id
+        ORDER BY c.policy_version_id, f.rrf_score DESC, f.vector_rank NULLS LAST
+    """).bindparams(
+        bindparam("qvec", type_=Vector(EMBED_DIM)),
+    )
+
+
+def multi_policy_params(
+    policy_version_ids: Sequence[str],
+    qvec: Sequence[float],
+    question: str,
+    k: int,
+    lexical_k: int,
+    rrf_k: int = RRF_K,
+) -> Dict[str, Any]:
+    """Bind params for multi_policy_candidates_stmt; `k` and `lexical_k` are per policy version."""
+    return {
+        "pvids": list(policy_version_ids), "qvec": qvec, "k": k,
+        "qtext": lexical_query(question), "lexical_k": lexical_k, "rrf_k": rrf_k,
+    }
+
+
+def vector_candidates(
+    db: Session,
+    policy_version_id: str,
+    qvec: Sequence[float],
+    limit: int = 100,
+    with_embeddings: bool = True,
+) -> List[Any]:
+    stmt = vector_candidates_stmt(with_embeddings)
+    return db.execute(stmt, {"pvid": policy_version_id, "qvec": qvec, "k": limit}).fetchall()
+
+
+def hybrid_candidates(
+    db: Session,
+    policy_version_id: str,
+    qvec: Sequence[float],
+    question: str,
+    limit: int = 100,
+    lexical_k: int = 20,
+    with_embeddings: bool = True,
+) -> List[Any]:
+    stmt = hybrid_candidates_stmt(with_embeddings)
+    return db.execute(stmt, hybrid_params(policy_version_id, qvec, question, limit, lexical_k)).fetchall()
+
+
+def multi_policy_candidates(
+    db: Session,
+    policy_version_ids: Sequence[str],
+    qvec: Sequence[float],
+    question: str,
+    limit: int = 100,
+    lexical_k: int = 20,
+    with_embeddings: bool = True,
+) -> List[Any]:
+    stmt = multi_policy_candidates_stmt(with_embeddings)
+    return db.execute(stmt, multi_policy_params(policy_version_ids, qvec, question, limit, lexical_k)).fetchall()
@@ -1,104 +1,183 @@
-from typing import Optional, List, Dict, Any
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select, func
+import datetime
+from typing import Optional, List, Dict, Any, Tuple, Union
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from sqlalchemy import select, text, true, tuple_
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import literal_column
-from sqlalchemy import over
-from app.db import SessionLocal
+from typing_extensions import NotRequired, TypedDict
+from app.catalog_cache import get_catalog_cache
+from app.db import get_db
 from app.models import Insurer, Product, PolicyVersion, PolicyDocument
+from app.pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, escape_like, next_page_headers
 
 router = APIRouter(prefix="/catalog", tags=["catalog"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-@router.get("/filters", summary="Values for dropdowns")
-def get_filters(db: Session = Depends(get_db)) -> Dict[str, List[str]]:
-    # Distinct UINs
-    uins = [r[0] for r in db.execute(select(func.distinct(PolicyVersion.uin)).order_by(PolicyVersion.uin)).all()]
-    # Distinct Insurers
-    insurers = [r[0] for r in db.execute(select(func.distinct(Insurer.name)).order_by(Insurer.name)).all()]
-    # Distinct Product Types
-    type_of_product = [r[0] for r in db.execute(
-        select(func.distinct(PolicyVersion.type_of_product))
-        .where(PolicyVersion.type_of_product.isnot(None))
-        .order_by(PolicyVersion.type_of_product)
-    ).all()]
-
-    return {
-        "uins": uins,
-        "insurers": insurers,
-        "type_of_product": type_of_product,
+# Response shapes (OpenAPI only: bodies are serialized once, by the catalog cache)
+class CatalogFilters(TypedDict):
+    uins: NotRequired[List[str]]  # only with include_uins=true
+    insurers: List[str]
+    type_of_product: List[str]
+
+class CatalogRow(TypedDict):
+    uin: str
+    insurer: str
+    product_name: str
+    effective_date: Optional[datetime.date]
+    type_of_product: Optional[str]
+    approval_date: Optional[datetime.date]
+    document_pdf: Optional[str]  # None if not ingested yet
+
+# The dropdowns in one round trip. The UIN list grows with the whole catalog, so it is
+# only sent on request; the SPA picks UINs through /catalog/typeahead instead.
+FILTERS = text("""
+    SELECT
+        ARRAY(SELECT DISTINCT name FROM insurer ORDER BY name) AS insurers,
+        ARRAY(SELECT DISTINCT type_of_product FROM policy_version
+              WHERE type_of_product IS NOT NULL ORDER BY type_of_product) AS type_of_product
+""")
+UINS = text("SELECT ARRAY(SELECT DISTINCT uin FROM policy_version ORDER BY uin)")
+
+
+def cached_json(db: Session, key: tuple, compute, if_none_match: Optional[str]) -> Response:
+    """JSON response from the catalog cache, or 304 when the client's ETag is current."""
+    body, headers = get_catalog_cache().get(db, key, compute, if_none_match)
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def load_filters(db: Session, include_uins: bool = False) -> CatalogFilters:
+    r = db.execute(FILTERS).one()
+    filters: CatalogFilters = {
+        "insurers": list(r.insurers),
+        "type_of_product": list(r.type_of_product),
     }
+    if include_uins:
+        filters["uins"] = list(db.execute(UINS).scalar())
+    return filters
+
+@router.get("/filters", response_model=CatalogFilters, summary="Values for dropdowns")
+def get_filters(
+    include_uins: bool = Query(False, description="Also list every UIN (large; prefer /catalog/typeahead)"),
+    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    return cached_json(db, ("filters", include_uins), lambda: (load_filters(db, include_uins), {}), if_none_match)
 
-@router.get("/search", summary="Search policy versions (rows) by filters")
+@router.get("/search", response_model=List[CatalogRow], summary="Search policy versions (rows) by filters")
 def search_versions(
-    uin: Optional[str] = Query(None, description="Exact UIN"),
-    insurer_name: Optional[str] = Query(None, description="Exact insurer name"),
+    request: Request,
+    uin: Optional[str] = Query(None, description="Exact UIN (or its start with match=prefix)"),
+    insurer_name: Optional[str] = Query(None, description="Exact insurer name (or its start with match=prefix)"),
     type_of_product: Optional[str] = Query(None, description="Exact product type"),
+    match: str = Query("exact", pattern="^(exact|prefix)$",
+                       description="prefix: case-insensitive starts-with on uin and insurer_name"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     db: Session = Depends(get_db),
-) -> List[Dict[str, Any]]:
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
     """
-    Returns rows: UIN, Insurer, Product, Effective Date, Product Type, Approval Date, Document PDF (latest)
+    Returns rows: UIN, Insurer, Product, Effective Date, Product Type, Approval Date, Document PDF (latest),
+    ordered by (insurer, product, uin), at most `limit` per page.
     """
-
-    # Latest policy_wording document per policy_version using window function
-    rn = func.row_number().over(
-        partition_by=PolicyDocument.policy_version_id,
-        order_by=PolicyDocument.id.desc()
-    ).label("rn")
-
-    latest_doc_sq = (
-        select(
-            PolicyDocument.policy_version_id.label("pv_id"),
-            PolicyDocument.source_uri.label("pdf_path"),
-            PolicyDocument.doc_type,
-            rn
-        )
-        .where(PolicyDocument.doc_type == "policy_wording")
-        .subquery()
+    filters = tuple((v or "").strip() or None for v in (uin, insurer_name, type_of_product))
+    after = decode_cursor(cursor, 3)
+    return cached_json(
+        db, ("search",) + filters + (match, limit, cursor),
+        lambda: load_versions(request, db, *filters, match=match, limit=limit, after=after),
+        if_none_match,
     )
 
-    # Base query with joins
-    stmt = (
+
+def load_versions(request: Request, db: Session, uin: Optional[str], insurer_name: Optional[str],
+                  type_of_product: Optional[str], match: str = "exact", limit: int = DEFAULT_LIMIT,
+                  after: Optional[List[str]] = None) -> Tuple[List[CatalogRow], Dict[str, str]]:
+    """One page of catalog rows (keyset on insurer, product, uin) and its next-page headers."""
+    sort_key = (Insurer.name, Product.name, PolicyVersion.uin)
+    page = (
         select(
+            PolicyVersion.id.label("pv_id"),
             PolicyVersion.uin.label("uin"),
             Insurer.name.label("insurer"),
             Product.name.label("product_name"),
             PolicyVersion.effective_from.label("effective_date"),
             PolicyVersion.type_of_product.label("type_of_product"),
             PolicyVersion.approval_date.label("approval_date"),
-            latest_doc_sq.c.pdf_path.label("document_pdf")
         )
         .join(Product, PolicyVersion.product_id == Product.id)
         .join(Insurer, Product.insurer_id == Insurer.id)
-        .join(latest_doc_sq, latest_doc_sq.c.pv_id == PolicyVersion.id, isouter=True)
-        .where((latest_doc_sq.c.rn == 1) | (latest_doc_sq.c.rn.is_(None)))
-        .order_by(Insurer.name, Product.name, PolicyVersion.uin)
     )
 
     if uin:
-        stmt = stmt.where(PolicyVersion.uin == uin.strip())
+        page = page.where(PolicyVersion.uin.ilike(escape_like(uin) + "%", escape="\\")
+                          if match == "prefix" else PolicyVersion.uin == uin)
     if insurer_name:
-        stmt = stmt.where(Insurer.name == insurer_name.strip())
+        page = page.where(Insurer.name.ilike(escape_like(insurer_name) + "%", escape="\\")
+                          if match == "prefix" else Insurer.name == insurer_name)
     if type_of_product:
-        stmt = stmt.where(PolicyVersion.type_of_product == type_of_product.strip())
-
-    rows = db.execute(stmt).all()
-
-    return [
-        {
-            "uin": r.uin,
-            "insurer": r.insurer,
-            "product_name": r.product_name,
-            "effective_date": r.effective_date,
-            "type_of_product": r.type_of_product,
-            "approval_date": r.approval_date,
-            "document_pdf": r.document_pdf,  # can be None if not ingested yet
-        }
-        for r in rows
-    ]
+        page = page.where(PolicyVersion.type_of_product == type_of_product)
+    if after:
+        page = page.where(tuple_(*sort_key) > tuple_(*after))
+    # one extra row tells us whether there is a next page
+    page = page.order_by(*sort_key).limit(limit + 1).subquery("page")
+
+    # Latest policy_wording document, looked up only for the rows on this page
+    # (ix_policy_document_version_type: policy_version_id, doc_type, id)
+    latest_doc = (
+        select(PolicyDocument.source_uri)
+        .where(PolicyDocument.policy_version_id == page.c.pv_id, PolicyDocument.doc_type == "policy_wording")
+        .order_by(PolicyDocument.id.desc())
+        .limit(1)
+        .lateral("latest_doc")
+    )
+
+    stmt = (
+        select(
+            page.c.uin, page.c.insurer, page.c.product_name, page.c.effective_date,
+            page.c.type_of_product, page.c.approval_date,
+            latest_doc.c.source_uri.label("document_pdf"),  # can be None if not ingested yet
+        )
+        .select_from(page)
+        .outerjoin(latest_doc, true())
+        .order_by(page.c.insurer, page.c.product_name, page.c.uin)
+    )
+    rows = db.execute(stmt).mappings().all()
+    headers = next_page_headers(request, rows, limit, lambda r: (r["insurer"], r["product_name"], r["uin"]))
+    return [dict(r) for r in rows[:limit]], headers
+
+
+@router.get("/typeahead", response_model=List[str], summary="UIN or insurer name suggestions for a partial input")
+def typeahead(
+    q: str = Query(..., min_length=1, description="What the user has typed so far"),
+    field: str = Query("uin", pattern="^(uin|insurer)$"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+) -> Union[Response, List[str]]:
+    """
+    Distinct values containing `q` (case-insensitive), those starting with it first.
+    Backed by the trigram indexes on policy_version.uin and insurer.name.
+    """
+    q = q.strip()
+    if not q:  # blank input would become '%%' and match every value
+        return []
+    return cached_json(db, ("typeahead", field, q.casefold(), limit),
+                       lambda: (load_suggestions(db, field, q, limit), {}), if_none_match)
+
+
+def load_suggestions(db: Session, field: str, q: str, limit: int) -> List[str]:
+    col = PolicyVersion.uin if field == "uin" else Insurer.name
+    pattern = escape_like(q)
+    stmt = (
+        select(col)
+        .where(col.ilike("%" + pattern + "%", escape="\\"))
+        .group_by(col)
+        .order_by(col.ilike(pattern + "%", escape="\\").desc(), col)
+        .limit(limit)
+    )
+    return list(db.execute(stmt).scalars())
+
+
+@router.get("/cache", summary="Catalog response cache hit rate and current catalog version")
+def catalog_cache_stats() -> Dict[str, Any]:
+    return get_catalog_cache().stats()
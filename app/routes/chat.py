@@ -1,207 +1,164 @@
-import os
 import math
-from typing import List, Dict, Any, Optional
-import ast
-import pandas as pd
+import os
+from itertools import zip_longest
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 
 from fastapi import APIRouter, HTTPException, Depends, Body
-from sqlalchemy import text, select, bindparam
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-
-from openai import OpenAI
-from pgvector.sqlalchemy import Vector
-
-from app.db import SessionLocal
-from app.models import PolicyVersion
+from typing_extensions import NotRequired, TypedDict
+
+from app import metrics
+from app.answer_cache import get_answer_cache
+from app.db import get_db
+from app.embed_batcher import get_embed_batcher
+from app.embedding_cache import get_embedding_cache
+from app.llm import LLMClient, get_llm
+from app.models import Insurer, PolicyVersion, Product
+from app.prompt import budgets, get_tokenizer, pack_snippets, snippet_header
+from app.rerank import as_unit_matrix, get_reranker
+from app.retrieval import hybrid_candidates, embedding_matrix, multi_policy_candidates, set_search_params
+from app.traces import candidate_records, get_trace_sink
+from app.vector_index import get_vector_index, search_policy, vector_index_enabled
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# ---- dependencies ----
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def get_client() -> OpenAI:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    return OpenAI(api_key=api_key)
-
 # ---- helpers ----
-def l2_norm(v: List[float]) -> float:
-    return math.sqrt(sum(x * x for x in v)) or 1.0
-
-# storuing query result to csv file 
-def store_query_result(rows):
-    print("no of rows :" ,len(rows))
-    df = pd.DataFrame([row._asdict() for row in rows])
-    df = df.drop(columns=["embedding"])
-
-    # Step 3: Rename columns (optional, if you want custom headers)
-    df.columns = [
-        "Chunk ID",
-        "Section ID",
-        "Page From",
-        "Page To",
-        "Content",
-        "Document PDF",
-        "similarity_pct"
-    ]
-
-    # Step 4: Save to CSV
-    df.to_csv(r"D:\Professonal\projects\chatbot\Results\embeddings_query_result.csv", index=False)
-
+# UIN -> policy_version_id never changes once a version exists, so found ids are kept for
+# the life of the process (misses are not: the UIN may be ingested later)
+_policy_version_ids: Dict[str, str] = {}
 
-def emp_to_float(r):
-    if isinstance(r.embedding, str):
-        try:
-            emb = ast.literal_eval(r.embedding)  # Safely parse string to list
-        except Exception:
-            emb = [r.embedding]  # Fallback: treat as single string
-    elif isinstance(r.embedding, (list, tuple)):
-        emb = list(r.embedding)
-    else:
-        emb = [r.embedding]
-
-# Step 2: Convert each element to float
-    try:
-        emb = [float(e) for e in emb]
-    except ValueError as ve:
-        print("Error converting to float:", ve)
-        emb = []
+def cached_policy_version_id(uin: str) -> Optional[str]:
+    return _policy_version_ids.get(uin.strip())
 
-    return emb
+def remember_policy_version_id(uin: str, policy_version_id: str) -> str:
+    _policy_version_ids[uin.strip()] = policy_version_id
+    return policy_version_id
 
-def cosine_sim(a: List[float], b: List[float]) -> float:
-    # assumes same length
-    #print("a type ;",type(a[0]), "b type :",type(b[0]))
-    dot = sum(x*y for x, y in zip(a, b))
-    return dot / (l2_norm(a) * l2_norm(b))
+def resolve_policy_version(db: Session, uin: str) -> str:
+    pvid = cached_policy_version_id(uin)
+    if pvid is not None:
+        return pvid
+    row = db.execute(
+        select(PolicyVersion.id).where(PolicyVersion.uin == uin.strip())
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail=f"No policy version found for UIN: {uin}")
+    return remember_policy_version_id(uin, row[0])
 
-def embed(client: OpenAI, text_in: str) -> List[float]:
-    # text-embedding-3-small => 1536 dims (matches your table)
-    resp = client.embeddings.create(model="text-embedding-3-small", input=[text_in]).data[0].embedding
+EMBED_MODEL = "text-embedding-3-small"  # 1536 dims (matches your table)
 
-    return resp
+def embed(llm: LLMClient, text_in: str) -> List[float]:
+    # repeated FAQ questions are served from the embedding cache; misses from concurrent
+    # requests share one embeddings call through the micro-batcher
+    batcher = get_embed_batcher()
+    if batcher is None:
+        return get_embedding_cache().embed_one(text_in, EMBED_MODEL, lambda t: llm.embed([t], EMBED_MODEL)[0])
+    return get_embedding_cache().embed_one(text_in, EMBED_MODEL, lambda t: batcher.embed_sync(t, EMBED_MODEL))
 
 def build_prompt(question: str, snippets: List[Dict[str, Any]]) -> str:
-
-    #print(snippets)
     """Construct a grounding prompt with citations."""
     lines = [
         "You are a helpful insurance policy assistant chatbot. You search the given sippets and provide best answer"
         "Read all the snippets provided by user and make a understanding what user is asking and answer the user's question using all the provided snippets.",
         "After reading all the snippets if the answer is not in any snippets, then give the user a general answer of that question based on your understanding and mention that this is only general term/answer and it is not present in the snippet",
         "Cite snippet numbers like [S1], [S2] from which you develop the knowledge and when you use them.",
+    ]
+    if len({s.get("uin") for s in snippets}) > 1:
+        lines.append("The snippets come from several policies, each labelled with its UIN and insurer. "
+                     "Answer for each policy separately and point out where they differ.")
+    lines += [
         "",
         "=== SNIPPETS ==="
     ]
     for i, s in enumerate(snippets, 1):
-        loc = f"(pages {s.get('page_from')}–{s.get('page_to')})" if s.get("page_from") else ""
-        lines.append(f"[S{i}] {loc}\n{s['content']}\n")
+        lines.append(f"{snippet_header(i, s)}{s['content']}\n")
     lines += ["=== END SNIPPETS ===", "", f"Question: {question}", "Answer:"]
     return "\n".join(lines)
 
 # ---- request/response schemas ----
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 
 class AskRequest(BaseModel):
-    uin: str
+    uin: Optional[str] = None              # one policy, or:
+    uins: Optional[List[str]] = None       # several policies, compared in one answer
+    insurer_name: Optional[str] = None     # and/or every policy matching the /catalog/search filters
+    type_of_product: Optional[str] = None
     question: str
-    top_k: Optional[int] = 15          # final snippets to use
+    top_k: Optional[int] = 15          # most snippets to use (fewer if PROMPT_TOKEN_BUDGET runs out)
     candidate_k: Optional[int] = 100   # how many to pull from DB before re-ranking
+    lexical_k: Optional[int] = None    # full-text matches fused with the vector ones (0 = vector only)
     mmr_lambda: Optional[float] = 0.5 # 1.0 = only relevance, 0.0 = only diversity
+    ef_search: Optional[int] = None    # HNSW search width (never below candidate_k)
+    probes: Optional[int] = None       # IVFFlat lists to probe, if that index is used
+    trace: Optional[bool] = None       # write a retrieval trace (app/traces.py); default: sampled
+
+    @model_validator(mode="after")
+    def _has_scope(self):
+        if not (self.uin or self.uins or self.insurer_name or self.type_of_product):
+            raise ValueError("give uin, uins or a catalog filter (insurer_name, type_of_product)")
+        return self
+
+class Source(TypedDict):
+    uin: NotRequired[str]       # multi-policy answers only
+    insurer: NotRequired[str]
+    section_id: Optional[str]
+    page_from: Optional[int]
+    page_to: Optional[int]
+    document_pdf: Optional[str]
+    excerpt: str
 
 class AskResponse(BaseModel):
+    """Body of /chat/ask and /chat/ask-async (the routes return it via answer_response)."""
     answer: str
-    sources: List[Dict[str, Any]]
-
-# ---- route ----
-@router.post("/ask", response_model=AskResponse, summary="Ask a question for a specific UIN")
-def ask(
-    payload: AskRequest = Body(...),
-    db: Session = Depends(get_db),
-    client: OpenAI = Depends(get_client),
-):
-    # 1) Resolve policy_version_id from UIN
-    row = db.execute(
-        select(PolicyVersion.id).where(PolicyVersion.uin == payload.uin.strip())
-    ).first()
-    if not row:
-        raise HTTPException(status_code=404, detail=f"No policy version found for UIN: {payload.uin}")
-    policy_version_id = row[0]
-
-    # 2) Embed the question
-    qvec = embed(client, payload.question)
-    
-
-    print("length of question vector: ",len(qvec))
-    print(f"type of qvec: ",type(qvec))
-    # 3) Retrieve candidate chunks for this policy version (cosine distance)
+    sources: List[Source]
+
+def answer_response(answer: str, sources: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # sources are built by to_sources() or come back from the answer cache already in shape
+    return {"answer": answer, "sources": sources}
+
+# ---- retrieval helpers (shared with app/routes/chat_async.py) ----
+def retrieval_with_embeddings() -> bool:
+    # "binary" ships embeddings as vector_send bytea for in-app MMR,
+    # "scores" lets the DB compute similarities and returns no vectors at all
+    return os.getenv("RETRIEVAL_MODE", "binary") != "scores"
+
+def ann_params(payload: AskRequest, candidate_k: int) -> Dict[str, Any]:
+    return {
+        "ef_search": min(max(int(payload.ef_search or candidate_k), candidate_k), 1000),  # pgvector caps at 1000
+        "probes": payload.probes,
+        "iterative_scan": iterative_scan(),
+    }
+
+def iterative_scan() -> Optional[str]:
+    # relaxed_order unless VECTOR_ITERATIVE_SCAN=off; only applied on pgvector >= 0.8 (retrieval.SET_CONFIGS)
+    mode = os.getenv("VECTOR_ITERATIVE_SCAN", "relaxed_order")
+    return None if mode.lower() in ("", "off") else mode
+
+def lexical_k(payload: AskRequest) -> int:
+    return int(payload.lexical_k if payload.lexical_k is not None else os.getenv("LEXICAL_K", "20"))
+
+def retrieval_key(payload: AskRequest) -> str:
+    """The retrieval settings a request resolves to; cached answers are only reused under the same key."""
     candidate_k = int(payload.candidate_k or 80)
-    text_k = min(1, candidate_k) 
-
-    stmt = text("""
-        SELECT
-          c.id,
-          c.section_id,
-          c.page_from,
-          c.page_to,
-          c.content,
-          d.source_uri AS document_pdf,
-          c.embedding,
-          (1 - (c.embedding <=> :qvec)) * 100 AS similarity_pct
-        FROM policy_chunk c
-        JOIN policy_document d ON d.id = c.document_id
-        WHERE c.policy_version_id = :pvid
-        --ORDER BY c.embedding <=> :qvec ::vector  -- cosine distance
-        LIMIT 150 ;
-    """).bindparams(
-        bindparam("qvec", type_=Vector(1536)),
-    )
-    
-    rows = db.execute(stmt, {"pvid": policy_version_id,"k": candidate_k, "qvec": qvec}).fetchall()
-    store_query_result(rows)
-    if not rows:
-        raise HTTPException(status_code=404, detail=f"No chunks found for this UIN. Did you ingest a PDF?: {qvec}")
-
-# normalize qtext a bit: lower, strip excess spaces
-    qtext = " ".join(payload.question.lower().split())
-
-    txt_stmt = text("""
-        SELECT
-        c.id,
-        c.section_id,
-        c.page_from,
-        c.page_to,
-        c.content,
-        d.source_uri AS document_pdf,
-        c.embedding
-        FROM policy_chunk c
-        JOIN policy_document d ON d.id = c.document_id
-        WHERE c.policy_version_id = :pvid
-        ORDER BY similarity(c.content, :qtext) DESC
-        LIMIT :tlimit
-    """)
-
-    txt_rows = db.execute(txt_stmt, {"pvid": policy_version_id, "qtext": qtext, "tlimit": text_k}).fetchall()
-    #print(txt_rows)
- # --- C) Merge (dedupe by chunk id) ---
-    by_id = {}
-    for r in rows + txt_rows:
-        by_id.setdefault(r.id, r)
-    rows = list(by_id.values())
+    ann = ann_params(payload, candidate_k)
+    lam = payload.mmr_lambda if payload.mmr_lambda is not None else 0.7
+    return (f"top_k={int(payload.top_k or 15)};candidate_k={candidate_k};lexical_k={lexical_k(payload)};"
+            f"mmr_lambda={float(lam)};ef_search={ann['ef_search']};probes={ann['probes']}")
+
+def select_snippets(payload: AskRequest, qvec: List[float], rows, with_embeddings: bool,
+                    matrix: Optional[np.ndarray] = None, trace: Optional[Dict[str, Any]] = None,
+                    top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+    # rows come from hybrid_candidates (vector + full-text, one per chunk, by RRF score) or from
+    # the in-process vector index, which passes the candidates' embeddings as `matrix`;
+    # `trace` (if the request is traced) gets the candidates' scores and the re-ranker's picks
     if not rows:
         raise HTTPException(status_code=404, detail="No chunks found for this UIN. Did you ingest a PDF?")
 
-# --- D) Prepare candidates with similarity to the question (for MMR) ---
+    # --- D) Prepare candidates (embeddings decoded straight into one float32 matrix) ---
     candidates = []
     for r in rows:
-        emb = emp_to_float(r)
-        sim = cosine_sim(qvec, emb)  # keep your safe cosine_sim
         candidates.append({
             "chunk_id": r.id,
             "section_id": r.section_id,
@@ -209,46 +166,30 @@ def ask(
             "page_to": r.page_to,
             "content": (r.content or ""),
             "document_pdf": r.document_pdf,
-            "embedding": emb,
-            "sim_q": sim,
+            "sim_q": float(r.similarity_pct) / 100.0,
         })
 
     # 5) MMR re-ranking to reduce redundancy
-    #top_k = int(payload.top_k or 15)
-    top_k = int(15)
+    top_k = int(top_k or payload.top_k or 15)
     lam = float(payload.mmr_lambda if payload.mmr_lambda is not None else 0.7)
-    selected: List[Dict[str, Any]] = []
-    selected_ids = set()
-
-    # start by picking the most relevant candidate
-    if candidates:
-        best = max(candidates, key=lambda x: x["sim_q"])
-        selected.append(best)
-        selected_ids.add(best["chunk_id"])
-
-    # iteratively pick items that balance relevance and novelty
-    while len(selected) < top_k and len(selected) < len(candidates):
-        best_score = None
-        best_cand = None
-        for c in candidates:
-            if c["chunk_id"] in selected_ids:
-                continue
-            # max similarity to anything already selected (to penalize redundancy)
-            if selected:
-                max_sim_to_selected = max(
-                    cosine_sim(c["embedding"], s["embedding"]) for s in selected
-                )
-            else:
-                max_sim_to_selected = 0.0
-            # MMR score
-            score = lam * c["sim_q"] - (1.0 - lam) * max_sim_to_selected
-            if best_score is None or score > best_score:
-                best_score = score
-                best_cand = c
-        if best_cand is None:
-            break
-        selected.append(best_cand)
-        selected_ids.add(best_cand["chunk_id"])
+    if matrix is not None or with_embeddings:
+        # RRF (vector + full-text) chooses the candidate pool; within it MMR scores relevance
+        # as cosine similarity to the question, on the same scale as its redundancy term
+        # (cosine to the chunks already picked), so mmr_lambda keeps its usual meaning
+        if matrix is None:
+            matrix = as_unit_matrix(embedding_matrix(rows))
+        reranker = os.getenv("RERANKER", "mmr")
+        with metrics.stage("mmr"):
+            order = get_reranker(reranker)(np.asarray(qvec, dtype=np.float32), matrix, top_k, lam)
+    else:
+        reranker = "none"
+        order = list(range(min(top_k, len(candidates))))  # already in RRF order
+    selected = [candidates[i] for i in order]
+    if trace is not None:
+        trace.update({
+            "reranker": reranker, "mmr_lambda": lam, "top_k": top_k,
+            "candidates": candidate_records(rows), "selected": [int(i) for i in order],
+        })
 
     # 6) Build snippets for the prompt and for returning to client
     snippets: List[Dict[str, Any]] = []
@@ -258,29 +199,239 @@ def ask(
             "section_id": s["section_id"],
             "page_from": s["page_from"],
             "page_to": s["page_to"],
-            "content": s["content"][:1200],  # cap for prompt size
+            "content": s["content"],  # cut to the token budget by pack_prompt
             "document_pdf": s["document_pdf"],
         })
-    
-    # 7) Call the chat model with grounded prompt
-    prompt = build_prompt(payload.question, snippets)
-    chat_model = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
-
-    completion = client.chat.completions.create(
-        model=chat_model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-    )
-    answer = completion.choices[0].message.content.strip()
-    print("usage - token = ", completion.usage)
-    # 8) Return answer with sources (for UI citations)
-    return AskResponse(
-        answer=answer,
-        sources=[{
-            "section_id": s["section_id"],
-            "page_from": s["page_from"],
-            "page_to": s["page_to"],
-            "document_pdf": s["document_pdf"],
-            "excerpt": s["content"][:400],
-        } for s in snippets]
+    return snippets
+
+def pack_prompt(question: str, snippets: List[Dict[str, Any]], model: str
+                ) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]], Dict[str, Any]]:
+    """Chat messages for the snippets that fit the prompt token budget, those snippets, and packing stats."""
+    packed, stats = pack_snippets(snippets, model, **budgets())
+    prompt = build_prompt(question, packed)
+    stats["prompt_tokens"] = get_tokenizer(model).count(prompt)
+    metrics.PROMPT_TOKENS.labels(metrics.current_route()).observe(stats["prompt_tokens"])
+    return [{"role": "user", "content": prompt}], packed, stats
+
+# ---- several policies in one question (uins / catalog filters) ----
+def requested_uins(payload: AskRequest) -> List[str]:
+    return list(dict.fromkeys(u.strip() for u in ([payload.uin] if payload.uin else []) + (payload.uins or [])))
+
+def single_uin(payload: AskRequest) -> Optional[str]:
+    """The UIN when the request targets exactly one policy by UIN, else None (multi-policy request)."""
+    if payload.insurer_name or payload.type_of_product:
+        return None
+    uins = requested_uins(payload)
+    return uins[0] if len(uins) == 1 else None
+
+def max_policies() -> int:
+    # one LATERAL branch (and a share of the prompt budget) per policy
+    return int(os.getenv("CHAT_MAX_POLICIES", "5"))
+
+def policy_scope_stmt(payload: AskRequest):
+    """Policy versions a multi-policy request covers: the listed UINs, narrowed by the catalog filters."""
+    stmt = (
+        select(PolicyVersion.id, PolicyVersion.uin, Insurer.name.label("insurer"))
+        .join(Product, PolicyVersion.product_id == Product.id)
+        .join(Insurer, Product.insurer_id == Insurer.id)
+        .order_by(PolicyVersion.uin)
     )
+    uins = requested_uins(payload)
+    if uins:
+        stmt = stmt.where(PolicyVersion.uin.in_(uins))
+    if payload.insurer_name:
+        stmt = stmt.where(Insurer.name == payload.insurer_name.strip())
+    if payload.type_of_product:
+        stmt = stmt.where(PolicyVersion.type_of_product == payload.type_of_product.strip())
+    return stmt.limit(max_policies() + 1)
+
+def check_policy_scope(payload: AskRequest, policies) -> None:
+    missing = sorted(set(requested_uins(payload)) - {p.uin for p in policies})
+    if missing:
+        narrowed = " matching these filters" if payload.insurer_name or payload.type_of_product else ""
+        raise HTTPException(status_code=404, detail=f"No policy version found{narrowed} for UIN: {', '.join(missing)}")
+    if not policies:
+        raise HTTPException(status_code=404, detail="No policy versions match these filters")
+    if len(policies) > max_policies():
+        raise HTTPException(status_code=400, detail=f"More than {max_policies()} policies match; narrow the filters")
+
+def resolve_policies(db: Session, payload: AskRequest):
+    policies = db.execute(policy_scope_stmt(payload)).all()
+    check_policy_scope(payload, policies)
+    return policies
+
+def select_policy_snippets(payload: AskRequest, qvec: List[float], groups, with_embeddings: bool,
+                           trace: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    MMR within each policy's own candidates, top_k shared out evenly, then interleaved
+    (best of each policy first) so the prompt packer's budget cuts every policy alike.
+    `groups` is [(policy row, candidate rows, embedding matrix or None)].
+    """
+    top_k = int(payload.top_k or 15)
+    per_policy = math.ceil(top_k / len(groups))
+    picked = []
+    for policy, rows, matrix in groups:
+        if not rows:
+            continue  # nothing ingested for this one; the others still answer
+        snippets = select_snippets(payload, qvec, rows, with_embeddings, matrix, top_k=per_policy)
+        picked.append([{**s, "uin": policy.uin, "insurer": policy.insurer} for s in snippets])
+    if not picked:
+        raise HTTPException(status_code=404, detail="No chunks found for these policies. Did you ingest their PDFs?")
+    if trace is not None:
+        trace.update({
+            "policies": [p.uin for p, _, _ in groups], "top_k_per_policy": per_policy,
+            "candidates": {p.uin: candidate_records(rows) for p, rows, _ in groups},
+        })
+    return [s for batch in zip_longest(*picked) for s in batch if s is not None][:top_k]
+
+def group_by_policy(policies, rows) -> List[Tuple[Any, List[Any], None]]:
+    """Rows of multi_policy_candidates (ordered by policy version) split per policy."""
+    by_pvid: Dict[str, List[Any]] = {str(p.id): [] for p in policies}
+    for r in rows:
+        by_pvid[str(r.policy_version_id)].append(r)
+    return [(p, by_pvid[str(p.id)], None) for p in policies]
+
+def chat_model() -> str:
+    return os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+
+def to_sources(snippets: List[Dict[str, Any]]) -> List[Source]:
+    return [{
+        **({"uin": s["uin"], "insurer": s["insurer"]} if "uin" in s else {}),  # multi-policy answers
+        "section_id": s["section_id"],
+        "page_from": s["page_from"],
+        "page_to": s["page_to"],
+        "document_pdf": s["document_pdf"],
+        "excerpt": s["content"][:400],
+    } for s in snippets]
+
+# ---- routes ----
+@router.get("/embedding-cache", summary="Query-embedding cache hit/miss counters")
+def embedding_cache_stats() -> Dict[str, Any]:
+    return get_embedding_cache().stats()
+
+@router.get("/answer-cache", summary="Semantic answer cache hit rate and LLM tokens saved")
+def answer_cache_stats() -> Dict[str, Any]:
+    return get_answer_cache().stats()
+
+@router.get("/llm-client", summary="Outbound LLM calls: queue depth, in flight, retries, errors, latency")
+def llm_client_stats() -> Dict[str, Any]:
+    return get_llm().stats()
+
+@router.get("/embed-batcher", summary="Question-embedding micro-batches: fill and added latency")
+def embed_batcher_stats() -> Dict[str, Any]:
+    batcher = get_embed_batcher()
+    return batcher.stats() if batcher else {"enabled": False}
+
+@router.get("/traces", summary="Retrieval trace sink: sampled, written and dropped traces")
+def trace_stats() -> Dict[str, Any]:
+    return get_trace_sink().stats()
+
+@router.get("/vector-index", summary="In-process vector index size, hits, loads and invalidations")
+def vector_index_stats() -> Dict[str, Any]:
+    return {"enabled": vector_index_enabled(), **(get_vector_index().stats() if vector_index_enabled() else {})}
+
+@router.post("/ask", response_model=AskResponse, summary="Ask a question for a specific UIN")
+def ask(
+    payload: AskRequest = Body(...),
+    db: Session = Depends(get_db),
+    llm: LLMClient = Depends(get_llm),
+):
+    with metrics.request("/chat/ask") as timer:
+        uin = single_uin(payload)
+        trace = get_trace_sink().start("/chat/ask", payload.trace, uin=uin or requested_uins(payload),
+                                       question=payload.question)
+        if uin is None:
+            return ask_policies(payload, db, llm, trace)
+        # 1) Resolve policy_version_id from UIN (cached after the first request)
+        with metrics.stage("uin_resolve"):
+            policy_version_id = resolve_policy_version(db, uin)
+
+        # 2) Embed the question
+        with metrics.stage("embed"):
+            qvec = embed(llm, payload.question)
+
+        # 2b) Same question (semantically) already answered for this policy version, with the same
+        #     retrieval settings? (not for traced requests: the trace is of the retrieval)
+        answer_cache = get_answer_cache()
+        cache_key = retrieval_key(payload)
+        with metrics.stage("answer_cache"):
+            cached = None if payload.trace else answer_cache.lookup(db, policy_version_id, qvec, chat_model(),
+                                                                    cache_key)
+        if cached:
+            timer.outcome = "cached"
+            get_trace_sink().emit(trace, policy_version_id=policy_version_id, answer_cached=True)
+            return answer_response(**cached)
+
+        # 3) Retrieve candidate chunks for this policy version
+        candidate_k = int(payload.candidate_k or 80)
+        with_embeddings = retrieval_with_embeddings()
+        matrix = None
+
+        retrieval = "memory" if vector_index_enabled() else "hybrid"
+        if retrieval == "memory":
+            # in-process index: exact top-k + MMR in memory, the DB is only hit for cold policies
+            with metrics.stage("vector_query"):
+                rows, matrix = search_policy(policy_version_id, qvec, candidate_k, db)
+        else:
+            # vector + full-text, fused (one query)
+            with metrics.stage("hybrid_query"):
+                set_search_params(db, **ann_params(payload, candidate_k))
+                rows = hybrid_candidates(db, policy_version_id, qvec, payload.question, limit=candidate_k,
+                                         lexical_k=lexical_k(payload), with_embeddings=with_embeddings)
+        # end the read transaction: the pooled connection goes back for the LLM call
+        db.commit()
+        if not rows:
+            raise HTTPException(status_code=404, detail="No chunks found for this UIN. Did you ingest a PDF?")
+
+        snippets = select_snippets(payload, qvec, rows, with_embeddings, matrix, trace)
+
+        # 7) Call the chat model with grounded prompt (snippets packed into the token budget)
+        with metrics.stage("prompt_build"):
+            messages, snippets, packing = pack_prompt(payload.question, snippets, chat_model())
+        get_trace_sink().emit(trace, policy_version_id=policy_version_id, retrieval=retrieval,
+                              candidate_k=candidate_k, lexical_k=lexical_k(payload), answer_cached=False,
+                              prompt=packing)
+        with metrics.stage("llm"):
+            completion = llm.chat(messages, chat_model(), temperature=0.2)
+        answer = completion.choices[0].message.content.strip()
+        metrics.record_tokens(chat_model(), uin, completion.usage)
+        sources = to_sources(snippets)
+        with metrics.stage("answer_cache_store"):
+            answer_cache.store(
+                db, policy_version_id, payload.question, qvec, chat_model(), cache_key, answer, sources,
+                completion.usage.total_tokens if completion.usage else 0,
+            )
+        # 8) Return answer with sources (for UI citations)
+        return answer_response(answer, sources)
+
+def ask_policies(payload: AskRequest, db: Session, llm: LLMClient, trace: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """/chat/ask over several policies: one embedding, one candidate query, one answer (not answer-cached)."""
+    with metrics.stage("uin_resolve"):
+        policies = resolve_policies(db, payload)
+    with metrics.stage("embed"):
+        qvec = embed(llm, payload.question)
+
+    candidate_k = int(payload.candidate_k or 80)  # per policy
+    with_embeddings = retrieval_with_embeddings()
+    retrieval = "memory" if vector_index_enabled() else "hybrid"
+    if retrieval == "memory":
+        with metrics.stage("vector_query"):
+            groups = [(p, *search_policy(p.id, qvec, candidate_k, db)) for p in policies]
+    else:
+        # LATERAL vector + full-text top-k per policy version, fused per policy (one query)
+        with metrics.stage("hybrid_query"):
+            set_search_params(db, **ann_params(payload, candidate_k))
+            rows = multi_policy_candidates(db, [p.id for p in policies], qvec, payload.question, limit=candidate_k,
+                                           lexical_k=lexical_k(payload), with_embeddings=with_embeddings)
+        groups = group_by_policy(policies, rows)
+    db.commit()
+    snippets = select_policy_snippets(payload, qvec, groups, with_embeddings, trace)
+
+    with metrics.stage("prompt_build"):
+        messages, snippets, packing = pack_prompt(payload.question, snippets, chat_model())
+    get_trace_sink().emit(trace, retrieval=retrieval, candidate_k=candidate_k, lexical_k=lexical_k(payload),
+                          answer_cached=False, prompt=packing)
+    with metrics.stage("llm"):
+        completion = llm.chat(messages, chat_model(), temperature=0.2)
+    metrics.record_tokens(chat_model(), "multi", completion.usage)
+    return answer_response(completion.choices[0].message.content.strip(), to_sources(snippets))
@@ -0,0 +1,270 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, Body
+from sqlalchemy import select
+
+from sse_starlette.sse import EventSourceResponse
+
+from app import metrics
+from app.answer_cache import LOOKUP, STORE, get_answer_cache
+from app.db_async import AsyncSessionLocal
+from app.embed_batcher import get_embed_batcher
+from app.embedding_cache import get_embedding_cache
+from app.llm import LLMClient, get_llm
+from app.models import PolicyVersion
+from app.retrieval import (
+    SET_CONFIGS, search_params, hybrid_candidates_stmt, hybrid_params, multi_policy_candidates_stmt,
+    multi_policy_params,
+)
+from app.traces import get_trace_sink
+from app.vector_index import search_policy, vector_index_enabled
+from app.routes.chat import (
+    EMBED_MODEL, AskRequest, AskResponse, ann_params, answer_response, cached_policy_version_id, chat_model,
+    check_policy_scope, group_by_policy, lexical_k, pack_prompt, policy_scope_stmt, remember_policy_version_id,
+    requested_uins, retrieval_key, retrieval_with_embeddings, select_policy_snippets, select_snippets, single_uin,
+    to_sources,
+)
+
+router = APIRouter(prefix="/chat", tags=["chat"])
+
+# ---- helpers ----
+async def aembed(llm: LLMClient, text_in: str) -> List[float]:
+    cache = get_embedding_cache()
+    hit = cache.get_many([text_in], EMBED_MODEL, local_only=True)
+    if not hit and cache.store is not None:
+        # persistent tier does blocking I/O; keep it off the event loop
+        hit = await asyncio.to_thread(cache.get_many, [text_in], EMBED_MODEL)
+    if hit:
+        return hit[0]
+    batcher = get_embed_batcher()
+    if batcher is not None:
+        vec = await batcher.embed(text_in, EMBED_MODEL)
+    else:
+        vec = (await llm.aembed([text_in], EMBED_MODEL))[0]
+    if cache.store is not None:
+        await asyncio.to_thread(cache.put_many, [text_in], [vec], EMBED_MODEL)
+    else:
+        cache.put_many([text_in], [vec], EMBED_MODEL)
+    return vec
+
+async def resolve_policy_version(uin: str) -> str:
+    pvid = cached_policy_version_id(uin)
+    if pvid is not None:
+        return pvid
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(PolicyVersion.id).where(PolicyVersion.uin == uin.strip())
+        )).first()
+    if not row:
+        raise HTTPException(status_code=404, detail=f"No policy version found for UIN: {uin}")
+    return remember_policy_version_id(uin, row[0])
+
+async def fetch_candidate_rows(stmt, params: Dict[str, Any], ann: Dict[str, Any]):
+    async with AsyncSessionLocal() as db:
+        knobs = search_params(**ann)
+        if knobs:
+            await db.execute(SET_CONFIGS, knobs)
+        result = await db.execute(stmt, params)
+        return result.fetchall()
+
+async def resolve_policies(payload: AskRequest):
+    async with AsyncSessionLocal() as db:
+        policies = (await db.execute(policy_scope_stmt(payload))).all()
+    check_policy_scope(payload, policies)
+    return policies
+
+async def timed(name: str, aw):
+    with metrics.stage(name):
+        return await aw
+
+async def resolve_and_embed(payload: AskRequest, llm: LLMClient, uin: Optional[str]):
+    # 1+2) UIN (or multi-policy scope) lookup and question embedding are independent: run them together
+    return await asyncio.gather(
+        timed("uin_resolve", resolve_policy_version(uin) if uin is not None else resolve_policies(payload)),
+        timed("embed", aembed(llm, payload.question)),
+    )
+
+async def cached_answer(payload: AskRequest, pvid: str, qvec: List[float], model: str) -> Optional[Dict[str, Any]]:
+    cache = get_answer_cache()
+    if not cache.enabled or payload.trace:  # a traced request runs (and traces) its retrieval
+        return None
+    with metrics.stage("answer_cache"):
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(LOOKUP, cache.lookup_params(pvid, qvec, model, retrieval_key(payload)))).first()
+    return cache.record(row)
+
+async def store_answer(payload: AskRequest, pvid: str, qvec: List[float], model: str,
+                       answer: str, sources: List[Dict[str, Any]], total_tokens: int,
+                       route: Optional[str] = None) -> None:
+    cache = get_answer_cache()
+    if not cache.enabled:
+        return
+    with metrics.stage("answer_cache_store", route):
+        async with AsyncSessionLocal() as db:
+            await db.execute(STORE, cache.store_params(pvid, payload.question, qvec, model, retrieval_key(payload),
+                                                       answer, sources, total_tokens))
+            for stmt, params in cache.prune_statements():
+                cache.record_pruned((await db.execute(stmt, params)).rowcount)
+            await db.commit()
+
+async def retrieve_snippets(payload: AskRequest, policy_version_id: str, qvec: List[float],
+                            trace: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    candidate_k = int(payload.candidate_k or 80)
+    with_embeddings = retrieval_with_embeddings()
+    if trace is not None:
+        trace.update(policy_version_id=policy_version_id, candidate_k=candidate_k, lexical_k=lexical_k(payload),
+                     retrieval="memory" if vector_index_enabled() else "hybrid")
+    if vector_index_enabled():
+        # 3) In-process index; a cold policy loads over the sync engine, so off the event loop
+        with metrics.stage("vector_query"):
+            rows, matrix = await asyncio.to_thread(search_policy, policy_version_id, qvec, candidate_k)
+        if not rows:
+            raise HTTPException(status_code=404, detail="No chunks found for this UIN. Did you ingest a PDF?")
+        return select_snippets(payload, qvec, rows, with_embeddings, matrix, trace)
+
+    # 3) Vector + full-text candidates, fused in one query
+    with metrics.stage("hybrid_query"):
+        rows = await fetch_candidate_rows(
+            hybrid_candidates_stmt(with_embeddings),
+            hybrid_params(policy_version_id, qvec, payload.question, candidate_k, lexical_k(payload)),
+            ann_params(payload, candidate_k),
+        )
+    if not rows:
+        raise HTTPException(status_code=404, detail="No chunks found for this UIN. Did you ingest a PDF?")
+
+    return select_snippets(payload, qvec, rows, with_embeddings, trace=trace)
+
+async def retrieve_policy_snippets(payload: AskRequest, policies, qvec: List[float],
+                                   trace: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """retrieve_snippets for a multi-policy request: candidates of every policy from one query."""
+    candidate_k = int(payload.candidate_k or 80)  # per policy
+    with_embeddings = retrieval_with_embeddings()
+    if trace is not None:
+        trace.update(candidate_k=candidate_k, lexical_k=lexical_k(payload),
+                     retrieval="memory" if vector_index_enabled() else "hybrid")
+    if vector_index_enabled():
+        def search_all():
+            return [(p, *search_policy(p.id, qvec, candidate_k)) for p in policies]
+        with metrics.stage("vector_query"):
+            groups = await asyncio.to_thread(search_all)
+    else:
+        # LATERAL vector + full-text top-k per policy version, fused per policy (one query)
+        with metrics.stage("hybrid_query"):
+            rows = await fetch_candidate_rows(
+                multi_policy_candidates_stmt(with_embeddings),
+                multi_policy_params([p.id for p in policies], qvec, payload.question, candidate_k, lexical_k(payload)),
+                ann_params(payload, candidate_k),
+            )
+        groups = group_by_policy(policies, rows)
+    return select_policy_snippets(payload, qvec, groups, with_embeddings, trace)
+
+# ---- routes ----
+@router.post("/ask-async", response_model=AskResponse, summary="Ask a question for a specific UIN (async path)")
+async def ask_async(payload: AskRequest = Body(...)):
+    llm = get_llm()
+    model = chat_model()
+    sink = get_trace_sink()
+    with metrics.request("/chat/ask-async") as timer:
+        uin = single_uin(payload)
+        trace = sink.start("/chat/ask-async", payload.trace, uin=uin or requested_uins(payload),
+                           question=payload.question)
+        scope, qvec = await resolve_and_embed(payload, llm, uin)
+        if uin is None:
+            # several policies: one answer over all of them, not answer-cached
+            policy_version_id = None
+            snippets = await retrieve_policy_snippets(payload, scope, qvec, trace)
+        else:
+            policy_version_id = scope
+            cached = await cached_answer(payload, policy_version_id, qvec, model)
+            if cached:
+                timer.outcome = "cached"
+                sink.emit(trace, policy_version_id=policy_version_id, answer_cached=True)
+                return answer_response(**cached)
+            snippets = await retrieve_snippets(payload, policy_version_id, qvec, trace)
+
+        # 7) Call the chat model with grounded prompt (snippets packed into the token budget)
+        with metrics.stage("prompt_build"):
+            messages, snippets, packing = pack_prompt(payload.question, snippets, model)
+        sink.emit(trace, answer_cached=False, prompt=packing)
+        with metrics.stage("llm"):
+            completion = await llm.achat(messages, model, temperature=0.2)
+        answer = completion.choices[0].message.content.strip()
+        metrics.record_tokens(model, uin or "multi", completion.usage)
+        sources = to_sources(snippets)
+        if policy_version_id is not None:
+            await store_answer(payload, policy_version_id, qvec, model, answer, sources,
+                               completion.usage.total_tokens if completion.usage else 0)
+        return answer_response(answer, sources)
+
+@router.post("/ask/stream", summary="Ask a question for a specific UIN, streaming the answer over SSE")
+async def ask_stream(payload: AskRequest = Body(...)):
+    """
+    Server-sent events, in order:
+      sources - JSON list of sources, sent as soon as retrieval finishes
+      token   - JSON string, one per answer delta from the chat model
+      done    - JSON {"model", "usage", "cached"} once generation completes
+      error   - JSON {"detail"} if the chat model fails mid-stream
+    Retrieval errors (unknown UIN, no chunks) are plain HTTP errors, before the stream opens.
+    An answer-cache hit sends the whole cached answer as a single token event.
+    """
+    llm = get_llm()
+    model = chat_model()
+    sink = get_trace_sink()
+    route = "/chat/ask/stream"
+    with metrics.request(route) as timer:
+        uin = single_uin(payload)
+        trace = sink.start(route, payload.trace, uin=uin or requested_uins(payload), question=payload.question)
+        scope, qvec = await resolve_and_embed(payload, llm, uin)
+        if uin is None:
+            policy_version_id = None
+            snippets = await retrieve_policy_snippets(payload, scope, qvec, trace)
+        else:
+            policy_version_id = scope
+            cached = await cached_answer(payload, policy_version_id, qvec, model)
+            if cached:
+                timer.outcome = "cached"
+                sink.emit(trace, policy_version_id=policy_version_id, answer_cached=True)
+                async def cached_events():
+                    yield {"event": "sources", "data": json.dumps(cached["sources"], default=str)}
+                    yield {"event": "token", "data": json.dumps(cached["answer"])}
+                    yield {"event": "done", "data": json.dumps({"model": model, "usage": None, "cached": True})}
+                return EventSourceResponse(cached_events())
+            snippets = await retrieve_snippets(payload, policy_version_id, qvec, trace)
+        with metrics.stage("prompt_build"):
+            messages, snippets, packing = pack_prompt(payload.question, snippets, model)
+        sink.emit(trace, answer_cached=False, prompt=packing)
+        sources = to_sources(snippets)
+
+    # the generator runs after the handler returned, so its stages name the route explicitly
+    async def events():
+        from openai import OpenAIError  # loaded with the LLM client by now
+        yield {"event": "sources", "data": json.dumps(sources, default=str)}
+        usage = None
+        parts: List[str] = []
+        t0 = time.perf_counter()
+        try:
+            with metrics.stage("llm", route):
+                async with llm.achat_stream(messages, model, temperature=0.2,
+                                            stream_options={"include_usage": True}) as stream:
+                    async for chunk in stream:
+                        if chunk.usage:
+                            usage = chunk.usage.model_dump()
+                        for choice in chunk.choices:
+                            if choice.delta.content:
+                                if not parts:
+                                    metrics.observe("llm_first_token", time.perf_counter() - t0, route)
+                                parts.append(choice.delta.content)
+                                yield {"event": "token", "data": json.dumps(choice.delta.content)}
+        except OpenAIError as e:
+            yield {"event": "error", "data": json.dumps({"detail": str(e)})}
+            return
+        metrics.record_tokens(model, uin or "multi", usage)
+        yield {"event": "done", "data": json.dumps({"model": model, "usage": usage, "cached": False})}
+        if policy_version_id is not None:
+            await store_answer(payload, policy_version_id, qvec, model, "".join(parts).strip(), sources,
+                               usage["total_tokens"] if usage else 0, route)
+
+    return EventSourceResponse(events())
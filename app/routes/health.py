@@ -0,0 +1,46 @@
+import threading
+from typing import Any, Dict
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.db import pool_monitor
+from app.warmup import get_warmup
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+# ---- pool exhaustion ----
+_lock = threading.Lock()
+pool_timeouts = 0
+
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError) -> JSONResponse:
+    """Every connection was checked out for DB_POOL_TIMEOUT seconds: shed the request with a 503."""
+    global pool_timeouts
+    with _lock:
+        pool_timeouts += 1
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database connection pool exhausted, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+# ---- routes ----
+@router.get("/live", summary="The process is up and serving")
+def live() -> Dict[str, Any]:
+    return {"status": "ok"}
+
+@router.get("/ready", summary="Warm-up finished without failures (pools, LLM client, tokenizer, caches, schema)")
+def ready() -> JSONResponse:
+    """200 once every warm-up step is ok, skipped or degraded; 503 while running or if one failed."""
+    warmup = get_warmup()
+    return JSONResponse(status_code=200 if warmup.ready() else 503, content=warmup.status())
+
+@router.get("/db-pool", summary="Connection pool usage of the sync and async engines")
+def db_pool_stats() -> Dict[str, Any]:
+    from app.db_async import async_pool_monitor
+    return {
+        "sync": pool_monitor.stats(),
+        "async": async_pool_monitor.stats(),
+        "pool_timeouts": pool_timeouts,
+    }
@@ -1,22 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from typing import List, Optional
+
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
+from typing_extensions import TypedDict
 
-from app.db import SessionLocal
+from app.db import get_db
 from app.models import PolicyVersion, Product, Insurer
+from app.pagination import DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, next_page_headers
 
 router = APIRouter(prefix="/policy-versions", tags=["policy-versions"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class PolicyVersionRow(TypedDict):
+    id: UUID
+    uin: str
+    version_label: Optional[str]
+    status: str
+    product: str
+    insurer: str
 
-@router.get("", summary="List policy versions with UINs")
-def list_policy_versions(db: Session = Depends(get_db)):
-    rows = db.execute(
+@router.get("", response_model=List[PolicyVersionRow], summary="List policy versions with UINs")
+def list_policy_versions(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    db: Session = Depends(get_db),
+) -> List[PolicyVersionRow]:
+    """Ordered by (insurer, product, uin), at most `limit` per page."""
+    sort_key = (Insurer.name, Product.name, PolicyVersion.uin)
+    stmt = (
         select(
             PolicyVersion.id,
             PolicyVersion.uin,
@@ -27,17 +42,11 @@ def list_policy_versions(db: Session = Depends(get_db)):
         )
         .join(Product, PolicyVersion.product_id == Product.id)
         .join(Insurer, Product.insurer_id == Insurer.id)
-        .order_by(Insurer.name, Product.name, PolicyVersion.uin)
-    ).all()
+    )
+    after = decode_cursor(cursor, 3)
+    if after:
+        stmt = stmt.where(tuple_(*sort_key) > tuple_(*after))
+    rows = db.execute(stmt.order_by(*sort_key).limit(limit + 1)).mappings().all()
 
-    return [
-        {
-            "id": r.id,
-            "uin": r.uin,
-            "version_label": r.version_label,
-            "status": r.status,
-            "product": r.product,
-            "insurer": r.insurer,
-        }
-        for r in rows
-    ]
+    response.headers.update(next_page_headers(request, rows, limit, lambda r: (r["insurer"], r["product"], r["uin"])))
+    return [dict(r) for r in rows[:limit]]
@@ -0,0 +1,127 @@
+# app/scripts/bench_ann_recall.py
+#
+# Recall vs latency of the ANN candidate query (replaces similarity_test.py).
+# Exact top-k (index scans disabled) is the ground truth; each ef_search / probes
+# value is then scored by recall@k and p50/p95 latency.
+#
+# Settings are measured on the bare ANN statement, not vector_candidates: the app's
+# query (_vector_top_k) reruns exactly whenever the index returns fewer than k rows,
+# which would report recall near 1.0 for exactly the settings that are too low. The
+# "fallback" column is the share of queries where the app would take that exact path.
+#
+#   python -m app.scripts.bench_ann_recall --uin ACKHLIP20039V012021 --k 100
+#   python -m app.scripts.bench_ann_recall --uin ... --probes 1 5 10 20   # ivfflat index
+#
+# Queries are sampled from stored chunk embeddings so no OpenAI calls are made;
+# pass --question to also embed and run real questions.
+import argparse
+import os
+import statistics
+import time
+from typing import List
+
+from dotenv import load_dotenv
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import bindparam, text
+
+from app.db import SessionLocal
+from app.models import PolicyVersion
+from app.retrieval import EMBED_DIM, decode_vectors, set_search_params, vector_candidates
+
+load_dotenv()
+
+# the ANN branch of _vector_top_k on its own (no exact fallback)
+ANN_TOP_K = text("""
+    SELECT c.id
+    FROM policy_chunk c
+    WHERE c.policy_version_id = :pvid
+    ORDER BY c.embedding <=> :qvec
+    LIMIT :k
+""").bindparams(bindparam("qvec", type_=Vector(EMBED_DIM)))
+
+
+def sample_queries(db, pvid: str, n: int) -> List[List[float]]:
+    rows = db.execute(text("""
+        SELECT vector_send(embedding) AS embedding
+        FROM policy_chunk
+        WHERE policy_version_id = :pvid
+        ORDER BY random()
+        LIMIT :n
+    """), {"pvid": pvid, "n": n}).fetchall()
+    return decode_vectors([r.embedding for r in rows]).tolist()
+
+
+def embed_questions(questions: List[str]) -> List[List[float]]:
+    from openai import OpenAI
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    resp = client.embeddings.create(model="text-embedding-3-small", input=questions)
+    return [d.embedding for d in resp.data]
+
+
+def run(pvid: str, queries, k: int, exact: bool = False, **params):
+    """Returns (list of id lists, list of latencies in seconds)."""
+    ids, lat = [], []
+    for q in queries:
+        with SessionLocal() as db:
+            if exact:
+                db.execute(text("SELECT set_config('enable_indexscan', 'off', true)"))
+            else:
+                # small tables are otherwise planned as an exact scan + sort, not the vector index
+                db.execute(text("SELECT set_config('enable_seqscan', 'off', true), "
+                                "set_config('enable_sort', 'off', true)"))
+                set_search_params(db, **params)
+            t0 = time.perf_counter()
+            if exact:
+                rows = vector_candidates(db, pvid, q, limit=k, with_embeddings=False)
+            else:
+                rows = db.execute(ANN_TOP_K, {"pvid": pvid, "qvec": q, "k": k}).fetchall()
+            lat.append(time.perf_counter() - t0)
+            ids.append([r.id for r in rows])
+            db.rollback()
+    return ids, lat
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uin", required=True)
+    ap.add_argument("--k", type=int, default=100)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--question", action="append", default=[], help="real question(s) to embed")
+    ap.add_argument("--ef-search", type=int, nargs="*", default=[10, 20, 40, 100, 200, 400])
+    ap.add_argument("--probes", type=int, nargs="*", default=[])
+    ap.add_argument("--iterative-scan", default=None, help="relaxed_order | strict_order (pgvector >= 0.8)")
+    args = ap.parse_args()
+
+    with SessionLocal() as db:
+        pvid = PolicyVersion.id_from_uin(db, args.uin)
+        queries = sample_queries(db, pvid, args.queries)
+    if args.question:
+        queries += embed_questions(args.question)
+    if not queries:
+        raise SystemExit(f"No chunks stored for UIN {args.uin}")
+
+    truth, exact_lat = run(pvid, queries, args.k, exact=True)
+
+    print(f"uin={args.uin} k={args.k} queries={len(queries)}")
+    print(f"{'setting':<18}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'fallback':>10}")
+    print(f"{'exact (seqscan)':<18}{1.0:>10.3f}{pct(exact_lat, 50) * 1000:>10.2f}{pct(exact_lat, 95) * 1000:>10.2f}")
+
+    settings = [("ef_search", v) for v in args.ef_search] + [("probes", v) for v in args.probes]
+    for name, value in settings:
+        got, lat = run(pvid, queries, args.k, **{name: value, "iterative_scan": args.iterative_scan})
+        recall = statistics.mean(
+            len(set(g) & set(t)) / max(1, len(t)) for g, t in zip(got, truth)
+        )
+        fallback = statistics.mean(len(g) < args.k for g in got)  # same test as _vector_top_k
+        label = f"{name}={value}"
+        print(f"{label:<18}{recall:>10.3f}{pct(lat, 50) * 1000:>10.2f}{pct(lat, 95) * 1000:>10.2f}"
+              f"{fallback:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# app/scripts/bench_chunk_insert.py
+#
+# Chunks inserted per second: ORM objects via PolicyChunk.new_for_uin_and_doc (one
+# UIN lookup per chunk) vs batched INSERT vs binary COPY (app/bulk_load.py).
+# Every method runs in its own transaction that is rolled back, so nothing is kept.
+# Needs a database with at least one policy version.
+#
+#   python -m app.scripts.bench_chunk_insert --uin ACKHLIP20039V012021 --chunks 2000
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from app.bulk_load import VECTOR_INDEX, chunk_row, copy_chunks, insert_chunks
+from app.db import SessionLocal
+from app.models import PolicyChunk, PolicyDocument, PolicyVersion
+from app.retrieval import EMBED_DIM
+
+
+def synthetic(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.normal(size=(n, EMBED_DIM)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    words = "waiting period sum insured pre-existing disease cashless claim room rent co-pay".split()
+    bodies = [" ".join(rng.choice(words, size=120)) for _ in range(n)]
+    return bodies, vecs.tolist()
+
+
+def orm_path(db, uin, doc, bodies, vecs):
+    for i, (body, vec) in enumerate(zip(bodies, vecs)):
+        row = PolicyChunk.new_for_uin_and_doc(
+            db, uin=uin, document_id=doc.id, section_id=None, page_from=i // 5 + 1, page_to=i // 5 + 1,
+            content=body, policy_chunk_metadata={"chunk_index": i},
+        )
+        row.embedding = vec
+        db.add(row)
+    db.flush()
+
+
+def bulk_rows(uin, doc, bodies, vecs, db):
+    pvid = PolicyVersion.id_from_uin(db, uin)  # resolved once
+    return [
+        chunk_row(pvid, doc.id, body, vec, page_from=i // 5 + 1, page_to=i // 5 + 1, metadata={"chunk_index": i})
+        for i, (body, vec) in enumerate(zip(bodies, vecs))
+    ]
+
+
+def insert_path(db, uin, doc, bodies, vecs):
+    insert_chunks(db, bulk_rows(uin, doc, bodies, vecs, db))
+
+
+def copy_path(db, uin, doc, bodies, vecs):
+    copy_chunks(db, bulk_rows(uin, doc, bodies, vecs, db))
+
+
+def copy_deferred_path(db, uin, doc, bodies, vecs):
+    # drop + COPY + rebuild, all inside the (rolled back) transaction
+    indexdef = db.execute(
+        text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"), {"name": VECTOR_INDEX}
+    ).scalar()
+    if indexdef:
+        db.execute(text(f"DROP INDEX {VECTOR_INDEX}"))
+    copy_chunks(db, bulk_rows(uin, doc, bodies, vecs, db))
+    if indexdef:
+        db.execute(text(indexdef))
+
+
+METHODS = {
+    "orm (per-chunk UIN)": orm_path,
+    "insert().values": insert_path,
+    "copy binary": copy_path,
+    "copy + index after": copy_deferred_path,
+}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uin", required=True)
+    ap.add_argument("--chunks", type=int, default=2000)
+    ap.add_argument("--skip", nargs="*", default=[], help="method names to leave out")
+    args = ap.parse_args()
+
+    bodies, vecs = synthetic(args.chunks)
+    print(f"chunks={args.chunks} dim={EMBED_DIM}")
+    print(f"{'method':<22}{'seconds':>10}{'chunks/s':>12}")
+    baseline = None
+    for name, fn in METHODS.items():
+        if name in args.skip:
+            continue
+        db = SessionLocal()
+        try:
+            doc = PolicyDocument.new_for_uin(db, args.uin, doc_type="benchmark", source_uri="bench://chunk_insert")
+            t0 = time.perf_counter()
+            fn(db, args.uin, doc, bodies, vecs)
+            elapsed = time.perf_counter() - t0
+        finally:
+            db.rollback()
+            db.close()
+        rate = args.chunks / elapsed
+        baseline = baseline or rate
+        print(f"{name:<22}{elapsed:>10.2f}{rate:>12.0f}  ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
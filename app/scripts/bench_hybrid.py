@@ -0,0 +1,102 @@
+# app/scripts/bench_hybrid.py
+#
+# Retrieval latency by policy size: the old two-query path (vector top-k, then an
+# unindexed lexical scan computing a score for every chunk of the policy) vs the
+# single hybrid query (vector + GIN full-text, fused with RRF in SQL).
+# Each size loads a synthetic policy version with COPY inside a transaction that is
+# rolled back afterwards, so nothing is kept.
+#
+#   python -m app.scripts.bench_hybrid --sizes 300 1000 5000 --queries 50
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import text, bindparam
+from pgvector.sqlalchemy import Vector
+
+from app.bulk_load import chunk_row, copy_chunks
+from app.db import SessionLocal
+from app.models import Insurer, Product, PolicyVersion, PolicyDocument
+from app.retrieval import EMBED_DIM, hybrid_candidates, lexical_query, vector_candidates
+
+WORDS = (
+    "waiting period pre-existing disease sum insured cashless claim network hospital room rent "
+    "co-pay deductible consumables exclusion maternity ambulance day care domiciliary ayush "
+    "organ donor cumulative bonus restoration premium grace renewal portability"
+).split()
+
+# what the lexical branch cost before: no index, a score computed for every chunk of the policy
+LEGACY_LEXICAL = text("""
+    SELECT c.id, (1 - (c.embedding <=> :qvec)) * 100 AS similarity_pct
+    FROM policy_chunk c
+    WHERE c.policy_version_id = :pvid
+    ORDER BY ts_rank_cd(to_tsvector('english', c.content), websearch_to_tsquery('english', :qtext)) DESC
+    LIMIT :tlimit
+""").bindparams(bindparam("qvec", type_=Vector(EMBED_DIM)))
+
+
+def unit_rows(rng, n: int) -> np.ndarray:
+    m = rng.normal(size=(n, EMBED_DIM)).astype(np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def load_policy(db, rng, size: int) -> str:
+    ins = Insurer(name="bench")
+    prod = Product(insurer=ins, line_of_business="health", name="bench")
+    pv = PolicyVersion(product=prod, uin=f"BENCH-HYBRID-{size}", version_label="bench")
+    doc = PolicyDocument(policy_version=pv, doc_type="benchmark", source_uri="bench://hybrid")
+    db.add_all([ins, prod, pv, doc])
+    db.flush()
+    vecs = unit_rows(rng, size)
+    copy_chunks(db, [
+        chunk_row(pv.id, doc.id, " ".join(rng.choice(WORDS, size=120)), vec, page_from=i // 5 + 1, page_to=i // 5 + 1)
+        for i, vec in enumerate(vecs.tolist())
+    ])
+    db.execute(text("ANALYZE policy_chunk"))
+    return pv.id
+
+
+def pct(samples, q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * (len(s) - 1)))] * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[300, 1000, 5000])
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--candidate-k", type=int, default=80)
+    ap.add_argument("--lexical-k", type=int, default=20)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"queries={args.queries} candidate_k={args.candidate_k} lexical_k={args.lexical_k}")
+    print(f"{'chunks':>8}  {'path':<28}{'p50 ms':>9}{'p95 ms':>9}")
+    for size in args.sizes:
+        db = SessionLocal()
+        try:
+            pvid = load_policy(db, rng, size)
+            qvecs = unit_rows(rng, args.queries).tolist()
+            questions = [" ".join(rng.choice(WORDS, size=8)) + "?" for _ in range(args.queries)]
+
+            legacy, hybrid = [], []
+            for q, question in zip(qvecs, questions):
+                t0 = time.perf_counter()
+                vector_candidates(db, pvid, q, limit=args.candidate_k, with_embeddings=False)
+                db.execute(LEGACY_LEXICAL, {"pvid": pvid, "qvec": q, "qtext": lexical_query(question),
+                                            "tlimit": args.lexical_k}).fetchall()
+                legacy.append(time.perf_counter() - t0)
+
+                t0 = time.perf_counter()
+                hybrid_candidates(db, pvid, q, question, limit=args.candidate_k, lexical_k=args.lexical_k,
+                                  with_embeddings=False)
+                hybrid.append(time.perf_counter() - t0)
+        finally:
+            db.rollback()
+            db.close()
+        print(f"{size:>8}  {'vector + unindexed lexical':<28}{pct(legacy, .5):>9.1f}{pct(legacy, .95):>9.1f}")
+        print(f"{size:>8}  {'hybrid (1 query, RRF)':<28}{pct(hybrid, .5):>9.1f}{pct(hybrid, .95):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# app/scripts/bench_mmr.py
+#
+# Compares the old pure-Python MMR loop from /chat/ask with the vectorised
+# re-ranker in app/rerank.py, and checks both pick the same chunks in the same order.
+#
+#   python -m app.scripts.bench_mmr --n 150 --k 15 --dim 1536
+import argparse
+import math
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.rerank import as_unit_matrix, mmr
+
+
+# ---- old implementation (as it was in app/routes/chat.py) ----
+def l2_norm(v: List[float]) -> float:
+    return math.sqrt(sum(x * x for x in v)) or 1.0
+
+def cosine_sim(a: List[float], b: List[float]) -> float:
+    dot = sum(x*y for x, y in zip(a, b))
+    return dot / (l2_norm(a) * l2_norm(b))
+
+def legacy_mmr(qvec: List[float], embs: List[List[float]], top_k: int, lam: float) -> List[int]:
+    candidates: List[Dict[str, Any]] = [
+        {"chunk_id": i, "embedding": e, "sim_q": cosine_sim(qvec, e)} for i, e in enumerate(embs)
+    ]
+    selected: List[Dict[str, Any]] = []
+    selected_ids = set()
+    if candidates:
+        best = max(candidates, key=lambda x: x["sim_q"])
+        selected.append(best)
+        selected_ids.add(best["chunk_id"])
+    while len(selected) < top_k and len(selected) < len(candidates):
+        best_score = None
+        best_cand = None
+        for c in candidates:
+            if c["chunk_id"] in selected_ids:
+                continue
+            max_sim_to_selected = max(cosine_sim(c["embedding"], s["embedding"]) for s in selected)
+            score = lam * c["sim_q"] - (1.0 - lam) * max_sim_to_selected
+            if best_score is None or score > best_score:
+                best_score = score
+                best_cand = c
+        if best_cand is None:
+            break
+        selected.append(best_cand)
+        selected_ids.add(best_cand["chunk_id"])
+    return [s["chunk_id"] for s in selected]
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=150, help="candidates")
+    ap.add_argument("--k", type=int, default=15, help="snippets to select")
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--lam", type=float, default=0.5)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # clustered vectors so the diversity term actually matters
+    centers = rng.normal(size=(8, args.dim))
+    embs_np = centers[rng.integers(0, 8, args.n)] + 0.3 * rng.normal(size=(args.n, args.dim))
+    q_np = centers[0] + 0.5 * rng.normal(size=args.dim)
+    embs = embs_np.tolist()
+    qvec = q_np.tolist()
+
+    old_order = legacy_mmr(qvec, embs, args.k, args.lam)
+    new_order = mmr(np.asarray(qvec, dtype=np.float32), as_unit_matrix(embs), args.k, args.lam)
+    assert old_order == new_order, f"selection differs:\n old={old_order}\n new={new_order}"
+
+    t_old = timed(lambda: legacy_mmr(qvec, embs, args.k, args.lam), args.repeat)
+    # include list -> matrix conversion, which the route pays on every request
+    t_new = timed(lambda: mmr(np.asarray(qvec, dtype=np.float32), as_unit_matrix(embs), args.k, args.lam), args.repeat)
+
+    print(f"candidates={args.n} k={args.k} dim={args.dim} lambda={args.lam}")
+    print(f"same order: {old_order == new_order}  {new_order}")
+    print(f"legacy python : {t_old * 1000:9.2f} ms")
+    print(f"numpy mmr     : {t_new * 1000:9.2f} ms")
+    print(f"speedup       : {t_old / t_new:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# app/scripts/bench_serialization.py
+#
+# Serialization time and body size for large catalog listings and /chat/ask answers:
+# the old path (hand-built dicts through FastAPI's jsonable_encoder + stdlib json), the
+# response_model path (Pydantic validate + dump_json), compact stdlib json, and
+# app.responses.dumps (orjson when installed) which the routes now use. Also reports
+# gzip size/time per level for the listing. Synthetic rows; no queries are run, but the
+# route modules are imported, so DATABASE_URL must be set (e.g. via .env).
+#
+#   python -m app.scripts.bench_serialization --rows 1000 20000 --repeat 5
+import argparse
+import datetime
+import gzip
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from dotenv import load_dotenv
+from pydantic import TypeAdapter
+
+load_dotenv()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app import responses  # noqa: E402
+from app.routes.catalog import CatalogRow  # noqa: E402
+from app.routes.chat import AskResponse  # noqa: E402
+
+
+def catalog_rows(n: int) -> List[Dict[str, Any]]:
+    return [{
+        "uin": f"ACKHLIP{i:08d}V012021",
+        "insurer": f"Insurer {i % 40}",
+        "product_name": f"Product {i % 500} Health Plan",
+        "effective_date": datetime.date(2021, 1, 1) + datetime.timedelta(days=i % 900),
+        "type_of_product": "individual",
+        "approval_date": None if i % 3 else datetime.date(2020, 11, 2),
+        "document_pdf": f"/data/pdfs/ACKHLIP{i:08d}V012021.pdf",
+    } for i in range(n)]
+
+
+def answer(n_sources: int = 15) -> Dict[str, Any]:
+    return {
+        "answer": "The waiting period for pre-existing diseases is 36 months of continuous coverage. " * 6,
+        "sources": [{
+            "section_id": f"4.{i}", "page_from": i + 1, "page_to": i + 2,
+            "document_pdf": "/data/pdfs/ACKHLIP20039V012021.pdf",
+            "excerpt": "Expenses related to the treatment of a pre-existing disease (PED) and its direct "
+                       "complications shall be excluded until the expiry of 36 months " * 3,
+        } for i in range(n_sources)],
+    }
+
+
+def timed(fn: Callable[[], bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def compare(title: str, paths: Dict[str, Callable[[], bytes]], repeat: int) -> bytes:
+    outputs = {name: fn() for name, fn in paths.items()}
+    decoded = [json.loads(b) for b in outputs.values()]
+    assert all(d == decoded[0] for d in decoded), f"{title}: serializers disagree"
+    print(title)
+    base = None
+    for name, fn in paths.items():
+        t = timed(fn, repeat)
+        base = base or t
+        print(f"  {name:36s} {t * 1000:9.2f} ms  {len(outputs[name]):>10,} B  {base / t:6.1f}x")
+    return outputs["app.responses.dumps"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[1000, 20000],
+                    help="listing sizes (1000 = largest page, 20000 ~ full IRDAI product list)")
+    ap.add_argument("--gzip-levels", type=int, nargs="+", default=[1, 5, 9])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"encoder: {'orjson' if responses.orjson is not None else 'stdlib json (orjson not installed)'}\n")
+    rows_adapter = TypeAdapter(List[CatalogRow])
+    for n in args.rows:
+        rows = catalog_rows(n)
+        body = compare(f"/catalog/search, {n:,} rows", {
+            "jsonable_encoder + json (old)": lambda: json.dumps(jsonable_encoder(rows)).encode(),
+            "response_model validate + dump_json": lambda: rows_adapter.dump_json(rows_adapter.validate_python(rows)),
+            "json.dumps compact": lambda: json.dumps(rows, default=str, separators=(",", ":")).encode(),
+            "app.responses.dumps": lambda: responses.dumps(rows),
+        }, args.repeat)
+        for level in args.gzip_levels:
+            t = timed(lambda: gzip.compress(body, level), args.repeat)
+            print(f"  gzip -{level:<30d} {t * 1000:9.2f} ms  {len(gzip.compress(body, level)):>10,} B")
+        print()
+
+    ans = answer()
+    compare("/chat/ask answer, 15 sources", {
+        "AskResponse + jsonable_encoder (old)": lambda: json.dumps(jsonable_encoder(AskResponse(**ans))).encode(),
+        "AskResponse dump + re-validate + json": lambda: AskResponse.model_validate(
+            AskResponse(**ans).model_dump()).model_dump_json().encode(),
+        "app.responses.dumps": lambda: responses.dumps(ans),
+    }, args.repeat * 200)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# app/scripts/bench_startup.py
+#
+# Startup cost of the API. Import: runs `python -X importtime -c "import app.main"` in fresh
+# interpreters and reports the median total plus the heaviest top-level packages (self
+# time summed per package). Boot (--boot): starts uvicorn and times the first HTTP
+# response and the moment /health/ready turns 200, with per-step warm-up timings.
+# Uses the current environment (DATABASE_URL, OPENAI_API_KEY, SCHEMA_CHECK, ...).
+#
+#   python -m app.scripts.bench_startup --runs 5 --top 15
+#   python -m app.scripts.bench_startup --boot --port 8799
+#   python -m app.scripts.bench_startup --module app.routes.chat   # one module's import cost
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+def importtime(module: str) -> Tuple[float, Dict[str, float]]:
+    """Total import time of `module` in a fresh interpreter (s) and self time per top-level package."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.exit(proc.stderr.strip().splitlines()[-1])
+    by_package: Dict[str, float] = defaultdict(float)
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        by_package[name.split(".")[0]] += int(self_us) / 1e6
+        if name == module:
+            total = int(cumulative_us) / 1e6
+    return total, by_package
+
+
+def boot(port: int, timeout: float) -> Dict[str, object]:
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    first = ready = None
+    status: Dict[str, object] = {}
+    try:
+        while time.perf_counter() - t0 < timeout and proc.poll() is None:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/ready", timeout=1) as r:
+                    status = json.load(r)
+                    ready = time.perf_counter() - t0
+                    break
+            except urllib.error.HTTPError as e:  # serving, still warming up (or a step failed)
+                status = json.load(e)
+                first = first or time.perf_counter() - t0
+                if status.get("warmup_seconds") is not None:
+                    break  # finished, but not ready: report the failed step
+            except OSError:
+                pass  # not listening yet
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        _, err = proc.communicate(timeout=10)
+    if first is None and ready is None:
+        sys.exit(f"server did not come up within {timeout}s:\n{err.decode()[-2000:]}")
+    return {"first_response": first or ready, "ready": ready, "status": status}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--module", default="app.main")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=12, help="heaviest packages to list")
+    ap.add_argument("--boot", action="store_true", help="also time uvicorn start -> first response -> ready")
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    args = ap.parse_args()
+
+    totals: List[float] = []
+    packages: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(args.runs):
+        total, by_package = importtime(args.module)
+        totals.append(total)
+        for name, seconds in by_package.items():
+            packages[name].append(seconds)
+
+    print(f"import {args.module}: median {statistics.median(totals) * 1000:.0f} ms "
+          f"(min {min(totals) * 1000:.0f}, max {max(totals) * 1000:.0f}) over {args.runs} runs")
+    heaviest = sorted(packages.items(), key=lambda kv: -statistics.median(kv[1]))[:args.top]
+    for name, seconds in heaviest:
+        print(f"  {name:28s} {statistics.median(seconds) * 1000:8.1f} ms")
+    lazy = [m for m in ("openai", "tiktoken", "alembic", "pandas") if m in packages]
+    print(f"heavy optional modules imported: {', '.join(lazy) or 'none'}")
+
+    if args.boot:
+        result = boot(args.port, args.timeout)
+        ready = f"{result['ready']:.2f}s" if result["ready"] is not None else "never (see steps)"
+        print(f"\nboot: first response {result['first_response']:.2f}s, ready {ready}")
+        for name, step in result["status"].get("steps", {}).items():
+            print(f"  {name:16s} {step.get('status', ''):8s} {step.get('seconds', 0):6.3f}s  {step.get('detail', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# app/scripts/bench_vector_decode.py
+#
+# Rows decoded per second for candidate embeddings:
+#   text   - '[0.1, ...]' literal parsed with ast.literal_eval + float() (old emp_to_float)
+#   binary - vector_send bytea decoded in one np.frombuffer call (app/retrieval.py)
+#
+#   python -m app.scripts.bench_vector_decode --rows 150 --dim 1536
+import argparse
+import ast
+import struct
+import time
+
+import numpy as np
+
+from app.retrieval import decode_vectors
+
+
+def text_literal(vec: np.ndarray) -> str:
+    # same shape as what the DB returns for a vector column cast to text
+    return "[" + ",".join(repr(float(x)) for x in vec) + "]"
+
+
+def binary_literal(vec: np.ndarray) -> bytes:
+    return struct.pack(">HH", len(vec), 0) + vec.astype(">f4").tobytes()
+
+
+def decode_text(values):
+    out = []
+    for v in values:
+        emb = ast.literal_eval(v)
+        out.append([float(e) for e in emb])
+    return out
+
+
+def rate(fn, rows: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return rows / best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=150)
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    vecs = np.random.default_rng(0).normal(size=(args.rows, args.dim)).astype(np.float32)
+    as_text = [text_literal(v) for v in vecs]
+    as_binary = [memoryview(binary_literal(v)) for v in vecs]  # psycopg2 hands bytea back as memoryview
+
+    decoded = decode_vectors(as_binary, args.dim)
+    assert decoded.flags["C_CONTIGUOUS"] and decoded.dtype == np.float32
+    assert np.array_equal(decoded, vecs)
+    assert np.allclose(np.asarray(decode_text(as_text[:3]), dtype=np.float32), vecs[:3])
+
+    text_rps = rate(lambda: decode_text(as_text), args.rows, args.repeat)
+    bin_rps = rate(lambda: decode_vectors(as_binary, args.dim), args.rows, args.repeat)
+
+    print(f"rows={args.rows} dim={args.dim}")
+    print(f"payload/row   : text {len(as_text[0]):,} B   binary {len(as_binary[0]):,} B")
+    print(f"text   decode : {text_rps:12,.0f} rows/s")
+    print(f"binary decode : {bin_rps:12,.0f} rows/s")
+    print(f"speedup       : {bin_rps / text_rps:12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+# app/scripts/eval_retrieval.py
+#
+# Offline retrieval evaluation: chunk a policy PDF, embed it without calling OpenAI,
+# run the labelled questions through the same retrieval + MMR + prompt packing as
+# /chat/ask, and report recall@k, MRR and nDCG@k plus p50/p95 latency per stage as JSON,
+# so chunking (TARGET_TOKENS/OVERLAP_TOKENS in app/ingest.py), candidate_k, lexical_k
+# and mmr_lambda changes can be compared across commits.
+#
+#   python -m app.scripts.eval_retrieval --out Results/eval.json
+#   python -m app.scripts.eval_retrieval --target-tokens 80 120 200 --overlap-tokens 20 40 \
+#       --candidate-k 40 80 --mmr-lambda 0.5 0.7 1.0 --out Results/sweep.json
+#   python -m app.scripts.eval_retrieval --baseline Results/eval.json --max-drop 0.02   # exit 1 on regression
+#
+# Questions (data/eval/*.jsonl) are labelled with evidence phrases rather than chunk ids, so
+# labels survive re-chunking: a chunk is relevant if it contains one of the phrases.
+#
+# Embeddings: "stub" (default) hashes words and word pairs into a vector - deterministic,
+# no network, lexical-ish, so scores are only comparable between stub runs. "fixture"
+# replays real embeddings from an .npz keyed by text hash; --record fills in what is
+# missing with the OpenAI API (once), after which runs are offline again.
+#
+# Retrieval: "hybrid" (default) loads the chunks into Postgres inside a transaction that
+# is rolled back and runs the hybrid SQL; "memory" ranks with the in-process vector index
+# (vector side only) and never connects to the database.
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.ingest import EMBED_MODEL, OVERLAP_TOKENS, TARGET_TOKENS, extract_chunks, file_hash
+from app.prompt import pack_snippets
+from app.rerank import as_unit_matrix, get_reranker
+from app.retrieval import EMBED_DIM, embedding_matrix
+
+load_dotenv()
+
+SCHEMA = 1
+METRICS = ("mrr", "candidate_recall", "context_recall")
+
+
+# ---- labelled questions ----
+def normalize(text: str) -> str:
+    text = text.replace("’", "'").replace("‘", "'").replace("“", '"').replace("”", '"')
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    for q in questions:
+        q["evidence"] = [normalize(e) for e in q["evidence"]]
+    return questions
+
+
+def evidence_in(text: str, evidence: Sequence[str]) -> List[int]:
+    """Indexes of the evidence phrases found in `text`."""
+    text = normalize(text)
+    return [i for i, e in enumerate(evidence) if e in text]
+
+
+# ---- embedders ----
+_STOP = set("a an and are as at be by can do does for from how i if in is it my of on or the to what when "
+            "which who will with".split())
+
+
+class StubEmbedder:
+    """Hashed bag of word stems and word pairs; deterministic and offline."""
+    name = "stub"
+
+    def __init__(self, dim: int = EMBED_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = [w[:6] for w in re.findall(r"[a-z0-9]+", text.lower()) if w not in _STOP]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[str, int] = defaultdict(int)
+            for f in self._features(text):
+                counts[f] += 1
+            for f, n in counts.items():
+                h = int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += (1.0 + math.log(n)) * (1 if h >> 63 else -1)
+        return as_unit_matrix(out)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "dim": self.dim}
+
+
+class FixtureEmbedder:
+    """Embeddings replayed from an .npz (sha256 of text -> vector); --record adds missing ones."""
+    name = "fixture"
+
+    def __init__(self, path: str, record: bool = False):
+        self.path = path
+        self.record = record
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.recorded = 0
+        if os.path.exists(path):
+            data = np.load(path)
+            self.vectors = dict(zip(data["hashes"].tolist(), data["vectors"]))
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        keys = [self.key(t) for t in texts]
+        missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in self.vectors))
+        if missing:
+            if not self.record:
+                raise SystemExit(f"{len(missing)} texts are not in {self.path}; run once with --record")
+            from app.llm import get_llm
+            llm = get_llm()
+            for i in range(0, len(missing), 64):
+                batch = missing[i:i + 64]
+                for text, vec in zip(batch, llm.embed(batch, EMBED_MODEL)):
+                    self.vectors[self.key(text)] = np.asarray(vec, dtype=np.float32)
+            self.recorded += len(missing)
+            self.save()
+        return as_unit_matrix(np.stack([self.vectors[k] for k in keys]))
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        hashes = list(self.vectors)
+        tmp = f"{self.path}.tmp.npz"
+        np.savez_compressed(tmp, hashes=np.asarray(hashes), vectors=np.stack([self.vectors[h] for h in hashes]))
+        os.replace(tmp, self.path)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "path": self.path, "model": EMBED_MODEL, "recorded": self.recorded}
+
+
+# ---- retrievers (one loaded chunking at a time) ----
+class MemoryRetriever:
+    name = "memory"
+
+    def __init__(self, chunks, matrix: np.ndarray, pdf_path: str):
+        from app.vector_index import PolicyIndex
+        meta = [(str(c.index), c.section_id, c.page_from, c.page_to, c.content, pdf_path) for c in chunks]
+        self.index = PolicyIndex("eval", matrix, meta, normalized=True, source="eval")
+
+    def candidates(self, qvec: np.ndarray, question: str, candidate_k: int, lexical_k: int, timings):
+        t0 = time.perf_counter()
+        rows, matrix = self.index.search(qvec, candidate_k)
+        timings["vector_query"].append(time.perf_counter() - t0)
+        return rows, matrix
+
+    def close(self) -> None:
+        pass
+
+
+class HybridRetriever:
+    name = "hybrid"
+
+    def __init__(self, chunks, matrix: np.ndarray, pdf_path: str):
+        from sqlalchemy import text
+        from app.bulk_load import chunk_row, copy_chunks
+        from app.db import SessionLocal
+        from app.models import Insurer, PolicyDocument, PolicyVersion, Product
+
+        self.db = SessionLocal()
+        ins = Insurer(name="eval")
+        prod = Product(insurer=ins, line_of_business="health", name="eval")
+        pv = PolicyVersion(product=prod, uin=f"EVAL-{os.getpid()}", version_label="eval")
+        doc = PolicyDocument(policy_version=pv, doc_type="policy_wording", source_uri=pdf_path)
+        self.db.add_all([ins, prod, pv, doc])
+        self.db.flush()
+        copy_chunks(self.db, [
+            chunk_row(pv.id, doc.id, c.content, vec, section_id=c.section_id, page_from=c.page_from,
+                      page_to=c.page_to, content_hash=c.content_hash)
+            for c, vec in zip(chunks, matrix.tolist())
+        ])
+        self.db.execute(text("ANALYZE policy_chunk"))
+        self.pvid = pv.id
+
+    def candidates(self, qvec: np.ndarray, question: str, candidate_k: int, lexical_k: int, timings):
+        from app.retrieval import hybrid_candidates, set_search_params
+        t0 = time.perf_counter()
+        set_search_params(self.db, ef_search=min(max(candidate_k, 40), 1000))
+        rows = hybrid_candidates(self.db, self.pvid, qvec.tolist(), question, limit=candidate_k,
+                                 lexical_k=lexical_k, with_embeddings=True)
+        timings["hybrid_query"].append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        matrix = as_unit_matrix(embedding_matrix(rows)) if rows else np.empty((0, EMBED_DIM), np.float32)
+        timings["decode"].append(time.perf_counter() - t0)
+        return rows, matrix
+
+    def close(self) -> None:
+        self.db.rollback()  # nothing of the evaluation is kept
+        self.db.close()
+
+
+# ---- scoring ----
+def dcg(gains: Sequence[int]) -> float:
+    return sum(g / math.log2(i + 2) for i, g in enumerate(gains))
+
+
+def score_question(q: Dict[str, Any], ranked: List[str], candidates: List[str], context: List[str],
+                   n_relevant: int, ks: Sequence[int]) -> Dict[str, float]:
+    evidence = q["evidence"]
+    gains = [1 if evidence_in(t, evidence) else 0 for t in ranked]
+    out: Dict[str, float] = {}
+    for k in ks:
+        found = {i for t in ranked[:k] for i in evidence_in(t, evidence)}
+        out[f"recall@{k}"] = len(found) / len(evidence)
+        ideal = dcg([1] * min(k, n_relevant))
+        out[f"ndcg@{k}"] = dcg(gains[:k]) / ideal if ideal else 0.0
+    out["mrr"] = next((1.0 / (i + 1) for i, g in enumerate(gains) if g), 0.0)
+    # before re-ranking: did retrieval bring the evidence in at all?
+    out["candidate_recall"] = len({i for t in candidates for i in evidence_in(t, evidence)}) / len(evidence)
+    # after packing: did the evidence survive the token budget and sentence trimming?
+    out["context_recall"] = len({i for t in context for i in evidence_in(t, evidence)}) / len(evidence)
+    return out
+
+
+def pct_ms(samples: Sequence[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0}
+    s = sorted(samples)
+    return {
+        "p50": round(s[len(s) // 2] * 1000, 3),
+        "p95": round(s[min(len(s) - 1, int(0.95 * len(s)))] * 1000, 3),
+    }
+
+
+def evaluate(retriever, embedder, questions, qvecs: np.ndarray, n_relevant: Dict[str, int], params: Dict[str, Any],
+             ks: Sequence[int], model: str, embed_times: List[float]) -> Dict[str, Any]:
+    timings: Dict[str, List[float]] = defaultdict(list)
+    timings["embed"] = embed_times
+    rerank = get_reranker(params["reranker"])
+    per_question = []
+    for q, qvec in zip(questions, qvecs):
+        rows, matrix = retriever.candidates(qvec, q["question"], params["candidate_k"], params["lexical_k"], timings)
+        t0 = time.perf_counter()
+        if len(rows):
+            order = rerank(qvec, matrix, params["top_k"], params["mmr_lambda"])  # as select_snippets
+        else:
+            order = []
+        timings["mmr"].append(time.perf_counter() - t0)
+        ranked = [rows[i].content for i in order]
+
+        t0 = time.perf_counter()
+        packed, _ = pack_snippets([{"content": c} for c in ranked], model, params["token_budget"],
+                                  params["snippet_max_tokens"])
+        timings["pack"].append(time.perf_counter() - t0)
+
+        scores = score_question(q, ranked, [r.content for r in rows], [s["content"] for s in packed],
+                                n_relevant[q["id"]], ks)
+        per_question.append({"id": q["id"], **scores})
+
+    names = [f"recall@{k}" for k in ks] + [f"ndcg@{k}" for k in ks] + list(METRICS)
+    metrics = {n: round(sum(p[n] for p in per_question) / len(per_question), 4) for n in names}
+    return {
+        "params": params,
+        "metrics": metrics,
+        "latency_ms": {stage: pct_ms(samples) for stage, samples in timings.items()},
+        "per_question": per_question,
+    }
+
+
+# ---- comparison with an earlier result file ----
+def run_key(run: Dict[str, Any]) -> str:
+    return json.dumps(run["params"], sort_keys=True)
+
+
+def compare(result: Dict[str, Any], baseline_path: str, max_drop: Optional[float]) -> bool:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {run_key(r): r for r in json.load(f)["runs"]}
+    ok = True
+    for run in result["runs"]:
+        base = baseline.get(run_key(run))
+        if base is None:
+            continue
+        deltas = {m: round(v - base["metrics"].get(m, 0.0), 4) for m, v in run["metrics"].items()}
+        run["baseline_delta"] = deltas
+        worst = min(deltas.values())
+        if max_drop is not None and worst < -max_drop:
+            ok = False
+            print(f"REGRESSION {run['params']}: {deltas}", file=sys.stderr)
+    return ok
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pdf", default="data/Acko Health Insurance Policy2020-2021.pdf")
+    ap.add_argument("--questions", default="data/eval/acko_questions.jsonl")
+    ap.add_argument("--embedder", choices=["stub", "fixture"], default="stub")
+    ap.add_argument("--fixture", default="data/eval/acko_embeddings.npz", help="embeddings for --embedder fixture")
+    ap.add_argument("--record", action="store_true", help="embed texts missing from the fixture (OpenAI API)")
+    ap.add_argument("--retrieval", choices=["hybrid", "memory"], default="hybrid")
+    ap.add_argument("--target-tokens", type=int, nargs="+", default=[TARGET_TOKENS])
+    ap.add_argument("--overlap-tokens", type=int, nargs="+", default=[OVERLAP_TOKENS])
+    ap.add_argument("--candidate-k", type=int, nargs="+", default=[80])
+    ap.add_argument("--lexical-k", type=int, nargs="+", default=[int(os.getenv("LEXICAL_K", "20"))])
+    ap.add_argument("--mmr-lambda", type=float, nargs="+", default=[0.5])
+    ap.add_argument("--reranker", default="mmr")
+    ap.add_argument("--top-k", type=int, default=15)
+    ap.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    ap.add_argument("--token-budget", type=int, default=int(os.getenv("PROMPT_TOKEN_BUDGET", "3000")))
+    ap.add_argument("--snippet-max-tokens", type=int, default=int(os.getenv("PROMPT_SNIPPET_MAX_TOKENS", "400")))
+    ap.add_argument("--model", default=os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini"), help="tokenizer for packing")
+    ap.add_argument("--per-question", action="store_true", help="keep per-question scores in the output")
+    ap.add_argument("--out", help="write the JSON here (default: stdout)")
+    ap.add_argument("--baseline", help="earlier --out file; adds per-metric deltas for runs with the same params")
+    ap.add_argument("--max-drop", type=float, help="with --baseline: exit 1 if any metric drops by more than this")
+    args = ap.parse_args()
+
+    ks = sorted(k for k in set(args.k) if k <= args.top_k)
+    questions = load_questions(args.questions)
+    embedder = StubEmbedder() if args.embedder == "stub" else FixtureEmbedder(args.fixture, args.record)
+    retriever_cls = HybridRetriever if args.retrieval == "hybrid" else MemoryRetriever
+
+    qvecs = embedder.embed([q["question"] for q in questions])  # records missing fixture entries in one go
+    embed_times = []
+    for q in questions:  # then timed one question at a time, as a request sees it
+        t0 = time.perf_counter()
+        embedder.embed([q["question"]])
+        embed_times.append(time.perf_counter() - t0)
+
+    runs = []
+    for target, overlap in itertools.product(args.target_tokens, args.overlap_tokens):
+        if overlap >= target:
+            continue
+        t0 = time.perf_counter()
+        chunks = extract_chunks(args.pdf, target, overlap)
+        chunk_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        matrix = embedder.embed([c.content for c in chunks])
+        embed_chunks_s = time.perf_counter() - t0
+        n_relevant = {q["id"]: sum(1 for c in chunks if evidence_in(c.content, q["evidence"])) for q in questions}
+        unanswerable = [qid for qid, n in n_relevant.items() if n == 0]
+
+        t0 = time.perf_counter()
+        retriever = retriever_cls(chunks, matrix, args.pdf)
+        load_s = time.perf_counter() - t0
+        try:
+            for candidate_k, lexical_k, lam in itertools.product(args.candidate_k, args.lexical_k, args.mmr_lambda):
+                params = {
+                    "target_tokens": target, "overlap_tokens": overlap, "candidate_k": candidate_k,
+                    "lexical_k": lexical_k if args.retrieval == "hybrid" else 0, "mmr_lambda": lam,
+                    "reranker": args.reranker, "top_k": args.top_k, "token_budget": args.token_budget,
+                    "snippet_max_tokens": args.snippet_max_tokens,
+                }
+                run = evaluate(retriever, embedder, questions, qvecs, n_relevant, params, ks, args.model, embed_times)
+                run.update(chunks=len(chunks), unanswerable=unanswerable,
+                           setup_ms={"chunk": round(chunk_s * 1000, 1), "embed_chunks": round(embed_chunks_s * 1000, 1),
+                                     "load": round(load_s * 1000, 1)})
+                if not args.per_question:
+                    run.pop("per_question")
+                runs.append(run)
+                m = run["metrics"]
+                print(f"target={target:<4} overlap={overlap:<3} candidate_k={candidate_k:<4} lexical_k={lexical_k:<3} "
+                      f"lambda={lam:<4} chunks={len(chunks):<5} "
+                      + " ".join(f"{n}={m[n]:.3f}" for n in (f"recall@{ks[-1]}", "mrr", f"ndcg@{ks[-1]}")),
+                      file=sys.stderr)
+        finally:
+            retriever.close()
+
+    result = {
+        "schema": SCHEMA,
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "pdf": args.pdf,
+        "pdf_sha256": file_hash(args.pdf),
+        "questions": args.questions,
+        "n_questions": len(questions),
+        "embedder": embedder.describe(),
+        "retrieval": args.retrieval,
+        "runs": runs,
+    }
+    ok = compare(result, args.baseline, args.max_drop) if args.baseline else True
+    body = json.dumps(result, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
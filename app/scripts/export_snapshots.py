@@ -0,0 +1,64 @@
+# app/scripts/export_snapshots.py
+#
+# Write per-policy-version embedding snapshots (app/snapshots.py) that the in-process
+# vector index (VECTOR_INDEX=memory) maps with np.memmap instead of pulling every
+# embedding from Postgres, so all uvicorn workers share one copy in the page cache.
+# Snapshots whose stamp still matches the database are left alone unless --force.
+# Run it after ingestion; a stale snapshot is detected at load time and ignored.
+#
+#   python -m app.scripts.export_snapshots --all
+#   python -m app.scripts.export_snapshots --uin ACKHLIP20039V012021 --out /var/lib/bot/snapshots
+import argparse
+import sys
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+from app.db import SessionLocal
+from app.models import PolicyVersion
+from app.snapshots import current_stamp, export_snapshot, read_sidecar, snapshot_dir
+
+load_dotenv()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uin", nargs="*", default=[], help="policy UINs to export")
+    ap.add_argument("--all", action="store_true", help="export every policy version")
+    ap.add_argument("--out", default=snapshot_dir(), help="snapshot directory (default: $VECTOR_SNAPSHOT_DIR)")
+    ap.add_argument("--force", action="store_true", help="rewrite snapshots that are still current")
+    args = ap.parse_args()
+    if not (args.uin or args.all):
+        ap.error("give --uin or --all")
+    if not args.out:
+        ap.error("no snapshot directory: pass --out or set VECTOR_SNAPSHOT_DIR")
+
+    with SessionLocal() as db:
+        stmt = select(PolicyVersion.id, PolicyVersion.uin)
+        if not args.all:
+            stmt = stmt.where(PolicyVersion.uin.in_(args.uin))
+        versions = db.execute(stmt.order_by(PolicyVersion.uin)).all()
+        db.rollback()
+    missing = set(args.uin) - {v.uin for v in versions}
+    for uin in sorted(missing):
+        print(f"{uin}: no policy version found")
+
+    print(f"{'uin':<28}{'chunks':>8}{'MB':>8}{'ms':>8}  status")
+    for pvid, uin in versions:
+        with SessionLocal() as db:
+            old = read_sidecar(args.out, pvid)
+            if old and not args.force and old["stamp"] == current_stamp(db, pvid):
+                print(f"{uin:<28}{old['rows']:>8}{'':>8}{'':>8}  current")
+                continue
+            db.rollback()
+            t0 = time.perf_counter()
+            sidecar = export_snapshot(db, pvid, args.out)
+            ms = (time.perf_counter() - t0) * 1000
+        mb = sidecar["rows"] * sidecar["dim"] * 4 / (1 << 20)
+        print(f"{uin:<28}{sidecar['rows']:>8}{mb:>8.1f}{ms:>8.0f}  written")
+    sys.exit(1 if missing else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# app/scripts/fake_openai.py
+#
+# Minimal local stand-in for the OpenAI endpoints the bot uses, for load tests
+# and offline runs. Point the SDK at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+#
+#   python -m app.scripts.fake_openai --port 8900 --embed-ms 80 --chat-ms 800
+#
+# Embeddings are deterministic per input text (seeded from a hash), unit-length
+# and 1536-dim, so retrieval still behaves sensibly against real chunks.
+# FAKE_OPENAI_ERROR_RATE answers that fraction of requests with FAKE_OPENAI_ERROR_STATUS
+# (default 429, with Retry-After) to exercise the client's retries (app/llm.py).
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBED_DIM = 1536
+
+app = FastAPI(title="fake-openai")
+
+# latencies are read from env so uvicorn workers started by the CLI pick them up
+EMBED_MS = float(os.getenv("FAKE_OPENAI_EMBED_MS", "80"))
+CHAT_MS = float(os.getenv("FAKE_OPENAI_CHAT_MS", "800"))
+ERROR_RATE = float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0"))
+ERROR_STATUS = int(os.getenv("FAKE_OPENAI_ERROR_STATUS", "429"))
+
+
+def injected_error():
+    if ERROR_RATE <= 0 or random.random() >= ERROR_RATE:
+        return None
+    headers = {"retry-after": "0.2"} if ERROR_STATUS == 429 else {}
+    return JSONResponse(status_code=ERROR_STATUS, headers=headers, content={
+        "error": {"message": "injected by fake_openai", "type": "fake_error", "code": str(ERROR_STATUS)},
+    })
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> list[float]:
+    seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+    v = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+
+def rough_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    error = injected_error()
+    if error:
+        return error
+    body = await request.json()
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    await asyncio.sleep(EMBED_MS / 1000)
+    tokens = sum(rough_tokens(t) for t in inputs)
+    return {
+        "object": "list",
+        "model": body.get("model", "text-embedding-3-small"),
+        "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(t)} for i, t in enumerate(inputs)],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    }
+
+
+ANSWER = "This is a canned answer from the local fake OpenAI server [S1]."
+
+
+async def stream_chunks(model: str, usage: dict, include_usage: bool):
+    # spread the configured latency over the answer's words, like a real stream
+    words = ANSWER.split(" ")
+    base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+    for i, w in enumerate(words):
+        await asyncio.sleep(CHAT_MS / 1000 / len(words))
+        delta = {"content": w if i == 0 else " " + w}
+        yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})}\n\n"
+    yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
+    if include_usage:
+        yield f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    error = injected_error()
+    if error:
+        return error
+    body = await request.json()
+    model = body.get("model", "gpt-4o-mini")
+    prompt_tokens = sum(rough_tokens(m.get("content") or "") for m in body.get("messages", []))
+    answer = ANSWER
+    completion_tokens = rough_tokens(answer)
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+    if body.get("stream"):
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(stream_chunks(model, usage, include_usage), media_type="text/event-stream")
+
+    await asyncio.sleep(CHAT_MS / 1000)
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": answer},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--embed-ms", type=float, default=EMBED_MS)
+    ap.add_argument("--chat-ms", type=float, default=CHAT_MS)
+    args = ap.parse_args()
+    EMBED_MS, CHAT_MS = args.embed_ms, args.chat_ms
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,37 @@
+# app/scripts/fetch_tiktoken.py
+#
+# Fill tiktoken's cache at image build time so workers never download encodings at
+# runtime. Without it an offline worker counts prompt tokens with the ~4 chars/token
+# estimate and the "tokenizer" warm-up step reports degraded (or failed, with
+# TOKENIZER_REQUIRED=1). Run the app with the same TIKTOKEN_CACHE_DIR.
+#
+#   TIKTOKEN_CACHE_DIR=/opt/tiktoken python -m app.scripts.fetch_tiktoken
+#   TIKTOKEN_CACHE_DIR=/opt/tiktoken python -m app.scripts.fetch_tiktoken --model gpt-4o-mini --model gpt-4.1
+import argparse
+import os
+
+import tiktoken
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", action="append", default=[],
+                    help="chat model(s) to fetch the encoding of (default: OPENAI_CHAT_MODEL or gpt-4o-mini)")
+    args = ap.parse_args()
+    if not os.getenv("TIKTOKEN_CACHE_DIR"):
+        raise SystemExit("Set TIKTOKEN_CACHE_DIR to the directory the app will read encodings from")
+
+    models = args.model or [os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")]
+    names = set()
+    for model in models:
+        try:
+            names.add(tiktoken.encoding_name_for_model(model))
+        except KeyError:  # same fallback as app.prompt.Tokenizer
+            names.add("o200k_base")
+    for name in sorted(names):
+        enc = tiktoken.get_encoding(name)
+        print(f"{name}: {enc.n_vocab} tokens cached in {os.environ['TIKTOKEN_CACHE_DIR']}")
+
+
+if __name__ == "__main__":
+    main()
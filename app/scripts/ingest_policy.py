@@ -3,6 +3,7 @@ from dotenv import load_dotenv
 from sqlalchemy import select
 from openai import OpenAI
 from app.db import SessionLocal
+from app.embedding_cache import get_embedding_cache
 from app.models import PolicyDocument, PolicyChunk, PolicyVersion
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.orm import Session
@@ -58,9 +59,12 @@ def guess_section(text):
     return None
 
 def embed(texts):
-    # text-embedding-3-small => 1536 dims
-    resp = client.embeddings.create(model="text-embedding-3-small", input=texts)
-    return [d.embedding for d in resp.data]
+    # text-embedding-3-small => 1536 dims; chunks seen before come from the embedding cache
+    # (case is kept for document text, unlike questions)
+    def _embed(batch):
+        resp = client.embeddings.create(model="text-embedding-3-small", input=batch)
+        return [d.embedding for d in resp.data]
+    return get_embedding_cache().embed_many(texts, "text-embedding-3-small", _embed, casefold=False)
 
 def ingest(pdf_path: str, policy_version_id: str, title: str = None):
     db: Session = SessionLocal()
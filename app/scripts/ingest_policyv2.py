@@ -1,194 +1,84 @@
+# app/scripts/ingest_policyv2.py
+#
+# Ingest policy wordings through the pipeline in app/ingest.py
+# (process-pool extraction, concurrent embedding with retry, COPY into policy_chunk).
+# Unchanged files are skipped; a revised or interrupted file only embeds the chunks
+# that are not stored yet. Documents are keyed by path: a revision saved under a new file
+# name is only diffed against the old one when --replaces (manifest column `replaces`)
+# names it; otherwise it is stored as another document of the policy version.
+#
+#   python -m app.scripts.ingest_policyv2 --uin ACKHLIP20039V012021 "data/Acko Health Insurance Policy2020-2021.pdf"
+#   python -m app.scripts.ingest_policyv2 --uin ACKHLIP20039V012021 data/acko-2024.pdf --replaces data/acko-2021.pdf
+#   python -m app.scripts.ingest_policyv2 --manifest policies.csv    # columns: path,uin[,title][,replaces]
+import argparse
+import csv
+from typing import List
 
-import os
-import re
-import fitz  # PyMuPDF
 from dotenv import load_dotenv
-from openai import OpenAI
-from sqlalchemy.orm import Session
 
-
-from app.db import SessionLocal
-from app.models import PolicyDocument, PolicyChunk
+from app.ingest import IngestJob, IngestResult, ingest_many
 
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY not set in .env")
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-MIN_CHARS = 180         # drop very tiny chunks
-TARGET_TOKENS = 120     # ~ chunk size (tweak)
-OVERLAP_TOKENS = 40     # ~ overlap (tweak)
-
-SECTION_HINTS = [
-    "Eligibility", "Exclusions", "Inclusions", "Coverage", "Waiting Period",
-    "Pre-existing", "Claim", "Cashless", "Documents Required", "Deductible",
-    "Co-pay", "Sum Insured", "Non-payable", "Consumables", "Network", "Definitions"
-]
-
-def to_paragraphs(text: str) -> list[str]:
-    """
-    Turn a page's text into paragraphs:
-    - split on blank lines
-    - re-wrap hard line breaks inside a block
-    """
-    blocks = re.split(r"\n\s*\n+", text)  # blank-line split
-    paras = []
-    for b in blocks:
-        # collapse single newlines inside a block
-        one = " ".join(ln.strip() for ln in b.splitlines() if ln.strip())
-        if one:
-            paras.append(one)
-    # if a page had no blank lines, fallback: treat each line as a para
-    if not paras:
-        paras = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    return paras
-
-
-def rough_token_count(text: str) -> int:
-    # crude but sufficient for chunking
-    return max(1, len(text.split()))
-
-
-# === A) Safer page reader with debug ===
-def read_pdf(path: str):
-    doc = fitz.open(path)
-    pages = []
-    for i in range(doc.page_count):
-        txt = doc.load_page(i).get_text("text")
-        # normalize spaces; KEEP newlines for line/paragraph splitting
-        txt = re.sub(r"[ \t]+", " ", txt).strip()
-        pages.append((i + 1, txt))
-    # quick sanity: preview first 3 pages
-    for j, (pgno, txt) in enumerate(pages[:3], 1):
-        print(f"[debug] page {pgno}: {txt[:80]!r}")
-    return pages
-
-
-def guess_section(text: str):
-    for h in SECTION_HINTS:
-        if re.search(rf"\b{re.escape(h)}\b", text, re.I):
-            return h
-    return None
-
-
-def embed(texts: list[str]) -> list[list[float]]:
-    # text-embedding-3-small => 1536 dims
-    resp = client.embeddings.create(model="text-embedding-3-small", input=texts)
-    return [d.embedding for d in resp.data]
-
-def chunk_paragraphs(paras: list[str],
-                     target: int = TARGET_TOKENS,
-                     overlap: int = OVERLAP_TOKENS) -> list[str]:
-    """
-    Build chunks from paragraphs with token budget + overlap.
-    Returns list of chunk strings.
-    """
-    out, cur, size = [], [], 0
-    for para in paras:
-        t = rough_token_count(para)
-        if size + t > target and cur:
-            out.append("\n".join(cur))
-            # make overlap by keeping tail
-            keep, kept = [], 0      # 
-            for p in reversed(cur):
-                if kept >= overlap:
-                    break
-                kept += rough_token_count(p)
-                keep.append(p)
-            cur = list(reversed(keep))
-            size = sum(rough_token_count(p) for p in cur)
-        cur.append(para)
-        size += t
-    if cur:
-        out.append("\n".join(cur))
-    # filter out tiny chunks
-    out = [c for c in out if len(c) >= MIN_CHARS]
-    return out
-
-# === B) Page-scoped chunker ===
-# def chunk_page_lines(lines: list[str], target=CHUNK_TARGET_TOKENS, overlap=CHUNK_OVERLAP_TOKENS) -> list[str]:
-#     """
-#     Split a single page's lines into token-budgeted chunks with overlap.
-#     """
-#     chunks, current, size = [], [], 0
-#     for line in lines:
-#         t = rough_token_count(line)
-#         if size + t > target and current:
-#             chunks.append("\n".join(current))
-#             # create overlap from the tail
-#             overlap_cnt = 0
-#             while current and overlap_cnt < overlap:
-#                 overlap_cnt += rough_token_count(current[-1])
-#                 current.pop()
-#             size = sum(rough_token_count(x) for x in current)
-#         current.append(line)
-#         size += t
-#     if current:
-#         chunks.append("\n".join(current))
-#     return chunks
-
-
-def ingest(pdf_path: str, uin: str, title: str | None = None):
-    db: Session = SessionLocal()
-    try:
-        # 1) Create a PolicyDocument by UIN (resolves UUID internally)
-        doc = PolicyDocument.new_for_uin(
-            db,
-            uin=uin,
-            doc_type="policy_wording",
-            source_uri=pdf_path,
-            title=title or os.path.basename(pdf_path),
-        )
-
-        # 2) Read PDF → per-page text
-        pages = read_pdf(pdf_path)
-
-        # 3) Per-page: split into lines and chunk page-scoped
-        results = []
-        for pg, text in pages:
-            paras = to_paragraphs(text)
-            if not paras:
-                continue
-            chunks = chunk_paragraphs(paras)   # multiple chunks per page now
-            for body in chunks:
-                sec = guess_section(body[:400])
-                results.append((body, sec, pg, pg))  # chunks are page-scoped
-        if not results:
-            print("[warn] No text extracted from PDF. Is it a scanned image?")
-            return
-
-        # 4) Embed + insert chunks in batches
-        BATCH = 32
-        total = 0
-        for i in range(0, len(results), BATCH):
-            batch = results[i:i + BATCH]
-            embs = embed([b[0] for b in batch])
-            for (body, sec, pfrom, pto), vec in zip(batch, embs):
-                row = PolicyChunk.new_for_uin_and_doc(
-                    db,
-                    uin=uin,
-                    document_id=doc.id,
-                    section_id=sec,
-                    page_from=pfrom,
-                    page_to=pto,
-                    content=body,
-                    policy_chunk_metadata={},  # IMPORTANT: matches models.py attribute name/DB column
-                )
-                row.embedding = vec
-            #db.commit()
-            total += len(batch)
 
-        print(f"Ingested {total} chunks from {pdf_path} into UIN {uin}")
 
-    finally:
-        pass
-        
-        #db.close()
+def ingest(pdf_path: str, uin: str, title: str | None = None) -> IngestResult:
+    return ingest_many([IngestJob(pdf_path=pdf_path, uin=uin, title=title)], workers=1)[0]
+
+
+def read_manifest(path: str) -> List[IngestJob]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            IngestJob(pdf_path=row["path"].strip(), uin=row["uin"].strip(),
+                      title=(row.get("title") or "").strip() or None,
+                      replaces=(row.get("replaces") or "").strip() or None)
+            for row in csv.DictReader(f)
+        ]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdfs", nargs="*", help="PDF files, all for --uin")
+    ap.add_argument("--uin", help="policy UIN for the PDFs given on the command line")
+    ap.add_argument("--title", help="document title (single PDF only; defaults to the file name)")
+    ap.add_argument("--replaces", help="stored source path this PDF is a renamed revision of (single PDF only)")
+    ap.add_argument("--manifest", help="CSV with columns path,uin[,title][,replaces]")
+    ap.add_argument("--workers", type=int, default=4, help="PDF extraction processes")
+    ap.add_argument("--embed-concurrency", type=int, default=4, help="embedding requests in flight")
+    ap.add_argument("--batch-size", type=int, default=32, help="chunks per embedding request / insert")
+    ap.add_argument("--max-retries", type=int, default=5)
+    ap.add_argument("--insert-method", choices=["copy", "insert"], default="copy")
+    ap.add_argument("--defer-index", action="store_true",
+                    help="drop the vector index during the load and rebuild it once (backfills only)")
+    args = ap.parse_args()
+
+    jobs: List[IngestJob] = []
+    if args.manifest:
+        jobs += read_manifest(args.manifest)
+    if args.pdfs:
+        if not args.uin:
+            ap.error("--uin is required with PDF arguments")
+        if args.replaces and len(args.pdfs) != 1:
+            ap.error("--replaces takes exactly one PDF")
+        title = args.title if len(args.pdfs) == 1 else None
+        jobs += [IngestJob(pdf_path=p, uin=args.uin, title=title, replaces=args.replaces) for p in args.pdfs]
+    if not jobs:
+        ap.error("give PDF paths with --uin, or --manifest")
+
+    results = ingest_many(jobs, args.workers, args.embed_concurrency, args.batch_size, args.max_retries,
+                          args.insert_method, args.defer_index)
+
+    failed = [r for r in results if r.error]
+    for r in results:
+        if r.error:
+            status = f"FAILED ({r.error})"
+        elif r.skipped:
+            status = "skipped, unchanged"
+        else:
+            status = f"{r.chunks} chunks ({r.embedded} embedded, {r.kept} kept, {r.deleted} deleted)"
+        print(f"{r.job.uin:<24} {r.job.pdf_path}: {status}")
+    if failed:
+        raise SystemExit(f"{len(failed)} of {len(results)} documents failed; re-run to resume")
 
 
 if __name__ == "__main__":
-    # EDIT this PDF path as needed
-    PDF = r"D:\Professonal\projects\chatbot\data\Acko Health Insurance Policy2020-2021.pdf"
-    UIN = input("Enter Policy UIN: ").strip()   # ACKHLIP20039V012021
-    ingest(PDF, UIN, title="Acko Health Insurance Policy2020-2021") 
\ No newline at end of file
+    main()
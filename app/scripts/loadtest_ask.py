@@ -0,0 +1,117 @@
+# app/scripts/loadtest_ask.py
+#
+# Throughput of the sync /chat/ask vs the async /chat/ask-async under concurrency.
+# Starts the fake OpenAI server and the API as subprocesses (so the load generator
+# doesn't share an event loop or GIL with either), then fires requests at both routes.
+# Needs a database with at least one ingested policy version.
+#
+#   python -m app.scripts.loadtest_ask --uin ACKHLIP20039V012021 --concurrency 64 --requests 400
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+QUESTIONS = [
+    "What is the waiting period for pre-existing diseases?",
+    "What is the sum insured basis?",
+    "Are consumables covered?",
+    "How do I file a cashless claim?",
+    "What are the permanent exclusions?",
+]
+
+
+def start(cmd, env, quiet: bool = False) -> subprocess.Popen:
+    out = subprocess.DEVNULL if quiet else None
+    return subprocess.Popen([sys.executable, "-m", *cmd], env=env, stdout=out)
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up in {timeout}s")
+
+
+async def run_load(base: str, path: str, uin: str, total: int, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, timeout=120.0, limits=limits) as http:
+        async def one(i: int):
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    r = await http.post(path, json={"uin": uin, "question": QUESTIONS[i % len(QUESTIONS)]})
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - t0)
+                if not ok:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        wall = time.perf_counter() - t0
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * (len(latencies) - 1)))] * 1000
+    return {"rps": total / wall, "p50": p(0.50), "p95": p(0.95), "errors": errors}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--uin", required=True)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--embed-ms", type=float, default=80)
+    ap.add_argument("--chat-ms", type=float, default=800)
+    ap.add_argument("--api-port", type=int, default=8765)
+    ap.add_argument("--fake-port", type=int, default=8900)
+    ap.add_argument("--verbose", action="store_true", help="show the API's stdout")
+    args = ap.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "sk-fake",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "FAKE_OPENAI_EMBED_MS": str(args.embed_ms),
+        "FAKE_OPENAI_CHAT_MS": str(args.chat_ms),
+    })
+    procs = [
+        start(["uvicorn", "app.scripts.fake_openai:app", "--port", str(args.fake_port), "--log-level", "warning"], env),
+        start(["uvicorn", "app.main:app", "--port", str(args.api_port), "--log-level", "warning"], env,
+              quiet=not args.verbose),
+    ]
+    try:
+        wait_ready(f"http://127.0.0.1:{args.fake_port}/docs")
+        base = f"http://127.0.0.1:{args.api_port}"
+        wait_ready(f"{base}/docs")
+
+        print(f"requests={args.requests} concurrency={args.concurrency} "
+              f"fake latency embed={args.embed_ms}ms chat={args.chat_ms}ms")
+        print(f"{'route':<18}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        results = {}
+        for path in ("/chat/ask", "/chat/ask-async"):
+            asyncio.run(run_load(base, path, args.uin, min(10, args.requests), args.concurrency))  # warm-up
+            res = results[path] = asyncio.run(run_load(base, path, args.uin, args.requests, args.concurrency))
+            print(f"{path:<18}{res['rps']:>9.1f}{res['p50']:>10.1f}{res['p95']:>10.1f}{res['errors']:>8}")
+        print(f"throughput gain: {results['/chat/ask-async']['rps'] / results['/chat/ask']['rps']:.2f}x")
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.rerank import as_unit_matrix
+from app.retrieval import EMBED_DIM, decode_vectors
+from app.vector_index import LOAD_POLICY, PolicyIndex
+
+log = logging.getLogger(__name__)
+
+# Per-policy-version embedding snapshots, shared by all workers through the page cache:
+#
+#   <dir>/<policy_version_id>.json               sidecar: stamp + one meta row per matrix row
+#   <dir>/<policy_version_id>.<digest[:12]>.npy  unit-normalised float32 matrix, C order
+#
+# The .npy name carries the stamp, so a re-export writes a new file and then swaps the
+# sidecar; workers that still have the old matrix mapped keep reading it until they reload.
+FORMAT = 1
+META_COLUMNS = ["id", "section_id", "page_from", "page_to", "content", "document_pdf"]
+
+# What a snapshot was taken from. Any insert/delete of an embedded chunk, a content change
+# (content_hash) or a moved chunk (pages) changes the digest; same ORDER BY as LOAD_POLICY.
+STAMP = text("""
+    SELECT count(*) AS chunks,
+           md5(coalesce(string_agg(
+               concat_ws(':', c.id, c.content_hash, c.section_id, c.page_from, c.page_to),
+               ',' ORDER BY c.id), '')) AS digest
+    FROM policy_chunk c
+    WHERE c.policy_version_id = :pvid AND c.embedding IS NOT NULL
+""")
+
+
+def snapshot_dir() -> Optional[str]:
+    # VECTOR_SNAPSHOT_DIR="" turns snapshot loading off
+    return os.getenv("VECTOR_SNAPSHOT_DIR", ".cache/snapshots") or None
+
+
+def sidecar_path(directory: str, policy_version_id: str) -> str:
+    return os.path.join(directory, f"{policy_version_id}.json")
+
+
+def current_stamp(db: Session, policy_version_id: str) -> Dict[str, Any]:
+    r = db.execute(STAMP, {"pvid": policy_version_id}).one()
+    return {"chunks": int(r.chunks), "digest": r.digest}
+
+
+def read_sidecar(directory: str, policy_version_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(sidecar_path(directory, policy_version_id), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# ---- export ----
+def export_snapshot(db: Session, policy_version_id: str, directory: str) -> Dict[str, Any]:
+    """
+    Write the snapshot of one policy version and return its sidecar (without the meta rows).
+    Stamp and rows are read in one REPEATABLE READ transaction so they describe the same state;
+    call this on a session that has not started a transaction yet.
+    """
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    stamp = current_stamp(db, policy_version_id)
+    rows = db.execute(LOAD_POLICY, {"pvid": policy_version_id}).fetchall()
+    db.rollback()
+
+    matrix = decode_vectors([r.embedding for r in rows]) if rows else np.empty((0, EMBED_DIM), dtype=np.float32)
+    matrix = np.ascontiguousarray(as_unit_matrix(matrix) if len(matrix) else matrix, dtype=np.float32)
+
+    os.makedirs(directory, exist_ok=True)
+    npy_name = f"{policy_version_id}.{stamp['digest'][:12]}.npy"
+    npy_path = os.path.join(directory, npy_name)
+    old = read_sidecar(directory, policy_version_id)
+    with open(npy_path + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    os.replace(npy_path + ".tmp", npy_path)
+
+    sidecar = {
+        "format": FORMAT,
+        "policy_version_id": str(policy_version_id),
+        "dim": int(matrix.shape[1]),
+        "rows": len(rows),
+        "stamp": stamp,
+        "created_at": time.time(),
+        "matrix": npy_name,
+        "columns": META_COLUMNS,
+    }
+    meta: List[List[Any]] = [[str(r.id), *tuple(r)[1:6]] for r in rows]
+    path = sidecar_path(directory, policy_version_id)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({**sidecar, "meta": meta}, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+    # previous matrix: already-mapped copies stay readable after unlink
+    if old and old.get("matrix") and old["matrix"] != npy_name:
+        try:
+            os.remove(os.path.join(directory, old["matrix"]))
+        except FileNotFoundError:
+            pass
+    return sidecar
+
+
+# ---- load ----
+def load_snapshot(db: Optional[Session], policy_version_id: str, directory: str) -> Optional[PolicyIndex]:
+    """
+    Map the snapshot of one policy version read-only (np.load(mmap_mode="r")), or return
+    None if there is none or it is stale. With `db` the stamp is compared against
+    policy_chunk first; without it the file is trusted as is.
+    """
+    sidecar = read_sidecar(directory, policy_version_id)
+    if sidecar is None or sidecar.get("format") != FORMAT:
+        return None
+    if db is not None and current_stamp(db, policy_version_id) != sidecar["stamp"]:
+        log.info("stale snapshot for %s, loading from the database", policy_version_id)
+        return None
+    try:
+        matrix = np.load(os.path.join(directory, sidecar["matrix"]), mmap_mode="r")
+    except FileNotFoundError:  # replaced by a concurrent export between our two reads
+        return None
+    if matrix.shape != (sidecar["rows"], sidecar["dim"]) or matrix.dtype != np.float32:
+        return None
+    return PolicyIndex(policy_version_id, matrix, [tuple(m) for m in sidecar["meta"]],
+                       normalized=True, source="snapshot")
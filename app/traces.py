@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List, Optional, Sequence
+
+# Retrieval traces for offline analysis: one JSON object per line, written by a
+# background thread to a size-rotated file. A request is traced when it asks for it
+# (AskRequest.trace) or is sampled at TRACE_SAMPLE_RATE. When the writer falls behind,
+# traces are dropped (and counted) rather than slowing requests down.
+#
+#   TRACE_SAMPLE_RATE  fraction of requests traced (default 0: only opt-in requests)
+#   TRACE_PATH         default .cache/traces/retrieval-{pid}.jsonl (+ .1 .. .N after rotation);
+#                      {pid} keeps uvicorn workers from rotating each other's files
+#   TRACE_MAX_MB       rotate after this many MB (default 50)
+#   TRACE_BACKUPS      rotated files kept (default 5)
+#   TRACE_QUEUE        traces buffered for the writer (default 1000)
+
+Trace = Dict[str, Any]
+
+
+class _JsonLines(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        # serialised on the writer thread, not the request thread
+        return json.dumps(record.msg, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def __init__(self, q: "queue.Queue[logging.LogRecord]"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # keep the dict; _JsonLines formats it on the other side
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TraceSink:
+    """Queue + QueueListener thread + RotatingFileHandler, behind a private logger."""
+
+    def __init__(self, path: str, sample_rate: float = 0.0, max_bytes: int = 50 << 20,
+                 backups: int = 5, queue_size: int = 1000):
+        self.path = path = path.format(pid=os.getpid())
+        self.sample_rate = sample_rate
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8",
+                                           delay=True)
+        file_handler.setFormatter(_JsonLines())
+        self._handler = _DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        self._listener = QueueListener(self._handler.queue, file_handler)
+        self._logger = logging.getLogger(f"app.traces.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(self._handler)
+        self._listener.start()
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.emitted = 0
+
+    @classmethod
+    def from_env(cls) -> "TraceSink":
+        return cls(
+            path=os.getenv("TRACE_PATH", ".cache/traces/retrieval-{pid}.jsonl"),
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0")),
+            max_bytes=int(float(os.getenv("TRACE_MAX_MB", "50")) * (1 << 20)),
+            backups=int(os.getenv("TRACE_BACKUPS", "5")),
+            queue_size=int(os.getenv("TRACE_QUEUE", "1000")),
+        )
+
+    def start(self, route: str, requested: Optional[bool] = None, **fields: Any) -> Optional[Trace]:
+        """A new trace if this request is traced (opt-in, else sampled; trace=False opts out), else None."""
+        if requested is False:
+            return None
+        if not requested:
+            if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+                return None
+            with self._lock:
+                self.sampled += 1
+        return {"trace_id": uuid.uuid4().hex, "ts": time.time(), "route": route, **fields,
+                "_t0": time.perf_counter()}
+
+    def emit(self, trace: Optional[Trace], **fields: Any) -> None:
+        if trace is None:
+            return
+        trace.update(fields)
+        trace["elapsed_ms"] = round((time.perf_counter() - trace.pop("_t0")) * 1000, 2)
+        self._logger.info(trace)
+        with self._lock:
+            self.emitted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "sample_rate": self.sample_rate,
+                "sampled": self.sampled,
+                "emitted": self.emitted,
+                "dropped": self._handler.dropped,
+                "queued": self._handler.queue.qsize(),
+            }
+
+    def close(self) -> None:
+        self._listener.stop()  # flushes what is queued
+
+
+def candidate_records(rows: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Id and scores of each retrieval candidate, in retrieval order."""
+    return [{
+        "id": str(r.id),
+        "similarity_pct": round(float(r.similarity_pct), 3),
+        "rrf_score": round(float(r.rrf_score), 6),
+        "vector_rank": r.vector_rank,
+        "lexical_rank": r.lexical_rank,
+        "page_from": r.page_from,
+    } for r in rows]
+
+
+@lru_cache(maxsize=1)
+def get_trace_sink() -> TraceSink:
+    return TraceSink.from_env()
+
+
+def close_trace_sink() -> None:
+    if get_trace_sink.cache_info().currsize:
+        get_trace_sink().close()
+        get_trace_sink.cache_clear()
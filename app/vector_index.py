@@ -0,0 +1,262 @@
+import logging
+import os
+import select as _select
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.rerank import as_unit_matrix, as_unit_vector
+from app.retrieval import EMBED_DIM, RRF_K, decode_vectors
+
+log = logging.getLogger(__name__)
+
+# pg_notify channel fed by the policy_chunk triggers of migration e4c6a2d8b913;
+# the payload is the policy_version_id whose chunks changed
+CHANNEL = "policy_chunk_changed"
+
+LOAD_POLICY = text("""
+    SELECT c.id, c.section_id, c.page_from, c.page_to, c.content,
+           d.source_uri AS document_pdf, vector_send(c.embedding) AS embedding
+    FROM policy_chunk c
+    JOIN policy_document d ON d.id = c.document_id
+    WHERE c.policy_version_id = :pvid AND c.embedding IS NOT NULL
+    ORDER BY c.id
+""")
+
+
+class Candidate(NamedTuple):
+    # same fields as the hybrid_candidates rows, so select_snippets takes either
+    id: str
+    section_id: Optional[str]
+    page_from: Optional[int]
+    page_to: Optional[int]
+    content: str
+    document_pdf: str
+    embedding: Optional[bytes]
+    similarity_pct: float
+    rrf_score: float
+    vector_rank: Optional[int]
+    lexical_rank: Optional[int]
+
+
+class PolicyIndex:
+    """All chunk embeddings of one policy version as a unit-normalised float32 matrix."""
+
+    def __init__(self, policy_version_id: str, matrix: np.ndarray, meta: List[Tuple[Any, ...]],
+                 normalized: bool = False, source: str = "db"):
+        self.policy_version_id = policy_version_id
+        if not len(matrix):
+            matrix = np.empty((0, EMBED_DIM), dtype=np.float32)
+        elif not normalized:
+            matrix = as_unit_matrix(matrix)
+        self.matrix = matrix  # may be a read-only np.memmap over a snapshot file (app/snapshots.py)
+        self.meta = meta  # (id, section_id, page_from, page_to, content, document_pdf) per row
+        self.source = source
+        self.loaded_at = time.time()
+        self.nbytes = self.matrix.nbytes + sum(len(m[4] or "") for m in meta)
+
+    def __len__(self) -> int:
+        return len(self.meta)
+
+    def search(self, qvec: Sequence[float], k: int) -> Tuple[List[Candidate], np.ndarray]:
+        """Exact top-k by cosine similarity; returns the candidates and their embedding rows."""
+        if not len(self.meta) or k <= 0:
+            return [], self.matrix[:0]
+        sims = self.matrix @ as_unit_vector(qvec)
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        rows = [
+            Candidate(*self.meta[i], None, float(sims[i]) * 100, 1.0 / (RRF_K + rank), rank, None)
+            for rank, i in enumerate(top.tolist(), 1)
+        ]
+        return rows, self.matrix[top]
+
+
+def load_policy_index(db: Session, policy_version_id: str) -> PolicyIndex:
+    rows = db.execute(LOAD_POLICY, {"pvid": policy_version_id}).fetchall()
+    return PolicyIndex(policy_version_id, decode_vectors([r.embedding for r in rows]), [tuple(r)[:6] for r in rows])
+
+
+class VectorIndexCache:
+    """
+    Per-policy-version PolicyIndex objects, loaded lazily and evicted LRU once their
+    total size exceeds `max_bytes`. `invalidate` drops a policy so the next request
+    reloads it; the NOTIFY listener calls it when ingestion commits chunks.
+    """
+
+    def __init__(self, max_bytes: int = 256 << 20):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, PolicyIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._generation: Dict[str, int] = {}
+        self._epoch = 0  # bumped by invalidate-all
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, policy_version_id: str, loader: Callable[[str], PolicyIndex]) -> PolicyIndex:
+        with self._lock:
+            idx = self._items.get(policy_version_id)
+            if idx is not None:
+                self._items.move_to_end(policy_version_id)
+                self.hits += 1
+                return idx
+            load_lock = self._loading.setdefault(policy_version_id, threading.Lock())
+        # one loader per policy; concurrent cold requests wait for it instead of all hitting the DB
+        with load_lock:
+            with self._lock:
+                idx = self._items.get(policy_version_id)
+                if idx is not None:
+                    self.hits += 1
+                    return idx
+                generation = (self._epoch, self._generation.get(policy_version_id, 0))
+            idx = loader(policy_version_id)
+            with self._lock:
+                self.loads += 1
+                # an invalidation that arrived mid-load means idx may already be stale: serve, don't keep
+                if (self._epoch, self._generation.get(policy_version_id, 0)) == generation:
+                    self._items[policy_version_id] = idx
+                    self._evict()
+            return idx
+
+    def _evict(self) -> None:
+        total = sum(i.nbytes for i in self._items.values())
+        while total > self.max_bytes and len(self._items) > 1:
+            _, old = self._items.popitem(last=False)
+            total -= old.nbytes
+            self.evictions += 1
+
+    def invalidate(self, policy_version_id: Optional[str] = None) -> None:
+        """Drop one policy version (or all of them, for a missed notification)."""
+        with self._lock:
+            if policy_version_id is None:
+                self._epoch += 1
+                self.invalidations += len(self._items)
+                self._items.clear()
+                return
+            self._generation[policy_version_id] = self._generation.get(policy_version_id, 0) + 1
+            if self._items.pop(policy_version_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "policies": len(self._items),
+                "chunks": sum(len(i) for i in self._items.values()),
+                "from_snapshot": sum(i.source == "snapshot" for i in self._items.values()),
+                "bytes": sum(i.nbytes for i in self._items.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# ---- hot reload ----
+def listen_for_changes(cache: VectorIndexCache, stop: threading.Event, poll_s: float = 1.0) -> None:
+    """
+    LISTEN on CHANNEL over a dedicated psycopg2 connection and invalidate the policy
+    versions named in each notification. Reconnects with backoff; after a reconnect
+    everything is invalidated since notifications may have been missed meanwhile.
+    `stop` is checked every `poll_s`, so shutdown takes at most that long.
+    """
+    import psycopg2
+    from app.db import engine
+
+    backoff = 1.0
+    reconnect = False
+    while not stop.is_set():
+        conn = None
+        try:
+            # dedicated connection outside the pool: it is held for the life of the process
+            cargs, cparams = engine.dialect.create_connect_args(engine.url)
+            conn = engine.dialect.connect(*cargs, **cparams)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            if reconnect:
+                cache.invalidate()
+            backoff = 1.0
+            while not stop.is_set():
+                if _select.select([conn], [], [], poll_s) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    cache.invalidate(conn.notifies.pop(0).payload)
+        except (psycopg2.Error, OSError) as e:
+            log.warning("listener error, reconnecting in %.0fs: %s", backoff, e)
+            stop.wait(backoff)
+            backoff = min(backoff * 2, 60.0)
+        finally:
+            reconnect = True
+            if conn is not None:
+                conn.close()
+
+
+def vector_index_enabled() -> bool:
+    # "memory": /chat/ask ranks candidates from the in-process index (vector side only; the
+    # full-text branch of hybrid retrieval needs Postgres); "off" (default): from Postgres
+    return os.getenv("VECTOR_INDEX", "off").lower() == "memory"
+
+
+# set on app shutdown (stop_vector_index_listener); the listener checks it between polls
+_listener_stop = threading.Event()
+
+
+@lru_cache(maxsize=1)
+def get_vector_index() -> VectorIndexCache:
+    from app.db import engine
+    cache = VectorIndexCache(max_bytes=int(float(os.getenv("VECTOR_INDEX_MAX_MB", "256")) * (1 << 20)))
+    if engine.dialect.driver != "psycopg2":
+        log.warning("hot reload needs psycopg2; cached policies are only refreshed on eviction")
+        return cache
+    threading.Thread(
+        target=listen_for_changes, args=(cache, _listener_stop), name="vector-index-listener", daemon=True,
+    ).start()
+    return cache
+
+
+def stop_vector_index_listener() -> None:
+    """Stop the LISTEN thread (it exits within one poll) and drop the cache it was refreshing."""
+    global _listener_stop
+    if get_vector_index.cache_info().currsize:
+        _listener_stop.set()
+        _listener_stop = threading.Event()  # a fresh one for the next app in this process
+        get_vector_index.cache_clear()
+
+
+def policy_index(policy_version_id: str, db: Optional[Session] = None) -> PolicyIndex:
+    """
+    The policy's in-process index. A cold policy is mapped from its snapshot file if that
+    is still current (app/snapshots.py), else loaded with `db` (or a fresh session).
+    """
+    from app.snapshots import load_snapshot, snapshot_dir
+
+    def load_with(session: Session, pvid: str) -> PolicyIndex:
+        directory = snapshot_dir()
+        idx = load_snapshot(session, pvid, directory) if directory else None
+        return idx if idx is not None else load_policy_index(session, pvid)
+
+    def load(pvid: str) -> PolicyIndex:
+        if db is not None:
+            return load_with(db, pvid)
+        from app.db import SessionLocal
+        with SessionLocal() as session:
+            return load_with(session, pvid)
+    return get_vector_index().get(policy_version_id, load)
+
+
+def search_policy(policy_version_id: str, qvec: Sequence[float], k: int,
+                  db: Optional[Session] = None) -> Tuple[List[Candidate], np.ndarray]:
+    """Top-k candidates from the in-process index (see policy_index)."""
+    return policy_index(policy_version_id, db).search(qvec, k)
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+# Boot path: app/main.py's lifespan starts run() as a background task and the worker
+# begins serving at once. /health/ready answers 503 until every step has finished, so
+# a load balancer or readiness probe only routes traffic to a warm worker; requests
+# that arrive earlier still work, they just pay for whatever isn't warm yet.
+#
+#   WARMUP_BLOCKING       1: finish warm-up before serving (the old boot path); default 0
+#   SCHEMA_CHECK          off (default) | alembic: fail readiness unless the DB is at the
+#                         migration head | create_all: create missing tables (no Alembic)
+#   DB_WARM_CONNECTIONS   connections opened in each pool, sync and async (default 2)
+#   VECTOR_INDEX_WARM     policy versions preloaded into the in-process index, most
+#                         answered first (VECTOR_INDEX=memory only; default 0)
+#   WARMUP_RETRY_DELAY    seconds before failed steps are retried (default 1), doubling up
+#                         to WARMUP_RETRY_MAX_DELAY (default 30) until they pass; 0: no retry
+#   TOKENIZER_REQUIRED    1: no tiktoken encoding (TIKTOKEN_CACHE_DIR not provisioned, see
+#                         app/scripts/fetch_tiktoken.py) fails readiness instead of only
+#                         reporting the tokenizer step degraded; default 0
+
+log = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+# Policy versions that have chunks, most answer-cache entries (i.e. most asked) first
+POPULAR_POLICIES = text("""
+    SELECT pv.id
+    FROM policy_version pv
+    WHERE EXISTS (SELECT 1 FROM policy_chunk c WHERE c.policy_version_id = pv.id)
+    ORDER BY (SELECT count(*) FROM answer_cache a WHERE a.policy_version_id = pv.id) DESC, pv.uin
+    LIMIT :n
+""")
+
+
+class Skip(Exception):
+    """Raised by a step that has nothing to do under the current configuration."""
+
+
+class Degraded(Exception):
+    """Raised by a step that fell back to something worse; the worker still becomes ready."""
+
+
+# ---- steps ----
+def check_schema() -> str:
+    mode = os.getenv("SCHEMA_CHECK", "off").lower()
+    if mode == "create_all":
+        from app import models
+        from app.db import engine
+        models.Base.metadata.create_all(bind=engine)
+        return "create_all"
+    if mode != "alembic":
+        raise Skip(f"SCHEMA_CHECK={mode}")
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    from app.db import engine
+
+    heads = set(ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_heads())
+    with engine.connect() as conn:
+        current = {r[0] for r in conn.execute(text("SELECT version_num FROM alembic_version"))}
+    if current != heads:
+        raise RuntimeError(f"database is at {sorted(current)}, migrations head is {sorted(heads)}; "
+                           "run `alembic upgrade head`")
+    return f"at head {sorted(heads)}"
+
+
+def warm_sync_pool(n: int) -> None:
+    from app.db import engine
+    conns = [engine.connect() for _ in range(n)]
+    try:
+        for conn in conns:
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+async def warm_pools() -> str:
+    from app.db_async import async_engine
+    n = int(os.getenv("DB_WARM_CONNECTIONS", "2"))
+    if n <= 0:
+        raise Skip("DB_WARM_CONNECTIONS=0")
+
+    async def one() -> None:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(asyncio.to_thread(warm_sync_pool, n), *(one() for _ in range(n)))
+    return f"{n} sync + {n} async connections"
+
+
+async def warm_llm() -> str:
+    from app.embed_batcher import get_embed_batcher, start_embed_batcher
+    from app.llm import get_llm
+    await asyncio.to_thread(get_llm)  # imports the OpenAI SDK and opens the HTTP pools' clients
+    await start_embed_batcher()
+    return "embed batcher on" if get_embed_batcher() else "embed batcher off"
+
+
+def warm_tokenizer() -> str:
+    from app.prompt import get_tokenizer
+    from app.routes.chat import chat_model
+    tokenizer = get_tokenizer(chat_model())
+    if tokenizer.exact:
+        return tokenizer.encoding
+    msg = "no tiktoken encoding (is TIKTOKEN_CACHE_DIR provisioned?); prompt tokens are estimated"
+    if os.getenv("TOKENIZER_REQUIRED", "0").lower() in ("1", "true", "yes"):
+        get_tokenizer.cache_clear()  # so the retry loads it again
+        raise RuntimeError(msg)
+    raise Degraded(msg)
+
+
+def warm_catalog() -> str:
+    from app.catalog_cache import get_catalog_cache
+    from app.db import SessionLocal
+    from app.routes.catalog import load_filters
+    with SessionLocal() as db:
+        get_catalog_cache().get(db, ("filters", False), lambda: (load_filters(db), {}))
+    return "filters"
+
+
+def warm_vector_index() -> str:
+    from app.db import SessionLocal
+    from app.vector_index import get_vector_index, policy_index, vector_index_enabled
+    if not vector_index_enabled():
+        raise Skip("VECTOR_INDEX=off")
+    get_vector_index()  # starts the change listener
+    n = int(os.getenv("VECTOR_INDEX_WARM", "0"))
+    with SessionLocal() as db:
+        pvids = [r[0] for r in db.execute(POPULAR_POLICIES, {"n": n})] if n > 0 else []
+        for pvid in pvids:
+            policy_index(str(pvid), db)
+    return f"{len(pvids)} policies loaded"
+
+
+def in_thread(fn: Callable[[], Any]) -> Callable[[], Awaitable[Any]]:
+    return lambda: asyncio.to_thread(fn)
+
+
+# Steps in a stage run concurrently; stages run in order (caches need the pools and schema).
+STAGES: List[List[Tuple[str, Callable[[], Awaitable[Any]]]]] = [
+    [("schema", in_thread(check_schema)), ("db_pools", warm_pools),
+     ("llm_client", warm_llm), ("tokenizer", in_thread(warm_tokenizer))],
+    [("catalog_cache", in_thread(warm_catalog)), ("vector_index", in_thread(warm_vector_index))],
+]
+
+
+class Warmup:
+    """
+    Runs the warm-up stages and keeps per-step status, timing and errors for /health/ready.
+
+    Failed steps (a database still starting, say) are retried with backoff, stage by
+    stage, until they pass, so the worker becomes ready without a restart.
+    """
+
+    def __init__(self, stages=STAGES, retry_delay: float = 1.0, max_retry_delay: float = 30.0):
+        self.stages = stages
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.steps: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "attempts": 0} for stage in stages for name, _ in stage
+        }
+        self.started: Optional[float] = None
+        self.seconds: Optional[float] = None  # first pass over every step
+        self.retries = 0
+        self.first_pass = asyncio.Event()
+
+    @classmethod
+    def from_env(cls) -> "Warmup":
+        return cls(
+            retry_delay=float(os.getenv("WARMUP_RETRY_DELAY", "1")),
+            max_retry_delay=float(os.getenv("WARMUP_RETRY_MAX_DELAY", "30")),
+        )
+
+    async def _step(self, name: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        step = self.steps[name]
+        step["status"] = "running"
+        step["attempts"] += 1
+        t0 = time.perf_counter()
+        try:
+            detail = await fn()
+            step.update(status="ok", detail=detail)
+        except Skip as e:
+            step.update(status="skipped", detail=str(e))
+        except Degraded as e:
+            log.warning("warm-up step %s degraded: %s", name, e)
+            step.update(status="degraded", detail=str(e))
+        except Exception as e:  # a failed step keeps the worker unready, it doesn't stop it
+            log.error("warm-up step %s failed: %s", name, e)
+            step.update(status="failed", detail=f"{type(e).__name__}: {e}")
+        step["seconds"] = round(time.perf_counter() - t0, 3)
+
+    def failed(self) -> List[str]:
+        return [n for n, s in self.steps.items() if s["status"] == "failed"]
+
+    async def _pass(self, only: Optional[List[str]] = None) -> None:
+        for stage in self.stages:
+            await asyncio.gather(*(self._step(name, fn) for name, fn in stage if only is None or name in only))
+
+    async def run(self) -> None:
+        """First pass over every step (sets first_pass), then retries of failed ones until none is left."""
+        self.started = time.perf_counter()
+        try:
+            await self._pass()
+            self.seconds = round(time.perf_counter() - self.started, 3)
+            failed = self.failed()
+            log.info("warm-up finished in %.2fs%s", self.seconds, f"; failed: {failed}" if failed else "")
+        finally:
+            self.first_pass.set()
+        delay = self.retry_delay
+        while self.retry_delay > 0 and self.failed():
+            await asyncio.sleep(delay)
+            self.retries += 1
+            failed = self.failed()
+            await self._pass(only=failed)
+            still = self.failed()
+            if still:
+                log.warning("warm-up retry %d: %s still failing, next in %.1fs", self.retries, still,
+                            min(delay * 2, self.max_retry_delay))
+            else:
+                log.info("warm-up retry %d: %s recovered; ready", self.retries, failed)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def ready(self) -> bool:
+        return self.seconds is not None and all(s["status"] != "failed" for s in self.steps.values())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready(),
+            "degraded": [n for n, s in self.steps.items() if s["status"] == "degraded"],
+            "warmup_seconds": self.seconds,
+            "retries": self.retries,
+            "steps": self.steps,
+        }
+
+
+def warmup_blocking() -> bool:
+    return os.getenv("WARMUP_BLOCKING", "0").lower() in ("1", "true", "yes")
+
+
+@lru_cache(maxsize=1)
+def get_warmup() -> Warmup:
+    return Warmup.from_env()
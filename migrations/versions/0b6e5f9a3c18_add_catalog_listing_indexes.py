@@ -0,0 +1,46 @@
+"""indexes for paginated /catalog/search and /policy-versions, trigram typeahead
+
+Revision ID: 0b6e5f9a3c18
+Revises: f3b8d61c2a47
+Create Date: 2025-09-11 10:37:41.902215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b6e5f9a3c18'
+down_revision: Union[str, Sequence[str], None] = 'f3b8d61c2a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # keyset pages ordered by (insurer.name, product.name, policy_version.uin)
+    op.create_index('ix_product_insurer', 'product', ['insurer_id'], unique=False)
+    op.create_index('ix_insurer_name', 'insurer', ['name'], unique=False)
+    op.create_index('ix_policy_version_type_of_product', 'policy_version', ['type_of_product'], unique=False)
+    # latest policy_wording per version: one index probe per row on the page
+    op.create_index('ix_policy_document_version_type', 'policy_document',
+                    ['policy_version_id', 'doc_type', 'id'], unique=False)
+
+    # prefix/substring ILIKE for match=prefix and /catalog/typeahead
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_policy_version_uin_trgm', 'policy_version', ['uin'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'uin': 'gin_trgm_ops'})
+    op.create_index('ix_insurer_name_trgm', 'insurer', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_insurer_name_trgm', table_name='insurer', postgresql_using='gin')
+    op.drop_index('ix_policy_version_uin_trgm', table_name='policy_version', postgresql_using='gin')
+    op.drop_index('ix_policy_document_version_type', table_name='policy_document')
+    op.drop_index('ix_policy_version_type_of_product', table_name='policy_version')
+    op.drop_index('ix_insurer_name', table_name='insurer')
+    op.drop_index('ix_product_insurer', table_name='product')
@@ -0,0 +1,60 @@
+"""add ANN vector index and policy_version filter index on policy_chunk
+
+Revision ID: 5b1f0c2a9d41
+Revises: 217e956a4a63
+Create Date: 2025-08-24 11:05:12.418203
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f0c2a9d41'
+down_revision: Union[str, Sequence[str], None] = '217e956a4a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# hnsw (default) or ivfflat; ivfflat should be built after data is loaded
+INDEX_KIND = os.getenv("VECTOR_INDEX_KIND", "hnsw")
+
+# Trade-off: one ANN index over every policy's chunks, and a btree for the
+# policy_version_id filter. Every query filters on one policy, but the ANN index can't
+# apply that filter while it walks the graph. It returns its ef_search (or probes)
+# nearest rows overall and the filter runs on those, so a policy holding a small share
+# of the table gets far fewer than candidate_k rows back, often none. Mitigations, in
+# the order app/retrieval.py applies them:
+#   - pgvector >= 0.8: hnsw/ivfflat.iterative_scan = relaxed_order (the default,
+#     VECTOR_ITERATIVE_SCAN) keeps scanning until enough rows pass the filter;
+#   - otherwise, when the index comes back short, the top-k is recomputed exactly over
+#     the policy's chunks via ix_policy_chunk_policy_version (_vector_top_k). That is a
+#     full distance sort of one policy (a few hundred to a few thousand chunks, ~ms),
+#     with exact recall.
+# Partial indexes per policy version, or partitioning policy_chunk by it, would keep
+# filtered ANN scans exact without the fallback. But they need DDL per ingested policy
+# (or a partition scheme) and only pay off once single policies reach ~10^5 chunks.
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_policy_chunk_policy_version', 'policy_chunk', ['policy_version_id'], unique=False)
+    op.execute('DROP INDEX IF EXISTS idx_policy_chunk_embedding')
+    if INDEX_KIND == 'ivfflat':
+        op.create_index('idx_policy_chunk_embedding', 'policy_chunk', ['embedding'], unique=False,
+                        postgresql_using='ivfflat',
+                        postgresql_with={'lists': 100},
+                        postgresql_ops={'embedding': 'vector_cosine_ops'})
+    else:
+        op.create_index('idx_policy_chunk_embedding', 'policy_chunk', ['embedding'], unique=False,
+                        postgresql_using='hnsw',
+                        postgresql_with={'m': 16, 'ef_construction': 64},
+                        postgresql_ops={'embedding': 'vector_cosine_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP INDEX IF EXISTS idx_policy_chunk_embedding')
+    op.drop_index('ix_policy_chunk_policy_version', table_name='policy_chunk')
@@ -0,0 +1,34 @@
+"""answer_cache: key entries by retrieval settings, index created_at for pruning
+
+Revision ID: 7d2c4e9f1a60
+Revises: 0b6e5f9a3c18
+Create Date: 2025-09-14 09:52:06.310457
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2c4e9f1a60'
+down_revision: Union[str, Sequence[str], None] = '0b6e5f9a3c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing answers were stored without knowing the top_k/candidate_k/... they were
+    # retrieved with, so they can't be matched to a key; the cache refills on demand.
+    op.execute('DELETE FROM answer_cache')
+    op.add_column('answer_cache', sa.Column('retrieval_key', sa.String(), server_default='', nullable=False))
+    # TTL and max-rows pruning (app/answer_cache.py) scan by age
+    op.create_index('ix_answer_cache_created_at', 'answer_cache', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_answer_cache_created_at', table_name='answer_cache')
+    op.drop_column('answer_cache', 'retrieval_key')
@@ -0,0 +1,73 @@
+"""add answer_cache table and invalidation triggers on policy_chunk
+
+Revision ID: a4d92e6b7c13
+Revises: 8c3e7a1d2f60
+Create Date: 2025-08-29 10:16:47.552931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d92e6b7c13'
+down_revision: Union[str, Sequence[str], None] = '8c3e7a1d2f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Any write to policy_chunk drops the cached answers of the policy versions it
+# touched. Statement-level with transition tables, so a bulk load of N chunks
+# runs one DELETE, not N.
+TRIGGERS = {
+    'INSERT': 'NEW TABLE AS changed',
+    'UPDATE': 'NEW TABLE AS changed',
+    'DELETE': 'OLD TABLE AS changed',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('answer_cache',
+    sa.Column('id', sa.UUID(as_uuid=False), nullable=False),
+    sa.Column('policy_version_id', sa.UUID(as_uuid=False), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('question_embedding', Vector(1536), nullable=False),
+    sa.Column('answer', sa.Text(), nullable=False),
+    sa.Column('sources', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('total_tokens', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['policy_version_id'], ['policy_version.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_answer_cache_policy_version', 'answer_cache', ['policy_version_id'], unique=False)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION invalidate_answer_cache() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM answer_cache
+            WHERE policy_version_id IN (SELECT DISTINCT policy_version_id FROM changed);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for event, transition in TRIGGERS.items():
+        op.execute(f"""
+            CREATE TRIGGER trg_policy_chunk_{event.lower()}_answer_cache
+            AFTER {event} ON policy_chunk
+            REFERENCING {transition}
+            FOR EACH STATEMENT EXECUTE FUNCTION invalidate_answer_cache();
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for event in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_policy_chunk_{event.lower()}_answer_cache ON policy_chunk")
+    op.execute("DROP FUNCTION IF EXISTS invalidate_answer_cache()")
+    op.drop_index('ix_answer_cache_policy_version', table_name='answer_cache')
+    op.drop_table('answer_cache')
@@ -0,0 +1,35 @@
+"""add ingestion progress to policy_document and document index on policy_chunk
+
+Revision ID: c3f8e2b14a07
+Revises: a4d92e6b7c13
+Create Date: 2025-08-31 09:12:40.307415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8e2b14a07'
+down_revision: Union[str, Sequence[str], None] = 'a4d92e6b7c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('policy_document', sa.Column('ingest_status', sa.String(), nullable=True))
+    op.add_column('policy_document', sa.Column('chunk_count', sa.Integer(), nullable=True))
+    # documents loaded before progress tracking are treated as finished
+    op.execute("UPDATE policy_document SET ingest_status = 'complete'")
+    # resuming a document looks up its stored chunks by document_id
+    op.create_index('ix_policy_chunk_document', 'policy_chunk', ['document_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_policy_chunk_document', table_name='policy_chunk')
+    op.drop_column('policy_document', 'chunk_count')
+    op.drop_column('policy_document', 'ingest_status')
@@ -0,0 +1,38 @@
+"""add content_hash to policy_chunk and file_hash to policy_document
+
+Revision ID: c9a41d7e5b28
+Revises: c3f8e2b14a07
+Create Date: 2025-09-02 14:27:19.846530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9a41d7e5b28'
+down_revision: Union[str, Sequence[str], None] = 'c3f8e2b14a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('policy_chunk', sa.Column('content_hash', sa.String(), nullable=True))
+    op.add_column('policy_document', sa.Column('file_hash', sa.String(), nullable=True))
+    # same digest as app.ingest.content_hash; file hashes are filled in on the next ingest
+    op.execute("UPDATE policy_chunk SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex')")
+    op.drop_index('ix_policy_chunk_document', table_name='policy_chunk')
+    op.create_index('ix_policy_chunk_document_hash', 'policy_chunk', ['document_id', 'content_hash'], unique=False)
+    op.create_index('ix_policy_document_file_hash', 'policy_document', ['policy_version_id', 'file_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_policy_document_file_hash', table_name='policy_document')
+    op.drop_index('ix_policy_chunk_document_hash', table_name='policy_chunk')
+    op.create_index('ix_policy_chunk_document', 'policy_chunk', ['document_id'], unique=False)
+    op.drop_column('policy_document', 'file_hash')
+    op.drop_column('policy_chunk', 'content_hash')
@@ -0,0 +1,35 @@
+"""add content_tsv full-text column and GIN index on policy_chunk
+
+Revision ID: d2b7f4a91c35
+Revises: c9a41d7e5b28
+Create Date: 2025-09-04 16:03:55.271904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b7f4a91c35'
+down_revision: Union[str, Sequence[str], None] = 'c9a41d7e5b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # lexical side of hybrid retrieval; replaces the unindexed similarity(content, q) scan
+    op.add_column('policy_chunk', sa.Column(
+        'content_tsv', postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('english', content)", persisted=True), nullable=True,
+    ))
+    op.create_index('ix_policy_chunk_content_tsv', 'policy_chunk', ['content_tsv'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_policy_chunk_content_tsv', table_name='policy_chunk', postgresql_using='gin')
+    op.drop_column('policy_chunk', 'content_tsv')
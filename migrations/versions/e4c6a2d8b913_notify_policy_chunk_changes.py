@@ -0,0 +1,54 @@
+"""notify listeners when policy_chunk rows of a policy version change
+
+Revision ID: e4c6a2d8b913
+Revises: d2b7f4a91c35
+Create Date: 2025-09-06 11:48:22.630118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c6a2d8b913'
+down_revision: Union[str, Sequence[str], None] = 'd2b7f4a91c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# pg_notify('policy_chunk_changed', policy_version_id) once per policy version per
+# statement; Postgres delivers on commit and folds duplicates within a transaction.
+# Consumed by the in-process vector index (app/vector_index.py).
+TRIGGERS = {
+    'INSERT': 'NEW TABLE AS changed',
+    'UPDATE': 'NEW TABLE AS changed',
+    'DELETE': 'OLD TABLE AS changed',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_policy_chunk_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('policy_chunk_changed', pvid::text)
+            FROM (SELECT DISTINCT policy_version_id AS pvid FROM changed) t;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for event, transition in TRIGGERS.items():
+        op.execute(f"""
+            CREATE TRIGGER trg_policy_chunk_{event.lower()}_notify
+            AFTER {event} ON policy_chunk
+            REFERENCING {transition}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_policy_chunk_changed();
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for event in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_policy_chunk_{event.lower()}_notify ON policy_chunk")
+    op.execute("DROP FUNCTION IF EXISTS notify_policy_chunk_changed()")
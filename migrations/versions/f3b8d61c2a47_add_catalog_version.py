@@ -0,0 +1,65 @@
+"""catalog_version counter bumped by writes to the catalog tables
+
+Revision ID: f3b8d61c2a47
+Revises: e4c6a2d8b913
+Create Date: 2025-09-09 16:12:05.481920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d61c2a47'
+down_revision: Union[str, Sequence[str], None] = 'e4c6a2d8b913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# One-row counter read by the catalog cache (app/catalog_cache.py). Statement-level
+# triggers bump it for any write that can change /catalog output, so ingestion, the
+# seed scripts and manual SQL all invalidate without knowing about the cache.
+# Updates are limited to the columns the catalog shows: ingest progress updates on
+# policy_document don't bump it.
+TRIGGERS = {
+    'insurer': 'INSERT OR DELETE OR TRUNCATE OR UPDATE OF name',
+    'product': 'INSERT OR DELETE OR TRUNCATE OR UPDATE OF name, insurer_id',
+    'policy_version': 'INSERT OR DELETE OR TRUNCATE OR UPDATE OF uin, product_id, effective_from, '
+                      'type_of_product, approval_date',
+    'policy_document': 'INSERT OR DELETE OR TRUNCATE OR UPDATE OF policy_version_id, doc_type, source_uri',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'catalog_version',
+        sa.Column('id', sa.SmallInteger(), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.CheckConstraint('id = 1', name='catalog_version_single_row'),
+    )
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, 1)")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE catalog_version SET version = version + 1, changed_at = now() WHERE id = 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table, events in TRIGGERS.items():
+        op.execute(f"""
+            CREATE TRIGGER trg_{table}_catalog_version
+            AFTER {events} ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_catalog_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS bump_catalog_version()")
+    op.drop_table('catalog_version')
@@ -0,0 +1,54 @@
+# Tests that need Postgres (migrated with `alembic upgrade head`) take the `engine`
+# fixture; they are skipped when DATABASE_URL is unset or the server can't be reached.
+# Everything else runs without a database.
+#
+#   DATABASE_URL=postgresql+psycopg2://... python -m pytest -q
+import os
+import uuid
+
+import pytest
+from dotenv import load_dotenv
+
+load_dotenv()
+DATABASE_CONFIGURED = bool(os.getenv("DATABASE_URL"))
+# app.db creates its engines at import (which doesn't connect), so DB-free tests of app
+# modules only need some URL to be set
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://postgres@localhost/unconfigured")
+
+
+@pytest.fixture(scope="session")
+def engine():
+    if not DATABASE_CONFIGURED:
+        pytest.skip("DATABASE_URL not set")
+    from sqlalchemy import text
+    from app.db import engine
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"database unreachable: {e}")
+    return engine
+
+
+@pytest.fixture
+def policy_version(engine):
+    """id of a throwaway policy version (with insurer and product), removed with its documents afterwards."""
+    from sqlalchemy import delete
+    from app.db import SessionLocal
+    from app.models import Insurer, PolicyChunk, PolicyDocument, PolicyVersion, Product
+    with SessionLocal() as db:
+        insurer = Insurer(name=f"Test Insurer {uuid.uuid4().hex[:8]}")
+        product = Product(insurer=insurer, line_of_business="health", name="Test Health Plan")
+        pv = PolicyVersion(product=product, uin=f"TEST{uuid.uuid4().hex[:12].upper()}", version_label="v1",
+                           status="active")
+        db.add_all([insurer, product, pv])
+        db.commit()
+        ids = (insurer.id, product.id, pv.id)
+    yield ids[2]
+    with SessionLocal() as db:
+        db.execute(delete(PolicyChunk).where(PolicyChunk.policy_version_id == ids[2]))
+        db.execute(delete(PolicyDocument).where(PolicyDocument.policy_version_id == ids[2]))
+        db.execute(delete(PolicyVersion).where(PolicyVersion.id == ids[2]))
+        db.execute(delete(Product).where(Product.id == ids[1]))
+        db.execute(delete(Insurer).where(Insurer.id == ids[0]))
+        db.commit()
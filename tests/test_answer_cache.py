@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import func, select, text
+
+MODEL = "test-chat-model"
+KEY = "top_k=15;candidate_k=100;lexical_k=20;mmr_lambda=0.5;ef_search=100;probes=None"
+
+
+def unit(i: int, nudge: float = 0.0):
+    v = [0.0] * 1536
+    v[i] = 1.0
+    v[i + 1] = nudge  # small nudge: a near-identical question
+    return v
+
+
+@pytest.fixture
+def db(engine):
+    from app.db import SessionLocal
+    with SessionLocal() as session:
+        yield session
+
+
+def entries(db, pvid):
+    from app.models import AnswerCacheEntry
+    return db.execute(select(AnswerCacheEntry.question, AnswerCacheEntry.answer)
+                      .where(AnswerCacheEntry.policy_version_id == pvid)
+                      .order_by(AnswerCacheEntry.created_at)).all()
+
+
+def store(cache, db, pvid, question, qvec, answer, key=KEY):
+    cache.store(db, pvid, question, qvec, MODEL, key, answer, [{"excerpt": answer}], 10)
+
+
+def test_hit_requires_same_retrieval_key(db, policy_version):
+    from app.answer_cache import AnswerCache
+    cache = AnswerCache(threshold=0.95)
+    store(cache, db, policy_version, "waiting period?", unit(0), "36 months")
+
+    assert cache.lookup(db, policy_version, unit(0, 0.01), MODEL, KEY)["answer"] == "36 months"
+    assert cache.lookup(db, policy_version, unit(0), MODEL, KEY.replace("top_k=15", "top_k=5")) is None
+
+
+def test_near_identical_question_replaces_entry(db, policy_version):
+    from app.answer_cache import AnswerCache
+    cache = AnswerCache(threshold=0.95)
+    store(cache, db, policy_version, "waiting period?", unit(0), "36 months")
+    store(cache, db, policy_version, "what is the waiting period", unit(0, 0.01), "48 months")
+    store(cache, db, policy_version, "room rent limit?", unit(10), "1% of sum insured")
+
+    assert entries(db, policy_version) == [("what is the waiting period", "48 months"),
+                                           ("room rent limit?", "1% of sum insured")]
+
+
+def test_expired_entry_is_not_served_and_is_refreshed(db, policy_version):
+    from app.answer_cache import AnswerCache
+    cache = AnswerCache(threshold=0.95, ttl=3600)
+    store(cache, db, policy_version, "waiting period?", unit(0), "36 months")
+    db.execute(text("UPDATE answer_cache SET created_at = now() - interval '2 hours' WHERE policy_version_id = :p"),
+               {"p": policy_version})
+    db.commit()
+
+    assert cache.lookup(db, policy_version, unit(0), MODEL, KEY) is None
+    store(cache, db, policy_version, "waiting period?", unit(0), "48 months")
+    assert cache.lookup(db, policy_version, unit(0), MODEL, KEY)["answer"] == "48 months"
+    assert len(entries(db, policy_version)) == 1
+
+
+def test_prune_keeps_max_rows(db, policy_version):
+    from app.answer_cache import AnswerCache
+    from app.models import AnswerCacheEntry
+    others = db.execute(select(func.count()).select_from(AnswerCacheEntry)).scalar()
+    cache = AnswerCache(threshold=0.95, max_rows=others + 2, prune_every=0)
+    for i, question in enumerate(["a?", "b?", "c?"]):
+        store(cache, db, policy_version, question, unit(10 * i), question.upper())
+
+    assert db.execute(select(func.count()).select_from(AnswerCacheEntry)).scalar() == others + 2
+    assert [q for q, _ in entries(db, policy_version)][-2:] == ["b?", "c?"]
+    assert cache.stats()["pruned"] == 1
+
+
+def test_retrieval_key_follows_effective_settings(engine):
+    from app.routes.chat import AskRequest, retrieval_key
+    default = AskRequest(uin="X", question="q")
+    assert retrieval_key(default) == retrieval_key(AskRequest(uin="X", question="q", top_k=15, mmr_lambda=0.5))
+    for override in ({"top_k": 5}, {"candidate_k": 200}, {"lexical_k": 0}, {"mmr_lambda": 0.9}, {"ef_search": 400}):
+        assert retrieval_key(AskRequest(uin="X", question="q", **override)) != retrieval_key(default), override
@@ -0,0 +1,55 @@
+import pytest
+
+
+@pytest.fixture
+def client(engine):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    return TestClient(app)
+
+
+def test_search_pages_cover_every_row(client):
+    everything = client.get("/catalog/search", params={"limit": 1000}).json()
+    if len(everything) < 3:
+        pytest.skip("catalog has fewer than 3 policy versions")
+
+    rows, params = [], {"limit": 2}
+    while True:
+        res = client.get("/catalog/search", params=params)
+        assert res.status_code == 200
+        rows += res.json()
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            assert "Link" not in res.headers
+            break
+        assert 'rel="next"' in res.headers["Link"]
+        params = {"limit": 2, "cursor": cursor}
+    assert rows == everything
+
+
+def test_bad_cursor_is_rejected(client):
+    assert client.get("/catalog/search", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_filters_list_uins_only_on_request(client):
+    filters = client.get("/catalog/filters").json()
+    assert "uins" not in filters
+    assert set(filters) == {"insurers", "type_of_product"}
+    with_uins = client.get("/catalog/filters", params={"include_uins": "true"}).json()
+    assert with_uins["uins"] == sorted(set(with_uins["uins"]))
+
+
+def test_not_modified_keeps_the_paging_headers(client):
+    first = client.get("/catalog/search", params={"limit": 1})
+    if "X-Next-Cursor" not in first.headers:
+        pytest.skip("catalog has fewer than 2 policy versions")
+    again = client.get("/catalog/search", params={"limit": 1}, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert again.headers["Link"] == first.headers["Link"]
+
+
+def test_blank_typeahead_suggests_nothing(client):
+    res = client.get("/catalog/typeahead", params={"q": "   "})
+    assert res.status_code == 200 and res.json() == []
+    assert client.get("/catalog/typeahead", params={"q": ""}).status_code == 422
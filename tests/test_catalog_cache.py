@@ -0,0 +1,61 @@
+import orjson
+import pytest
+
+from app.catalog_cache import CatalogCache
+
+
+class FakeDB:
+    """Just enough of a Session for CatalogCache.version()."""
+
+    def __init__(self, version: int = 1):
+        self.version = version
+
+    def execute(self, stmt):
+        return self
+
+    def scalar(self):
+        return self.version
+
+
+@pytest.fixture
+def cache():
+    return CatalogCache(max_entries=2, version_ttl=0)
+
+
+def test_hit_miss_and_not_modified(cache):
+    db, calls = FakeDB(), []
+
+    def compute():
+        calls.append(1)
+        return ["UIN-A"], {"X-Next-Cursor": "abc"}
+
+    body, headers = cache.get(db, ("search",), compute)
+    assert orjson.loads(body) == ["UIN-A"] and headers["X-Next-Cursor"] == "abc"
+    assert cache.get(db, ("search",), compute) == (body, headers)
+    body304, headers304 = cache.get(db, ("search",), compute, if_none_match=f'"x", {headers["ETag"]}')
+    assert body304 is None and headers304 == headers
+    assert len(calls) == 1
+    assert {k: cache.stats()[k] for k in ("hits", "misses", "not_modified")} == {"hits": 1, "misses": 1, "not_modified": 1}
+
+
+def test_new_catalog_version_drops_entries_and_changes_the_etag(cache):
+    db = FakeDB(1)
+    _, old = cache.get(db, ("filters", False), lambda: ({"insurers": []}, {}))
+    db.version = 2
+    body, new = cache.get(db, ("filters", False), lambda: ({"insurers": ["Acko"]}, {}),
+                          if_none_match=old["ETag"])
+    assert orjson.loads(body) == {"insurers": ["Acko"]}
+    assert new["ETag"] != old["ETag"]
+    assert cache.invalidations == 1
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    db = FakeDB()
+    for key in ("a", "b", "a", "c"):
+        cache.get(db, (key,), lambda: (key, {}))
+    assert list(cache._entries) == [("a",), ("c",)]
+
+
+def test_disabled_cache_sends_no_etag():
+    body, headers = CatalogCache(enabled=False).get(FakeDB(), ("a",), lambda: ([1], {}))
+    assert orjson.loads(body) == [1] and "ETag" not in headers
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.embed_batcher import EmbedBatcher
+
+
+class FakeLLM:
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    async def aembed(self, texts, model):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise ConnectionError("embeddings API unreachable")
+        return [[float(len(t))] for t in texts]
+
+
+def run(batcher: EmbedBatcher, texts):
+    async def main():
+        batcher.start(asyncio.get_running_loop())
+        return await asyncio.gather(*(batcher.embed(t, "m") for t in texts), return_exceptions=True)
+    return asyncio.run(main())
+
+
+def test_requests_in_one_window_share_a_call():
+    llm = FakeLLM()
+    batcher = EmbedBatcher(llm, window_ms=20, max_batch=64)
+    assert run(batcher, ["a", "bb", "a"]) == [[1.0], [2.0], [1.0]]
+    assert llm.calls == [["a", "bb"]]
+    stats = batcher.stats()
+    assert stats["batches"] == 1 and stats["deduplicated"] == 1 and stats["flushes"] == {"window": 1}
+
+
+def test_full_batch_goes_out_without_waiting_for_the_window():
+    llm = FakeLLM()
+    batcher = EmbedBatcher(llm, window_ms=10_000, max_batch=2)
+    assert run(batcher, ["a", "bb", "ccc", "dddd"]) == [[1.0], [2.0], [3.0], [4.0]]
+    assert llm.calls == [["a", "bb"], ["ccc", "dddd"]]
+    assert batcher.stats()["flushes"] == {"full": 2}
+
+
+def test_a_failed_call_fails_every_caller_in_the_batch():
+    batcher = EmbedBatcher(FakeLLM(fail=True), window_ms=5, max_batch=64)
+    results = run(batcher, ["a", "b"])
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert batcher.stats()["failed_batches"] == 1
+
+
+def test_embed_sync_without_a_running_loop_calls_directly():
+    class SyncLLM:
+        def embed(self, texts, model):
+            return [[0.5] for _ in texts]
+    assert EmbedBatcher(SyncLLM()).embed_sync("a", "m") == [0.5]
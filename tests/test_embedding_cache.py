@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app.embedding_cache import EmbeddingCache, SqliteStore, cache_key
+
+HOUR = 3600.0
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        yield SqliteStore(str(tmp_path / "embeddings.sqlite"))
+        return
+    request.getfixturevalue("engine")
+    from app.embedding_cache import PostgresStore
+    yield PostgresStore()
+
+
+def age(store, key: str, seconds: float) -> None:
+    """Move a stored entry's created_at `seconds` into the past."""
+    if isinstance(store, SqliteStore):
+        store._conn.execute("UPDATE embedding_cache SET created_at = created_at - ? WHERE key = ?", (seconds, key))
+    else:
+        with store._engine.begin() as conn:
+            conn.execute(text("UPDATE embedding_cache SET created_at = created_at - make_interval(secs => :s) "
+                              "WHERE key = :k"), {"s": seconds, "k": key})
+
+
+def fresh_cache(store) -> EmbeddingCache:
+    # new L1 each time so reads go to the store
+    return EmbeddingCache(maxsize=16, ttl=None, store=store, store_ttl=HOUR, prune_every=0)
+
+
+def test_expired_key_is_repopulated(store):
+    model = f"test-{uuid.uuid4().hex}"  # keys unique to this run
+    calls = []
+
+    def embed(t):
+        calls.append(t)
+        return [float(len(calls))] * 4
+
+    fresh_cache(store).embed_one("What is the waiting period?", model, embed)
+    key = cache_key("What is the waiting period?", model)
+    age(store, key, 2 * HOUR)
+
+    # expired: embedded again and written back with a new created_at
+    assert fresh_cache(store).embed_one("What is the waiting period?", model, embed) == [2.0] * 4
+    assert len(calls) == 2
+    # now served from the store without another call
+    assert fresh_cache(store).embed_one("What is the waiting period?", model, embed) == [2.0] * 4
+    assert len(calls) == 2
+    assert store.get_many([key], HOUR) == {key: [2.0] * 4}
+
+
+def test_expired_rows_are_pruned_on_write(store):
+    model = f"test-{uuid.uuid4().hex}"
+    cache = fresh_cache(store)
+    cache.put_many(["old question"], [[1.0] * 4], model)
+    old = cache_key("old question", model)
+    age(store, old, 2 * HOUR)
+
+    cache.put_many(["new question"], [[2.0] * 4], model)
+    assert store.get_many([old], None) == {}
+    assert cache.stats()["store_pruned"] >= 1
@@ -0,0 +1,134 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import func, select
+
+
+def paragraph(topic: str) -> str:
+    words = [f"{topic}-{i}" for i in range(60)]
+    return " ".join(words) + "."
+
+
+def write_pdf(path, pages):
+    import fitz
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontsize=9)
+    doc.save(str(path))
+    doc.close()
+
+
+def fake_embedder(calls=None):
+    def embed(texts, max_retries=5):
+        if calls is not None:
+            calls.extend(texts)
+        return [[random.random() for _ in range(1536)] for _ in texts]
+    return embed
+
+
+def documents(policy_version):
+    from app.db import SessionLocal
+    from app.models import PolicyChunk, PolicyDocument
+    with SessionLocal() as db:
+        return db.execute(
+            select(PolicyDocument.source_uri, func.count(PolicyChunk.id))
+            .outerjoin(PolicyChunk, PolicyChunk.document_id == PolicyDocument.id)
+            .where(PolicyDocument.policy_version_id == policy_version)
+            .group_by(PolicyDocument.source_uri).order_by(PolicyDocument.source_uri)
+        ).all()
+
+
+def uin_of(policy_version):
+    from app.db import SessionLocal
+    from app.models import PolicyVersion
+    with SessionLocal() as db:
+        return db.get(PolicyVersion, policy_version).uin
+
+
+def test_renamed_revision_only_embeds_the_changed_page(policy_version, tmp_path, monkeypatch):
+    from app import ingest
+    from app.db import SessionLocal
+    from app.models import PolicyChunk
+
+    embedded = []
+    monkeypatch.setattr(ingest, "embed_with_retry", fake_embedder(embedded))
+
+    old_pdf, new_pdf = tmp_path / "wording-2023.pdf", tmp_path / "wording-2024-rev2.pdf"
+    write_pdf(old_pdf, [paragraph("eligibility"), paragraph("waiting"), paragraph("exclusions")])
+    write_pdf(new_pdf, [paragraph("eligibility"), paragraph("waiting-revised"), paragraph("exclusions")])
+
+    def run(path, replaces=None):
+        job = ingest.IngestJob(pdf_path=str(path), uin="unused", replaces=replaces)
+        chunks = ingest.extract_chunks(str(path))
+        with SessionLocal() as db, ThreadPoolExecutor(2) as embedders:
+            return ingest.ingest_document(db, job, policy_version, ingest.file_hash(str(path)), chunks, embedders)
+
+    first = run(old_pdf)
+    assert (first.embedded, first.kept, first.deleted) == (3, 0, 0)
+
+    embedded.clear()
+    second = run(new_pdf, replaces=str(old_pdf))
+    assert second.document_id == first.document_id
+    assert (second.embedded, second.kept, second.deleted) == (1, 2, 1)
+    assert len(embedded) == 1 and "waiting-revised" in embedded[0]
+
+    assert documents(policy_version) == [(str(new_pdf), 3)]
+    with SessionLocal() as db:
+        contents = db.execute(select(PolicyChunk.content)
+                              .where(PolicyChunk.policy_version_id == policy_version)).scalars().all()
+        assert not any("waiting-0" in c for c in contents)
+
+
+def test_two_pdfs_for_one_uin_stay_separate_documents(policy_version, tmp_path, monkeypatch):
+    """Without `replaces`, a second file of the same UIN and doc type is another document, stable across runs."""
+    from app import ingest
+
+    embedded = []
+    monkeypatch.setattr(ingest, "embed_with_retry", fake_embedder(embedded))
+    part1, part2 = tmp_path / "wording-part1.pdf", tmp_path / "wording-part2.pdf"
+    write_pdf(part1, [paragraph("eligibility"), paragraph("waiting")])
+    write_pdf(part2, [paragraph("claims"), paragraph("cashless")])
+    uin = uin_of(policy_version)
+    jobs = [ingest.IngestJob(pdf_path=str(p), uin=uin) for p in (part1, part2)]
+
+    first = ingest.ingest_many(jobs, workers=1)
+    assert [r.error for r in first] == [None, None]
+    assert sum(r.deleted for r in first) == 0
+    assert documents(policy_version) == [(str(part1), 2), (str(part2), 2)]
+
+    embedded.clear()
+    again = ingest.ingest_many(jobs, workers=1)
+    assert all(r.skipped for r in again) and embedded == []
+    assert documents(policy_version) == [(str(part1), 2), (str(part2), 2)]
+
+
+def test_rename_with_unchanged_bytes_moves_the_document(policy_version, tmp_path, monkeypatch):
+    from app import ingest
+
+    embedded = []
+    monkeypatch.setattr(ingest, "embed_with_retry", fake_embedder(embedded))
+    old_pdf, new_pdf = tmp_path / "old-name.pdf", tmp_path / "new-name.pdf"
+    write_pdf(old_pdf, [paragraph("cashless")])
+    new_pdf.write_bytes(old_pdf.read_bytes())
+    uin = uin_of(policy_version)
+
+    ingest.ingest_many([ingest.IngestJob(pdf_path=str(old_pdf), uin=uin)], workers=1)
+    embedded.clear()
+    [res] = ingest.ingest_many([ingest.IngestJob(pdf_path=str(new_pdf), uin=uin, replaces=str(old_pdf))], workers=1)
+    assert (res.error, res.embedded, res.kept) == (None, 0, 1)
+    assert embedded == []
+    assert documents(policy_version) == [(str(new_pdf), 1)]
+
+
+def test_check_replacements_rejects_clashing_jobs():
+    from app.ingest import IngestJob, check_replacements
+    jobs = [
+        IngestJob(pdf_path="a.pdf", uin="U1"),
+        IngestJob(pdf_path="b.pdf", uin="U1", replaces="a.pdf"),        # a.pdf is also ingested
+        IngestJob(pdf_path="c.pdf", uin="U1", replaces="old.pdf"),
+        IngestJob(pdf_path="d.pdf", uin="U1", replaces="old.pdf"),      # old.pdf already claimed by c.pdf
+        IngestJob(pdf_path="e.pdf", uin="U2", replaces="a.pdf"),        # other UIN: fine
+    ]
+    assert sorted(check_replacements(jobs)) == ["b.pdf", "d.pdf"]
@@ -0,0 +1,29 @@
+import pytest
+
+from app.llm import TokenBucket
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    assert bucket.reserve(10 ** 9) == 0.0
+
+
+def test_reservations_queue_behind_the_debt():
+    bucket = TokenBucket(600)  # 10 per second
+    assert bucket.reserve(600) == 0.0
+    assert bucket.reserve(10) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(10) == pytest.approx(2.0, abs=0.05)
+
+
+def test_oversized_request_waits_at_most_a_minute():
+    bucket = TokenBucket(60)
+    bucket.reserve(60)
+    assert bucket.reserve(10 ** 6) == pytest.approx(60.0, abs=0.05)
+
+
+def test_settle_returns_unused_units():
+    bucket = TokenBucket(600)
+    bucket.reserve(600)
+    bucket.settle(reserved=600, actual=100)
+    assert bucket.reserve(400) == 0.0
+    assert bucket.reserve(150) == pytest.approx(5.0, abs=0.05)
@@ -0,0 +1,37 @@
+import datetime
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.pagination import decode_cursor, encode_cursor, escape_like, next_page_headers
+
+
+def test_cursor_round_trip():
+    key = ["Insurer A", "Product/1", datetime.date(2024, 4, 1)]
+    cursor = encode_cursor(key)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 3) == ["Insurer A", "Product/1", "2024-04-01"]
+    assert decode_cursor(None, 3) is None
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(["a", "b"]), encode_cursor({"a": 1})])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor, 3)
+    assert e.value.status_code == 400
+
+
+def test_next_page_headers_only_when_there_is_another_page():
+    request = Request({"type": "http", "method": "GET", "path": "/catalog/search",
+                       "query_string": b"insurer=Acko&limit=2", "headers": []})
+    rows = [("a", 1), ("b", 2), ("c", 3)]
+    assert next_page_headers(request, rows[:2], 2, lambda r: r) == {}
+    headers = next_page_headers(request, rows, 2, lambda r: r)
+    assert decode_cursor(headers["X-Next-Cursor"], 2) == ["b", 2]
+    assert headers["Link"] == (f'</catalog/search?insurer=Acko&limit=2&cursor={headers["X-Next-Cursor"]}>; '
+                               'rel="next"')
+
+
+def test_escape_like():
+    assert escape_like("50%_off\\") == "50\\%\\_off\\\\"
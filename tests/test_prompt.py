@@ -0,0 +1,32 @@
+from app.prompt import get_tokenizer, pack_snippets, snippet_header
+
+MODEL = "gpt-4o-mini"
+
+
+def snippet(i: int, sentences: int) -> dict:
+    content = " ".join(f"Clause {i}.{n} covers room rent up to the sum insured." for n in range(sentences))
+    return {"chunk_id": i, "page_from": 1, "page_to": 1, "content": content}
+
+
+def test_snippets_fill_the_budget_in_order():
+    tok = get_tokenizer(MODEL)
+    snippets = [snippet(i, 4) for i in range(10)]
+    one = tok.count(snippet_header(1, snippets[0])) + tok.count(snippets[0]["content"])
+    packed, stats = pack_snippets(snippets, MODEL, budget=3 * one + 5, per_snippet=1000, min_snippet=8)
+    assert [s["chunk_id"] for s in packed] == [0, 1, 2]
+    assert stats["snippets"] == 3 and stats["dropped"] == 7 and stats["trimmed"] == 0
+    assert stats["snippet_tokens"] <= stats["budget"]
+    assert stats["exact"] == tok.exact
+
+
+def test_long_snippet_is_cut_at_a_sentence_end():
+    packed, stats = pack_snippets([snippet(0, 40)], MODEL, budget=3000, per_snippet=60, min_snippet=8)
+    content = packed[0]["content"]
+    assert stats["trimmed"] == 1
+    assert content.endswith("sum insured.") and snippet(0, 40)["content"].startswith(content)
+    assert get_tokenizer(MODEL).count(content) <= 60
+
+
+def test_nothing_is_packed_below_the_minimum():
+    packed, stats = pack_snippets([snippet(0, 4)], MODEL, budget=20, per_snippet=400, min_snippet=64)
+    assert packed == [] and stats["dropped"] == 1
@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.rerank import as_unit_matrix, mmr, relevance
+from app.routes.chat import AskRequest, select_snippets
+from app.scripts.bench_mmr import legacy_mmr
+
+
+def test_mmr_matches_legacy_loop():
+    rng = np.random.default_rng(7)
+    embs = rng.standard_normal((60, 32)).astype(np.float32)
+    qvec = rng.standard_normal(32).astype(np.float32)
+    for lam in (0.0, 0.3, 0.5, 0.7, 1.0):
+        expected = legacy_mmr(qvec.tolist(), embs.tolist(), 10, lam)
+        assert mmr(qvec, as_unit_matrix(embs), 10, lam) == expected
+
+
+def test_relevance_is_plain_top_k():
+    cand = np.array([[1.0, 0.0], [0.6, 0.8], [0.0, 1.0]], dtype=np.float32)
+    assert relevance(np.array([1.0, 0.1]), cand, 2) == [0, 1]
+
+
+def test_select_snippets_ranks_by_cosine_within_rrf_pool():
+    # rows arrive in RRF order; the first one is a full-text hit far from the question
+    vectors = np.array([[0.0, 1.0], [1.0, 0.0], [0.9, 0.1]], dtype=np.float32)
+    rows = [SimpleNamespace(id=i, section_id=None, page_from=1, page_to=1, content=f"chunk {i}",
+                            document_pdf="policy.pdf", similarity_pct=0, rrf_score=1.0 / (60 + i))
+            for i in range(len(vectors))]
+    payload = AskRequest(uin="X", question="q", top_k=2, mmr_lambda=1.0)
+    snippets = select_snippets(payload, [1.0, 0.0], rows, True, matrix=as_unit_matrix(vectors))
+    assert [s["chunk_id"] for s in snippets] == [1, 2]
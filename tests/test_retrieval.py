@@ -0,0 +1,74 @@
+import random
+
+import pytest
+from sqlalchemy import text
+
+SMALLEST_POLICY = text("""
+    SELECT policy_version_id, count(*) FROM policy_chunk
+    GROUP BY policy_version_id ORDER BY count(*) LIMIT 1
+""")
+
+
+@pytest.fixture
+def db(engine):
+    from app.db import SessionLocal
+    with SessionLocal() as session:
+        yield session
+        session.rollback()
+
+
+@pytest.fixture
+def policy(db):
+    row = db.execute(SMALLEST_POLICY).first()
+    if row is None:
+        pytest.skip("no ingested chunks")
+    return str(row[0]), row[1]
+
+
+def test_filtered_vector_search_returns_k_rows(db, policy):
+    """The global HNSW index post-filtered by policy comes back short; the exact fallback fills k."""
+    from app.retrieval import set_search_params, vector_candidates
+    pvid, n_chunks = policy
+    k = min(50, n_chunks)
+    qvec = [random.random() for _ in range(1536)]
+
+    set_search_params(db, ef_search=10)
+    db.execute(text("SET LOCAL enable_sort = off"))  # make the planner take the vector index
+    rows = vector_candidates(db, pvid, qvec, limit=k, with_embeddings=False)
+
+    exact = db.execute(text(
+        "SELECT id FROM policy_chunk WHERE policy_version_id = :pvid "
+        "ORDER BY (embedding <=> CAST(:qvec AS vector)) + 0 LIMIT :k"
+    ), {"pvid": pvid, "qvec": str(qvec), "k": k}).scalars().all()
+    assert [r.id for r in rows] == exact
+
+
+def test_iterative_scan_only_set_where_supported(db):
+    from app.retrieval import set_search_params
+    version = db.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+    set_search_params(db, ef_search=100, iterative_scan="relaxed_order")
+    value = db.execute(text("SELECT current_setting('hnsw.iterative_scan', true)")).scalar()
+    supported = tuple(int(p) for p in version.split(".")[:2]) >= (0, 8)
+    assert (value == "relaxed_order") if supported else not value
+    assert db.execute(text("SHOW hnsw.ef_search")).scalar() == "100"
+
+
+# ---- DB-free ----
+def test_decode_vectors_reads_vector_send_records():
+    import numpy as np
+    from app.retrieval import decode_vectors
+
+    vecs = np.arange(6, dtype=np.float32).reshape(2, 3)
+    bufs = [np.array([3, 0], dtype=">u2").tobytes() + v.astype(">f4").tobytes() for v in vecs]
+    out = decode_vectors(bufs, dim=3)
+    assert out.dtype == np.float32 and out.flags.c_contiguous
+    assert np.array_equal(out, vecs)
+    assert decode_vectors([], dim=3).shape == (0, 3)
+    with pytest.raises(ValueError):
+        decode_vectors(bufs, dim=2)
+
+
+def test_lexical_query_ors_the_words():
+    from app.retrieval import lexical_query
+    assert lexical_query("Is OPD covered, or not?") == "is or opd or covered or not"
+    assert lexical_query("   ") == ""
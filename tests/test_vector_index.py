@@ -0,0 +1,65 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app import vector_index
+
+
+def listener_threads():
+    return [t for t in threading.enumerate() if t.name == "vector-index-listener" and t.is_alive()]
+
+
+def test_shutdown_stops_the_listener():
+    # listening (with a database) or in its reconnect backoff (without one)
+    vector_index.get_vector_index()
+    assert listener_threads()
+    time.sleep(0.3)
+    vector_index.stop_vector_index_listener()
+    for t in listener_threads():
+        t.join(timeout=3)
+    assert not listener_threads()
+    assert not vector_index.get_vector_index.cache_info().currsize
+
+
+def policy(pvid: str, rows: int = 4) -> vector_index.PolicyIndex:
+    rng = np.random.default_rng(len(pvid))
+    meta = [(f"{pvid}-{i}", None, 1, 1, "", "p.pdf") for i in range(rows)]
+    return vector_index.PolicyIndex(pvid, rng.standard_normal((rows, 8)).astype(np.float32), meta)
+
+
+def test_least_recently_used_policy_is_evicted():
+    size = policy("a").nbytes
+    cache = vector_index.VectorIndexCache(max_bytes=2 * size)
+    for pvid in ("a", "b", "a", "c"):
+        cache.get(pvid, policy)
+    assert list(cache._items) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1 and cache.loads == 3 and cache.hits == 1
+
+
+def test_invalidation_during_a_load_is_not_cached():
+    cache = vector_index.VectorIndexCache()
+
+    def stale_load(pvid):
+        cache.invalidate(pvid)  # chunks changed while this load was reading them
+        return policy(pvid)
+    cache.get("a", stale_load)
+    assert "a" not in cache._items
+    cache.get("a", policy)
+    assert "a" in cache._items
+
+    def stale_everything(pvid):
+        cache.invalidate()
+        return policy(pvid)
+    cache.get("b", stale_everything)
+    assert list(cache._items) == []
+
+
+def test_search_is_exact_top_k():
+    idx = policy("a", rows=20)
+    qvec = np.asarray(idx.matrix[3]) * 2
+    rows, matrix = idx.search(qvec, 5)
+    assert rows[0].id == "a-3" and rows[0].similarity_pct == pytest.approx(100, abs=1e-3)
+    sims = [r.similarity_pct for r in rows]
+    assert sims == sorted(sims, reverse=True) and len(matrix) == 5
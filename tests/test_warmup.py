@@ -0,0 +1,67 @@
+import asyncio
+
+from app.warmup import Skip, Warmup
+
+
+def flaky(failures: int):
+    """A step that raises `failures` times, then succeeds."""
+    calls = {"n": 0}
+
+    async def step():
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            raise ConnectionError("database unreachable")
+        return "ok"
+    return step
+
+
+async def skipped():
+    raise Skip("not configured")
+
+
+def test_failed_steps_are_retried_until_ready():
+    async def main():
+        later = flaky(0)
+        warmup = Warmup(stages=[[("db_pools", flaky(2)), ("tokenizer", skipped)], [("catalog_cache", later)]],
+                        retry_delay=0.01, max_retry_delay=0.02)
+        task = asyncio.create_task(warmup.run())
+        await warmup.first_pass.wait()
+        assert not warmup.ready() and warmup.failed() == ["db_pools"]
+        await asyncio.wait_for(task, 2)
+        return warmup
+
+    warmup = asyncio.run(main())
+    assert warmup.ready()
+    assert warmup.retries == 2
+    assert {n: s["attempts"] for n, s in warmup.steps.items()} == {"db_pools": 3, "tokenizer": 1, "catalog_cache": 1}
+    assert warmup.status()["steps"]["tokenizer"]["status"] == "skipped"
+
+
+def test_without_retries_a_failure_keeps_the_worker_unready():
+    warmup = Warmup(stages=[[("db_pools", flaky(1))]], retry_delay=0)
+    asyncio.run(warmup.run())
+    assert not warmup.ready()
+    assert warmup.status()["steps"]["db_pools"]["detail"] == "ConnectionError: database unreachable"
+
+
+def test_estimated_tokens_degrade_the_tokenizer_step(monkeypatch):
+    import tiktoken
+    from app.prompt import get_tokenizer
+    from app.warmup import warm_tokenizer
+
+    def offline(*args):
+        raise ConnectionError("no network")
+    monkeypatch.setattr(tiktoken, "encoding_for_model", offline)
+    monkeypatch.setattr(tiktoken, "get_encoding", offline)
+    get_tokenizer.cache_clear()
+    try:
+        warmup = Warmup(stages=[[("tokenizer", lambda: asyncio.to_thread(warm_tokenizer))]], retry_delay=0)
+        asyncio.run(warmup.run())
+        assert warmup.ready() and warmup.status()["degraded"] == ["tokenizer"]
+
+        monkeypatch.setenv("TOKENIZER_REQUIRED", "1")
+        warmup = Warmup(stages=[[("tokenizer", lambda: asyncio.to_thread(warm_tokenizer))]], retry_delay=0)
+        asyncio.run(warmup.run())
+        assert not warmup.ready() and warmup.failed() == ["tokenizer"]
+    finally:
+        get_tokenizer.cache_clear()